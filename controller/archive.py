@@ -0,0 +1,154 @@
+"""
+Arquivamento de tarefas encerradas.
+
+Tarefas com ``status`` em ``TASK_ARCHIVE_STATUSES`` e sem escrita há mais de
+``TASK_ARCHIVE_AFTER_DAYS`` dias são movidas em lotes da coleção ``tasks``
+para ``tasks_archive``, mantendo o tamanho dos índices e o custo das
+listagens estáveis conforme o histórico cresce. ``GET /tasks`` só lê a coleção
+arquivada com ``include_archived=true``; ``GET /tasks/{id}`` procura nas duas.
+Tarefas arquivadas são somente leitura e saem de ``GET /tasks/stats``.
+
+Cada lote copia as tarefas para o arquivo (upsert por ``_id``, então repetir um
+lote é seguro) e só então as remove de ``tasks``, uma a uma e condicionando à
+``version`` copiada. Só conta como movida a tarefa que a própria remoção tirou
+de ``tasks``; nas outras (alteradas ou removidas no meio do caminho) a cópia é
+desfeita. As cópias levam o ``archive_run`` do lote, para que um worker que
+perdeu a corrida por uma tarefa não desfaça a cópia de quem a moveu.
+
+    python -m controller.archive           # arquiva agora tudo o que a política permitir
+"""
+import asyncio
+import logging
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReplaceOne
+from controller.database import async_tasks_archive_collection, async_tasks_collection
+from controller.metrics import Counter as MetricCounter, register_collector
+from controller.task_stats import task_counters, task_delta
+
+TASK_ARCHIVE_STATUSES = tuple(
+    s for s in os.getenv("TASK_ARCHIVE_STATUSES", "fechada").replace(" ", "").split(",") if s
+)
+TASK_ARCHIVE_AFTER_DAYS = float(os.getenv("TASK_ARCHIVE_AFTER_DAYS", "90"))
+TASK_ARCHIVE_BATCH_SIZE = int(os.getenv("TASK_ARCHIVE_BATCH_SIZE", "500"))
+# Intervalo entre as execuções da tarefa periódica; 0 desliga.
+TASK_ARCHIVE_INTERVAL_SECONDS = float(os.getenv("TASK_ARCHIVE_INTERVAL_SECONDS", "3600"))
+
+
+# Ordem dos lotes; o relatório de consultas quentes (controller/indexes.py) usa a mesma.
+ARCHIVE_SORT = [("_id", 1)]
+
+
+def archive_filter(now: datetime = None) -> dict:
+    """Tarefas elegíveis; as gravadas antes do campo updated_at usam a data de criação do _id."""
+    cutoff = (now or datetime.utcnow()) - timedelta(days=TASK_ARCHIVE_AFTER_DAYS)
+    return {
+        "status": {"$in": list(TASK_ARCHIVE_STATUSES)},
+        "$or": [
+            {"updated_at": {"$lt": cutoff}},
+            {"updated_at": None, "_id": {"$lt": ObjectId.from_datetime(cutoff)}},
+        ],
+    }
+
+
+def may_be_archived(task_id: ObjectId, now: datetime = None) -> bool:
+    """
+    Falso para tarefas criadas há menos de ``TASK_ARCHIVE_AFTER_DAYS`` dias, que
+    não podem estar no arquivo: um 404 dessas nem consulta ``tasks_archive``.
+    Depois de aumentar ``TASK_ARCHIVE_AFTER_DAYS``, tarefas arquivadas com o
+    prazo antigo e mais novas que o novo ficam fora das buscas por id.
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(days=TASK_ARCHIVE_AFTER_DAYS)
+    return task_id < ObjectId.from_datetime(cutoff)
+
+
+class TaskArchiver:
+    def __init__(self, tasks, archive, counters=task_counters):
+        self.tasks = tasks
+        self.archive = archive
+        self.counters = counters
+        self.archived = 0
+
+    async def archive_batch(self, now: datetime = None) -> tuple:
+        """
+        Move até ``TASK_ARCHIVE_BATCH_SIZE`` tarefas elegíveis; devolve quantas saíram
+        de ``tasks`` e quantas o lote encontrou.
+        """
+        if not TASK_ARCHIVE_STATUSES:
+            return 0, 0
+        docs = await self.tasks.find(archive_filter(now), sort=ARCHIVE_SORT, limit=TASK_ARCHIVE_BATCH_SIZE).to_list()
+        if not docs:
+            return 0, 0
+        archived_at, run = datetime.utcnow(), ObjectId()
+
+        def copies(batch):
+            return [ReplaceOne({"_id": doc["_id"]}, {**doc, "archived_at": archived_at, "archive_run": run}, upsert=True)
+                    for doc in batch]
+
+        await self.archive.bulk_write(copies(docs), ordered=False)
+        # {"version": None} também casa com tarefas sem o campo.
+        results = await asyncio.gather(*(
+            self.tasks.delete_one({"_id": doc["_id"], "version": doc.get("version")}) for doc in docs
+        ))
+        moved = [doc for doc, result in zip(docs, results) if result.deleted_count]
+        left = [doc["_id"] for doc, result in zip(docs, results) if not result.deleted_count]
+        if left:
+            await self.archive.delete_many({"_id": {"$in": left}, "archive_run": run})
+        if moved:
+            # Outro arquivador pode ter sobrescrito a cópia e desfeito a sua: grava de novo a de quem moveu.
+            ours = {
+                doc["_id"] async for doc in self.archive.find(
+                    {"_id": {"$in": [doc["_id"] for doc in moved]}, "archive_run": run}, projection={"_id": 1}
+                )
+            }
+            lost = [doc for doc in moved if doc["_id"] not in ours]
+            if lost:
+                await self.archive.bulk_write(copies(lost), ordered=False)
+        delta = Counter()
+        for doc in moved:
+            delta.update(task_delta(doc, -1))
+        await self.counters.apply(delta)
+        self.archived += len(moved)
+        return len(moved), len(docs)
+
+    async def archive_all(self, now: datetime = None) -> int:
+        total = 0
+        while True:
+            moved, found = await self.archive_batch(now)
+            total += moved
+            # Um lote cheio com tarefas alteradas no meio do caminho ainda pode ter deixado elegíveis para trás.
+            if found < TASK_ARCHIVE_BATCH_SIZE:
+                break
+            # Entre lotes, devolve o event loop às requisições.
+            await asyncio.sleep(0)
+        if total:
+            logging.info("Tarefas arquivadas: %s", total)
+        return total
+
+    async def archive_forever(self, interval: float = TASK_ARCHIVE_INTERVAL_SECONDS):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.archive_all()
+            except Exception as e:
+                logging.error("Falha ao arquivar tarefas: %s", e)
+
+
+task_archiver = TaskArchiver(async_tasks_collection, async_tasks_archive_collection)
+
+
+@register_collector
+def _archive_metrics():
+    archived = MetricCounter("tasks_archived_total", "Tarefas movidas para a coleção de arquivo.")
+    archived.inc(amount=task_archiver.archived)
+    return [archived]
+
+
+def main():
+    asyncio.run(task_archiver.archive_all())
+
+
+if __name__ == "__main__":
+    main()
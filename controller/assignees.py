@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import os
+from controller.database import StorageLocal, async_users_collection
+from controller.metrics import Gauge, register_collector
+
+# Intervalo da reconciliação com o banco; 0 desliga a tarefa periódica.
+ASSIGNEE_RECONCILE_SECONDS = float(os.getenv("ASSIGNEE_RECONCILE_SECONDS", "300"))
+
+
+class ActiveUsernameIndex:
+    """
+    Conjunto em memória dos usernames ativos, usado para validar ``assigned_to``.
+
+    Um username presente no conjunto é aceito sem ir ao banco. Um ausente ainda é
+    conferido no Mongo (pode ter sido criado por outro worker) e, se existir, entra
+    no conjunto. Remoções feitas por outros workers só são vistas na próxima
+    reconciliação.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.version = 0
+        self.warmed = False
+        self.hits = 0
+        self.misses = 0
+        self._usernames = set()
+        # Alterações feitas durante cada leitura do banco em andamento (username -> ativo).
+        self._scans = []
+
+    async def warm(self):
+        changes = {}
+        self._scans.append(changes)
+        try:
+            cursor = self.collection.find({"is_active": True}, projection={"username": 1, "_id": 0})
+            usernames = {user["username"] async for user in cursor}
+        finally:
+            self._scans.remove(changes)
+        # A leitura pode ter visto o usuário antes de uma remoção ou criação feita enquanto rodava.
+        for username, active in changes.items():
+            if active:
+                usernames.add(username)
+            else:
+                usernames.discard(username)
+        self._usernames = usernames
+        self.warmed = True
+        self.version += 1
+        logging.info("Índice de usernames ativos carregado: %s usuários", len(self._usernames))
+
+    def _record(self, username: str, active: bool):
+        for changes in self._scans:
+            changes[username] = active
+
+    def add(self, username: str):
+        self._usernames.add(username)
+        self._record(username, True)
+        self.version += 1
+
+    def discard(self, username: str):
+        self._usernames.discard(username)
+        self._record(username, False)
+        self.version += 1
+
+    async def exists(self, username: str) -> bool:
+        if username in self._usernames:
+            self.hits += 1
+            return True
+        self.misses += 1
+        if await self.collection.find_one({"username": username, "is_active": True}, projection={"_id": 1}):
+            self._usernames.add(username)
+            return True
+        return False
+
+    async def existing(self, usernames) -> set:
+        usernames = {u for u in usernames if u is not None}
+        found = usernames & self._usernames
+        self.hits += len(found)
+        unknown = list(usernames - found)
+        if unknown:
+            self.misses += len(unknown)
+            cursor = self.collection.find(
+                {"username": {"$in": unknown}, "is_active": True},
+                projection={"username": 1, "_id": 0}
+            )
+            async for user in cursor:
+                self._usernames.add(user["username"])
+                found.add(user["username"])
+        return found
+
+    async def reconcile_forever(self, interval: float = ASSIGNEE_RECONCILE_SECONDS):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.warm()
+            except Exception as e:
+                logging.error("Falha ao reconciliar usernames ativos: %s", e)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._usernames),
+            "version": self.version,
+            "warmed": self.warmed,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+active_usernames = StorageLocal(lambda: ActiveUsernameIndex(async_users_collection))
+
+
+@register_collector
+def _assignee_index_metrics():
+    stats = Gauge("assignee_index_lookups", "Validações de assigned_to resolvidas em memória ou no banco.", ("result",))
+    stats.set("hit", value=active_usernames.hits)
+    stats.set("miss", value=active_usernames.misses)
+    size = Gauge("assignee_index_size", "Usernames ativos mantidos em memória.")
+    size.set(value=len(active_usernames._usernames))
+    return [stats, size]
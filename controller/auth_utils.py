@@ -1,44 +1,120 @@
+import hashlib
 import logging
+import os
+import secrets
+import time
 from fastapi import HTTPException, Depends
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
 from fastapi.security import OAuth2PasswordBearer
 from bson import ObjectId
-from controller.database import users_collection
+from controller.cache import TTLCache
+from controller.database import StorageLocal, async_revoked_tokens_collection, async_users_collection
+from controller.metrics import Counter, auth_token_decode_duration, register_collector
+from controller.profiling import record_timing, timed
+from controller.revocation import InMemoryRevocationStore, MongoRevocationStore
 from model.models import User
 
 SECRET_KEY = "paodebatata"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+AUTH_CACHE_MAX_SIZE = 10000
+# Um usuário removido ou desativado ainda autentica por até esse tempo; 0 desliga o cache.
+AUTH_USER_CACHE_TTL_SECONDS = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "60"))
+# "memory" vale só para o processo atual; "mongo" é compartilhado entre workers.
+TOKEN_REVOCATION_BACKEND = os.getenv("TOKEN_REVOCATION_BACKEND", "memory")
 
-invalidated_tokens = set()
+if TOKEN_REVOCATION_BACKEND == "mongo":
+    invalidated_tokens = MongoRevocationStore(async_revoked_tokens_collection)
+else:
+    invalidated_tokens = InMemoryRevocationStore()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# Payload decodificado por hash do token e usuário resolvido por id, para que uma
+# requisição autenticada não precise decodificar o JWT nem ir ao banco toda vez.
+# Um par de caches por armazenamento, como os dados de onde vieram.
+token_cache = StorageLocal(lambda: TTLCache(maxsize=AUTH_CACHE_MAX_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60))
+user_cache = StorageLocal(lambda: TTLCache(maxsize=AUTH_CACHE_MAX_SIZE, ttl=AUTH_USER_CACHE_TTL_SECONDS))
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def invalidate_user(user_id: str):
+    user_cache.pop(user_id)
+
+async def revoke_token(token: str):
+    try:
+        payload = _decode_token(token)
+    except JWTError:
+        # Token já inválido ou expirado: não há o que revogar.
+        return
+    token_cache.pop(_token_key(token))
+    await invalidated_tokens.revoke(token_id(payload, token), payload["exp"])
+
+def auth_cache_stats() -> dict:
+    return {"token": token_cache.stats(), "user": user_cache.stats()}
+
+@register_collector
+def _auth_cache_metrics():
+    hits = Counter("auth_cache_hits_total", "Acertos dos caches de autenticação.", ("cache",))
+    misses = Counter("auth_cache_misses_total", "Falhas dos caches de autenticação.", ("cache",))
+    for name, cache in (("token", token_cache), ("user", user_cache)):
+        hits.inc(name, amount=cache.hits)
+        misses.inc(name, amount=cache.misses)
+    return [hits, misses]
+
+def token_id(payload: dict, token: str) -> str:
+    # Tokens emitidos antes do claim jti são identificados pelo hash.
+    return payload.get("jti") or _token_key(token)
+
+def _decode_token(token: str) -> dict:
+    key = _token_key(token)
+    payload = token_cache.get(key)
+    if payload is None:
+        start = time.perf_counter()
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        elapsed = time.perf_counter() - start
+        auth_token_decode_duration.observe(elapsed)
+        record_timing("jwt", elapsed)
+        token_cache.set(key, payload, ttl=payload.get("exp", 0) - time.time())
+    elif payload.get("exp", 0) <= time.time():
+        token_cache.pop(key)
+        raise JWTError("Signature has expired.")
+    return payload
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    to_encode.update({"exp": expire, "jti": secrets.token_urlsafe(12)})
+    with timed("jwt"):
+        return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    if token in invalidated_tokens:
-        logging.warning("Token inválido ou expirado usado para autenticação.")
-        raise HTTPException(status_code=401, detail="Token inválido ou expirado")
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = _decode_token(token)
+        if await invalidated_tokens.is_revoked(token_id(payload, token)):
+            logging.warning("Token inválido ou expirado usado para autenticação.")
+            raise HTTPException(status_code=401, detail="Token inválido ou expirado")
         user_id: str = payload.get("sub")
         if user_id is None:
             logging.warning("Tentativa de autenticação com credenciais inválidas.")
             raise HTTPException(status_code=401, detail="Credenciais inválidas")
-        user = users_collection.find_one({"_id": ObjectId(user_id), "is_active": True})
+        cached = user_cache.get(user_id)
+        if cached is not None:
+            return cached
+        user = await async_users_collection.reader("get_current_user").find_one(
+            {"_id": ObjectId(user_id), "is_active": True}
+        )
         if user:
-            return User(
+            current_user = User(
                 id=str(user["_id"]),
                 username=user["username"],
                 email=user["email"],
                 is_active=user["is_active"]
             )
-        logging.warning(f"Usuário não encontrado para o id: {user_id}")
+            user_cache.set(user_id, current_user)
+            return current_user
+        logging.warning("Usuário não encontrado para o id: %s", user_id)
         raise HTTPException(status_code=401, detail="Usuário não encontrado")
     except JWTError:
         logging.warning("Token JWT inválido ou expirado.")
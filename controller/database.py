@@ -1,8 +1,387 @@
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pymongo import MongoClient
-from controller.config_URI import MONGO_URI
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+from controller.metrics import db_operation_duration, query_shape
+from controller.profiling import record_timing
 
-client = MongoClient(MONGO_URI)
-db = client["Grau_B"]
+# Número de threads que executam as chamadas bloqueantes do pymongo fora do event loop.
+# Deve acompanhar o maxPoolSize do MongoClient (padrão 100) para não virar gargalo.
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "100"))
+# Quantos documentos o cursor assíncrono busca por ida ao executor.
+DB_CURSOR_BATCH_SIZE = int(os.getenv("DB_CURSOR_BATCH_SIZE", "100"))
 
-users_collection = db["users"]
-tasks_collection = db["tasks"]
\ No newline at end of file
+# Conexão. Sem MONGO_URI no ambiente, usa o controller/config_URI.py (fora do repositório).
+MONGO_DATABASE = os.getenv("MONGO_DATABASE", "Grau_B")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", str(DB_EXECUTOR_WORKERS)))
+# Conexões abertas já na subida, para as primeiras requisições não pagarem o handshake.
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "10"))
+# Compressão do protocolo: zlib vem com o Python; zstd e snappy precisam dos pacotes zstandard/python-snappy.
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zlib")
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+
+# Armazenamento padrão: "mongo" ou "memory" (motor em memória de controller/memory_storage.py).
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo")
+
+# Leituras das rotas de consulta (GETs e busca do usuário autenticado). Escritas e
+# leituras logo após uma escrita usam sempre o primário.
+READ_PREFERENCE = os.getenv("READ_PREFERENCE", "primary")
+# Atraso máximo aceito de um secundário; o Mongo exige pelo menos 90. -1 desliga.
+READ_MAX_STALENESS_SECONDS = int(os.getenv("READ_MAX_STALENESS_SECONDS", "90"))
+# Exceções por rota, ex.: "get_task=primary,list_tasks=secondaryPreferred".
+READ_PREFERENCE_ROUTES = dict(
+    item.split("=", 1) for item in os.getenv("READ_PREFERENCE_ROUTES", "").replace(" ", "").split(",") if "=" in item
+)
+
+READ_PREFERENCE_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def mongo_uri() -> str:
+    uri = os.getenv("MONGO_URI")
+    if uri:
+        return uri
+    from controller.config_URI import MONGO_URI
+    return MONGO_URI
+
+
+def client_options() -> dict:
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    }
+    if MONGO_COMPRESSORS:
+        options["compressors"] = MONGO_COMPRESSORS
+    return options
+
+
+def get_client():
+    """Cria o MongoClient no primeiro uso (e não na importação do módulo)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(mongo_uri(), **client_options())
+    return _client
+
+
+def get_database():
+    return get_client()[MONGO_DATABASE]
+
+
+def connect():
+    """Abre o cliente e confirma que o servidor responde; chamada no lifespan da aplicação."""
+    start = time.perf_counter()
+    get_client().admin.command("ping")
+    logging.info("Conectado ao Mongo em %.1f ms (pool %s-%s)",
+                 (time.perf_counter() - start) * 1000, MONGO_MIN_POOL_SIZE, MONGO_MAX_POOL_SIZE)
+
+
+def close_client():
+    """Fecha as conexões; um novo acesso depois disso abre outro cliente."""
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+        logging.info("Conexões com o Mongo encerradas")
+
+
+def read_preference_for(route: str):
+    """Read preference da rota, ou ``None`` quando ela deve ler do primário."""
+    mode = READ_PREFERENCE_ROUTES.get(route, READ_PREFERENCE)
+    if mode not in READ_PREFERENCE_MODES:
+        raise ValueError(f"Read preference inválida para {route}: {mode}")
+    if mode == "primary":
+        return None
+    return READ_PREFERENCE_MODES[mode](max_staleness=READ_MAX_STALENESS_SECONDS)
+
+
+class MongoStorage:
+    """
+    Armazenamento no Mongo, pelo cliente compartilhado do processo, ou em
+    ``database`` (ex.: um banco do mongomock ou um banco de rascunho dos benchmarks).
+    """
+
+    def __init__(self, database=None):
+        self._database = database
+
+    def collection(self, name: str):
+        return self.database()[name]
+
+    def database(self):
+        return self._database if self._database is not None else get_database()
+
+    def connect(self):
+        if self._database is None:
+            connect()
+
+    def close(self):
+        if self._database is None:
+            close_client()
+
+    def cache_namespace(self) -> str:
+        """Prefixo das entradas em caches fora do processo: os workers do mesmo banco o compartilham."""
+        return MONGO_DATABASE if self._database is None else self._database.name
+
+
+def create_storage(backend: str = STORAGE_BACKEND):
+    if backend == "mongo":
+        return MongoStorage()
+    if backend == "memory":
+        from controller.memory_storage import MemoryStorage
+        return MemoryStorage()
+    raise ValueError(f"STORAGE_BACKEND inválido: {backend}")
+
+
+default_storage = create_storage()
+# Armazenamento da aplicação atual; cada app definida com create_app(storage=...) o troca por requisição.
+current_storage = contextvars.ContextVar("current_storage", default=None)
+
+
+def get_storage():
+    return current_storage.get() or default_storage
+
+
+class StorageLocal:
+    """
+    Um objeto por armazenamento (caches, índices e afins em memória), criado por
+    ``factory`` no primeiro uso e resolvido a cada acesso como ``get_storage()``.
+
+    Os módulos guardam o ``StorageLocal`` na importação e o usam como o próprio
+    objeto; apps com ``create_app(storage=...)`` não compartilham o estado.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._instances = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def current(self):
+        storage = get_storage()
+        instance = self._instances.get(storage)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(storage)
+                if instance is None:
+                    instance = self._instances[storage] = self._factory()
+        return instance
+
+    def __getattr__(self, name):
+        return getattr(self.current(), name)
+
+    def __len__(self):
+        return len(self.current())
+
+
+class LazyDatabase:
+    """Banco resolvido a cada acesso, para que os módulos possam guardá-lo na importação."""
+
+    def __getitem__(self, name):
+        return get_storage().collection(name)
+
+    def __getattr__(self, name):
+        return getattr(get_storage().database(), name)
+
+
+class LazyCollection:
+    """Coleção resolvida a cada acesso no armazenamento atual; segue o cliente mesmo depois de um ``close_client``."""
+
+    def __init__(self, name: str, **options):
+        self.name = name
+        self.options = options
+
+    def with_options(self, **options):
+        return LazyCollection(self.name, **{**self.options, **options})
+
+    def __getattr__(self, name):
+        collection = get_storage().collection(self.name)
+        if self.options:
+            collection = collection.with_options(**self.options)
+        return getattr(collection, name)
+
+
+db = LazyDatabase()
+
+users_collection = LazyCollection("users")
+tasks_collection = LazyCollection("tasks")
+tasks_archive_collection = LazyCollection("tasks_archive")
+revoked_tokens_collection = LazyCollection("revoked_tokens")
+task_counters_collection = LazyCollection("task_counters")
+rate_limits_collection = LazyCollection("rate_limits")
+
+db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="mongo")
+
+
+def _reset_after_fork():
+    # Threads e conexões não sobrevivem ao fork: o worker abre o próprio cliente
+    # (no lifespan) e o próprio executor, sem fechar os do processo pai.
+    global _client, _client_lock, db_executor
+    _client = None
+    _client_lock = threading.Lock()
+    db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="mongo")
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+async def run_in_db_executor(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # Copia o contexto para a thread enxergar o armazenamento da app atual.
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(db_executor, partial(context.run, fn, *args, **kwargs))
+
+
+class AsyncCursor:
+    """Cursor assíncrono: consome o cursor síncrono em lotes dentro do executor."""
+
+    def __init__(self, cursor, batch_size: int = DB_CURSOR_BATCH_SIZE, labels=("-", "find", "-")):
+        self._cursor = cursor
+        self._batch_size = batch_size
+        self._labels = labels
+        self._buffer = []
+        self._exhausted = False
+
+    def _next_batch(self):
+        batch = []
+        for doc in self._cursor:
+            batch.append(doc)
+            if len(batch) >= self._batch_size:
+                break
+        return batch
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._buffer:
+            if self._exhausted:
+                raise StopAsyncIteration
+            start = time.perf_counter()
+            self._buffer = await run_in_db_executor(self._next_batch)
+            elapsed = time.perf_counter() - start
+            db_operation_duration.observe(elapsed, *self._labels)
+            record_timing("mongo", elapsed)
+            self._buffer.reverse()
+            if len(self._buffer) < self._batch_size:
+                self._exhausted = True
+            if not self._buffer:
+                raise StopAsyncIteration
+        return self._buffer.pop()
+
+    async def to_list(self, length: int = None):
+        docs = []
+        async for doc in self:
+            docs.append(doc)
+            if length is not None and len(docs) >= length:
+                break
+        return docs
+
+    async def close(self):
+        await run_in_db_executor(self._cursor.close)
+
+
+class AsyncCollection:
+    """
+    Fachada assíncrona sobre uma coleção síncrona (pymongo ou compatível).
+
+    Os métodos têm os mesmos nomes, argumentos e retornos da coleção original,
+    mas precisam de ``await``. ``find`` e ``aggregate`` devolvem um ``AsyncCursor``.
+    A coleção por baixo pode ser trocada com ``bind`` (ex.: nos testes).
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._readers = {}
+
+    def bind(self, collection):
+        self.collection = collection
+        self._readers = {}
+
+    def reader(self, route: str):
+        """Versão desta coleção para as leituras de ``route``, com a read preference configurada."""
+        preference = read_preference_for(route)
+        if preference is None:
+            return self
+        reader = self._readers.get(route)
+        if reader is None:
+            reader = self._readers[route] = AsyncCollection(self.collection.with_options(read_preference=preference))
+        return reader
+
+    @property
+    def name(self):
+        return getattr(self.collection, "name", "-")
+
+    def find(self, *args, **kwargs):
+        shape = query_shape(args[0] if args else kwargs.get("filter"))
+        return AsyncCursor(self.collection.find(*args, **kwargs), labels=(self.name, "find", shape))
+
+    def aggregate(self, pipeline, *args, **kwargs):
+        # aggregate já envia o comando ao servidor, então roda no executor
+        # ao primeiro consumo do cursor.
+        shape = "|".join(next(iter(stage)) for stage in pipeline) or "-"
+        cursor = _LazyCursor(self.collection.aggregate, pipeline, *args, **kwargs)
+        return AsyncCursor(cursor, labels=(self.name, "aggregate", shape))
+
+    def __getattr__(self, name):
+        attr = getattr(self.collection, name)
+        if not callable(attr):
+            return attr
+
+        async def method(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await run_in_db_executor(attr, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                shape = query_shape(args[0]) if args else "-"
+                db_operation_duration.observe(elapsed, self.name, name, shape)
+                record_timing("mongo", elapsed)
+
+        method.__name__ = name
+        return method
+
+
+class _LazyCursor:
+    def __init__(self, factory, *args, **kwargs):
+        self._factory = partial(factory, *args, **kwargs)
+        self._cursor = None
+
+    def __iter__(self):
+        if self._cursor is None:
+            self._cursor = self._factory()
+        return iter(self._cursor)
+
+    def close(self):
+        if self._cursor is not None:
+            self._cursor.close()
+
+
+async_users_collection = AsyncCollection(users_collection)
+async_tasks_collection = AsyncCollection(tasks_collection)
+async_tasks_archive_collection = AsyncCollection(tasks_archive_collection)
+async_revoked_tokens_collection = AsyncCollection(revoked_tokens_collection)
+async_task_counters_collection = AsyncCollection(task_counters_collection)
+async_rate_limits_collection = AsyncCollection(rate_limits_collection)
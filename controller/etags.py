@@ -0,0 +1,40 @@
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException
+
+# Documentos criados antes do campo "version" são tratados como versão 0.
+
+def document_etag(doc: dict) -> str:
+    return f'"{doc.get("version", 0)}"'
+
+def expanded_etag(doc: dict, related: Optional[dict]) -> str:
+    # A representação expandida muda quando qualquer um dos documentos muda.
+    related_version = related.get("version", 0) if related else "-"
+    return f'"{doc.get("version", 0)}.{related_version}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+def expected_version(if_match: Optional[str]) -> Optional[int]:
+    if if_match is None or if_match.strip() == "*":
+        return None
+    try:
+        return int(if_match.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid If-Match header")
+
+def version_filter(version: int) -> dict:
+    # {"version": None} também casa com documentos sem o campo.
+    return {"version": version if version else None}
+
+def versioned_update(update_data: dict) -> dict:
+    # updated_at marca a última escrita (usado pela política de arquivamento de tarefas).
+    return {"$inc": {"version": 1}, "$set": {**update_data, "updated_at": datetime.utcnow()}}
+
+def apply_update(previous: dict, update_data: dict) -> dict:
+    """Documento pós-atualização a partir do retornado antes dela (ReturnDocument.BEFORE)."""
+    return {**previous, **update_data, "version": previous.get("version", 0) + 1}
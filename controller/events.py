@@ -0,0 +1,191 @@
+"""
+Barramento de eventos de tarefas para ``GET /tasks/events`` (Server-Sent Events).
+
+Os handlers de tarefas publicam criação, atualização e deleção no barramento do
+processo. Com vários workers, use ``TASK_EVENTS_SOURCE=changestream``: cada
+worker passa a alimentar o seu barramento a partir de um change stream da
+coleção (precisa de replica set), e os handlers deixam de publicar localmente.
+
+Cada assinante tem uma fila limitada. Um assinante lento que enche a fila é
+desconectado (recebe um evento ``overflow``) em vez de acumular memória; o
+cliente deve reconectar e recarregar a listagem.
+"""
+import asyncio
+import logging
+import os
+import threading
+from controller.database import StorageLocal
+from controller.metrics import Counter, Gauge, register_collector
+from model.mappers import task_document
+
+TASK_EVENTS_QUEUE_SIZE = int(os.getenv("TASK_EVENTS_QUEUE_SIZE", "100"))
+TASK_EVENTS_HEARTBEAT_SECONDS = float(os.getenv("TASK_EVENTS_HEARTBEAT_SECONDS", "15"))
+# "local" (padrão): eventos dos handlers deste processo; "changestream": eventos do Mongo.
+TASK_EVENTS_SOURCE = os.getenv("TASK_EVENTS_SOURCE", "local")
+
+_OVERFLOW = object()
+
+
+class Subscription:
+    def __init__(self, bus, assigned_to, maxsize):
+        self.bus = bus
+        self.assigned_to = assigned_to
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def push(self, event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Libera a fila e deixa só o aviso: o assinante será desconectado.
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_OVERFLOW)
+            self.bus.overflows += 1
+            logging.warning("Assinante de eventos lento desconectado (assigned_to: %s)", self.assigned_to)
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+    async def get(self, timeout: float = None):
+        """Próximo evento; ``None`` se nada chegar em ``timeout``; ``overflow`` encerra a assinatura."""
+        try:
+            event = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if event is _OVERFLOW:
+            return {"type": "overflow"}
+        return event
+
+
+class TaskEventBus:
+    def __init__(self, queue_size: int = TASK_EVENTS_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.published = 0
+        self.overflows = 0
+        # assigned_to -> assinantes; a chave None guarda quem assina todas as tarefas.
+        self._subscribers = {}
+
+    def subscribe(self, assigned_to: str = None) -> Subscription:
+        subscription = Subscription(self, assigned_to, self.queue_size)
+        self._subscribers.setdefault(assigned_to, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.assigned_to)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.assigned_to]
+
+    def publish(self, event: dict, assignees=()):
+        """Entrega ``event`` a quem assina todas as tarefas e aos assinantes de ``assignees``."""
+        self.published += 1
+        targets = set(self._subscribers.get(None, ()))
+        for assignee in assignees:
+            if assignee is not None:
+                targets.update(self._subscribers.get(assignee, ()))
+        for subscription in targets:
+            subscription.push(event)
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+task_events = StorageLocal(TaskEventBus)
+
+
+def _publish_locally() -> bool:
+    return TASK_EVENTS_SOURCE == "local"
+
+
+def publish_created(task: dict):
+    if _publish_locally():
+        task_events.publish({"type": "created", "task": task}, (task.get("assigned_to"),))
+
+
+def publish_updated(task_id: str, changes: dict, previous_assignee: str = None):
+    if _publish_locally():
+        assignees = (previous_assignee, changes.get("assigned_to", previous_assignee))
+        task_events.publish({"type": "updated", "id": task_id, "changes": changes}, assignees)
+
+
+def publish_deleted(task_id: str, previous_assignee: str = None):
+    if _publish_locally():
+        task_events.publish({"type": "deleted", "id": task_id}, (previous_assignee,))
+
+
+def change_to_event(change: dict):
+    """Converte um evento do change stream em ``(evento, assignees)``."""
+    task_id = str(change["documentKey"]["_id"])
+    before = change.get("fullDocumentBeforeChange") or {}
+    after = change.get("fullDocument") or {}
+    operation = change["operationType"]
+    if operation == "insert":
+        return {"type": "created", "task": task_document(after)}, (after.get("assigned_to"),)
+    if operation in ("update", "replace"):
+        changes = dict(change.get("updateDescription", {}).get("updatedFields", {}))
+        changes.pop("version", None)
+        return ({"type": "updated", "id": task_id, "changes": changes},
+                (before.get("assigned_to"), after.get("assigned_to")))
+    if operation == "delete":
+        # Sem pre-images habilitadas na coleção, só quem assina todas as tarefas recebe.
+        return {"type": "deleted", "id": task_id}, (before.get("assigned_to"),)
+    return None, ()
+
+
+class ChangeStreamFeeder:
+    """Lê o change stream da coleção em uma thread e publica no barramento do event loop."""
+
+    def __init__(self, collection, bus: TaskEventBus):
+        self.collection = collection
+        self.bus = bus
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, loop):
+        self._thread = threading.Thread(target=self._run, args=(loop,), name="task-events", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _publish(self, change):
+        event, assignees = change_to_event(change)
+        if event is not None:
+            self.bus.publish(event, assignees)
+
+    def _run(self, loop):
+        resume_token = None
+        while not self._stop.is_set():
+            try:
+                with self.collection.watch(
+                    full_document="updateLookup",
+                    full_document_before_change="whenAvailable",
+                    resume_after=resume_token,
+                    max_await_time_ms=1000
+                ) as stream:
+                    while not self._stop.is_set():
+                        change = stream.try_next()
+                        if change is not None:
+                            loop.call_soon_threadsafe(self._publish, change)
+                        resume_token = stream.resume_token
+            except Exception as e:
+                logging.error("Falha no change stream de tarefas: %s", e)
+                self._stop.wait(1)
+
+
+@register_collector
+def _task_events_metrics():
+    subscribers = Gauge("task_events_subscribers", "Assinantes conectados em GET /tasks/events.")
+    subscribers.set(value=task_events.subscriber_count())
+    published = Counter("task_events_published_total", "Eventos de tarefas publicados no barramento.")
+    published.inc(amount=task_events.published)
+    overflows = Counter("task_events_overflows_total", "Assinantes desconectados por fila cheia.")
+    overflows.inc(amount=task_events.overflows)
+    return [subscribers, published, overflows]
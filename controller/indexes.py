@@ -0,0 +1,134 @@
+"""
+Registro declarativo dos índices das coleções e relatório de planos de consulta.
+
+    python -m controller.indexes           # garante os índices e roda explain() nas consultas quentes
+    python -m controller.indexes --no-ensure
+
+O relatório termina com código 1 se alguma consulta quente cair em COLLSCAN.
+"""
+import argparse
+import logging
+import sys
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+from controller.archive import ARCHIVE_SORT, archive_filter
+from controller.database import db
+
+# Índices das consultas de GET /tasks, nas coleções quente e de arquivo.
+TASK_QUERY_INDEXES = [
+    # Atende o filtro assigned_to e a paginação por _id no mesmo índice.
+    IndexModel([("assigned_to", ASCENDING), ("_id", ASCENDING)], name="assigned_to_id"),
+    # Filtros e ordenações aceitos por GET /tasks (ver controller/task_queries.py).
+    IndexModel([("status", ASCENDING), ("_id", ASCENDING)], name="status_id"),
+    IndexModel([("assigned_to", ASCENDING), ("status", ASCENDING), ("_id", ASCENDING)],
+               name="assigned_to_status_id"),
+    IndexModel([("title", ASCENDING), ("_id", ASCENDING)], name="title_id"),
+    IndexModel([("assigned_to", ASCENDING), ("title", ASCENDING), ("_id", ASCENDING)],
+               name="assigned_to_title_id"),
+    IndexModel([("title", TEXT), ("description", TEXT)], name="title_description_text",
+               weights={"title": 5, "description": 1}, default_language="portuguese"),
+]
+
+INDEXES = {
+    "users": [
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        IndexModel([("username", ASCENDING), ("is_active", ASCENDING)], name="username_is_active"),
+    ],
+    "tasks": TASK_QUERY_INDEXES + [
+        # Seleção das tarefas a arquivar (ver controller/archive.py).
+        IndexModel([("status", ASCENDING), ("updated_at", ASCENDING)], name="status_updated_at"),
+    ],
+    "tasks_archive": TASK_QUERY_INDEXES,
+    "task_counters": [
+        IndexModel([("field", ASCENDING), ("value", ASCENDING)], name="field_value_unique", unique=True),
+    ],
+    "revoked_tokens": [
+        # O Mongo remove o documento assim que o token revogado expiraria.
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "rate_limits": [
+        # Baldes parados somem quando estariam cheios de novo.
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+# Formatos das consultas feitas pelos handlers; os valores são apenas exemplos para o explain().
+HOT_QUERIES = [
+    {"name": "create_user", "collection": "users", "filter": {"username": "x"}},
+    {"name": "login / assignee", "collection": "users", "filter": {"username": "x", "is_active": True}},
+    {"name": "get_current_user", "collection": "users", "filter": {"_id": ObjectId(), "is_active": True}},
+    {"name": "get_user", "collection": "users", "filter": {"_id": ObjectId()}},
+    {"name": "expand=assignee", "collection": "users", "filter": {"username": {"$in": ["x", "y"]}}},
+    {"name": "get_task", "collection": "tasks", "filter": {"_id": ObjectId()}},
+    {"name": "list_tasks", "collection": "tasks", "filter": {}, "sort": [("_id", 1)]},
+    {"name": "list_tasks assigned_to", "collection": "tasks",
+     "filter": {"assigned_to": "x"}, "sort": [("_id", 1)]},
+    {"name": "list_tasks assigned_to after", "collection": "tasks",
+     "filter": {"assigned_to": "x", "_id": {"$gt": ObjectId()}}, "sort": [("_id", 1)]},
+    {"name": "list_tasks status", "collection": "tasks",
+     "filter": {"status": {"$in": ["x", "y"]}}, "sort": [("_id", 1)]},
+    {"name": "list_tasks assigned_to status", "collection": "tasks",
+     "filter": {"assigned_to": "x", "status": "y"}, "sort": [("_id", 1)]},
+    {"name": "list_tasks title_prefix", "collection": "tasks",
+     "filter": {"title": {"$regex": "^x"}}, "sort": [("title", 1), ("_id", 1)]},
+    {"name": "list_tasks assigned_to sort title", "collection": "tasks",
+     "filter": {"assigned_to": "x"}, "sort": [("title", 1), ("_id", 1)]},
+    {"name": "list_tasks q", "collection": "tasks", "filter": {"$text": {"$search": "x"}}},
+    # A mesma consulta dos lotes do TaskArchiver.
+    {"name": "archive tasks", "collection": "tasks",
+     "filter": archive_filter(datetime(2000, 1, 1)), "sort": ARCHIVE_SORT},
+    {"name": "task counters $inc", "collection": "task_counters", "filter": {"field": "status", "value": "x"}},
+]
+
+
+def ensure_indexes(database=db):
+    for collection_name, indexes in INDEXES.items():
+        try:
+            names = database[collection_name].create_indexes(indexes)
+            logging.info("Índices garantidos em %s: %s", collection_name, names)
+        except OperationFailure as e:
+            logging.error("Falha ao criar índices em %s: %s", collection_name, e)
+
+
+def plan_stages(plan) -> list:
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(plan_stages(item))
+    return stages
+
+
+def explain_hot_queries(database=db) -> list:
+    report = []
+    for shape in HOT_QUERIES:
+        cursor = database[shape["collection"]].find(shape["filter"])
+        if shape.get("sort"):
+            cursor = cursor.sort(shape["sort"])
+        plan = cursor.explain()["queryPlanner"]["winningPlan"]
+        stages = plan_stages(plan)
+        report.append({"name": shape["name"], "stages": stages, "collscan": "COLLSCAN" in stages})
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Garante índices e verifica os planos das consultas quentes.")
+    parser.add_argument("--no-ensure", action="store_true", help="apenas roda o explain(), sem criar índices")
+    args = parser.parse_args(argv)
+    if not args.no_ensure:
+        ensure_indexes()
+    report = explain_hot_queries()
+    for entry in report:
+        status = "COLLSCAN" if entry["collscan"] else "ok"
+        print(f"{status:9s} {entry['name']:32s} {' > '.join(entry['stages'])}")
+    return 1 if any(entry["collscan"] for entry in report) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
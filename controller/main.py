@@ -1,17 +1,78 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from logs.logging_config import setup_logging
 from view.users import router as users_router
 from view.tasks import router as tasks_router
+from view.metrics import router as metrics_router
+from view.profiles import router as profiles_router
 from controller.auth_utils import (
     create_access_token,
     get_current_user,
     invalidated_tokens,
     oauth2_scheme
 )
+from controller.archive import TASK_ARCHIVE_INTERVAL_SECONDS, task_archiver
+from controller.assignees import ASSIGNEE_RECONCILE_SECONDS, active_usernames
+from controller.database import current_storage, get_storage, run_in_db_executor
+from controller.events import TASK_EVENTS_SOURCE, ChangeStreamFeeder, task_events
+from controller.indexes import ensure_indexes
+from controller.middleware import (
+    MetricsMiddleware,
+    ProfilingMiddleware,
+    RateLimitMiddleware,
+    RequestIdMiddleware,
+    StorageMiddleware
+)
+from controller.task_stats import TASK_STATS_RECONCILE_SECONDS, task_counters
 
 setup_logging()
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    storage = getattr(app.state, "storage", None) or get_storage()
+    token = current_storage.set(storage)
+    await run_in_db_executor(storage.connect)
+    await run_in_db_executor(ensure_indexes)
+    await active_usernames.warm()
+    await task_counters.warm()
+    background = []
+    if ASSIGNEE_RECONCILE_SECONDS > 0:
+        background.append(asyncio.create_task(active_usernames.reconcile_forever()))
+    if TASK_STATS_RECONCILE_SECONDS > 0:
+        background.append(asyncio.create_task(task_counters.reconcile_forever()))
+    if TASK_ARCHIVE_INTERVAL_SECONDS > 0:
+        background.append(asyncio.create_task(task_archiver.archive_forever()))
+    feeder = None
+    if TASK_EVENTS_SOURCE == "changestream":
+        feeder = ChangeStreamFeeder(storage.collection("tasks"), task_events.current())
+        feeder.start(asyncio.get_running_loop())
+    yield
+    if feeder:
+        await asyncio.to_thread(feeder.stop)
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    await run_in_db_executor(storage.close)
+    current_storage.reset(token)
+
+
+def create_app(storage=None) -> FastAPI:
+    """Cria a aplicação; ``storage`` (ex.: ``MemoryStorage()``) isola os dados desta instância."""
+    app = FastAPI(lifespan=lifespan)
+    app.state.storage = storage
+    app.add_middleware(MetricsMiddleware)
+    app.add_middleware(ProfilingMiddleware)
+    app.add_middleware(RateLimitMiddleware)
+    app.add_middleware(RequestIdMiddleware)
+    if storage is not None:
+        app.add_middleware(StorageMiddleware, storage=storage)
+
+    app.include_router(users_router)
+    app.include_router(tasks_router)
+    app.include_router(metrics_router)
+    app.include_router(profiles_router)
+    return app
+
 
-app.include_router(users_router)
-app.include_router(tasks_router)
\ No newline at end of file
+app = create_app()
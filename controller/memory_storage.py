@@ -0,0 +1,535 @@
+"""
+Motor de armazenamento em memória com a mesma interface de coleção do pymongo.
+
+Implementa apenas o subconjunto usado pela aplicação (filtros com ``$in``,
+``$gt``/``$lt``, ``$regex``, ``$or``/``$and``, ``$text`` e campos aninhados
+com ponto; ``$set``/``$inc``; ordenação, projeção, escritas em lote e
+``$group``, também com ``_id`` composto), guardando os documentos
+em um dict por ``_id``. Campos declarados em ``indexes`` ganham um índice
+secundário (valor -> ids) usado nas consultas por igualdade ou ``$in``.
+
+Serve para testes e benchmarks isolados, sem um mongod: cada processo (ou app)
+tem os seus dados.
+"""
+import datetime
+import os
+import re
+import threading
+from bson import ObjectId
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+# Índices secundários por coleção (além do _id).
+MEMORY_INDEXES = {
+    "users": ("username",),
+    "tasks": ("assigned_to",),
+}
+MEMORY_UNIQUE = {
+    "users": ("username",),
+}
+MEMORY_TEXT_FIELDS = {
+    "tasks": ("title", "description"),
+}
+
+_MISSING = object()
+
+
+def _get_path(doc, key):
+    # "value.assigned_to" -> doc["value"]["assigned_to"]
+    value = doc
+    for part in key.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _compare(op, value, operand) -> bool:
+    if value is _MISSING or value is None:
+        return False
+    try:
+        if op == "$gt":
+            return value > operand
+        if op == "$gte":
+            return value >= operand
+        if op == "$lt":
+            return value < operand
+        return value <= operand
+    except TypeError:
+        return False
+
+
+def _match_value(value, condition) -> bool:
+    if isinstance(condition, dict) and condition and all(str(k).startswith("$") for k in condition):
+        for op, operand in condition.items():
+            if op == "$in":
+                if not any(_match_value(value, item) for item in operand):
+                    return False
+            elif op == "$nin":
+                if any(_match_value(value, item) for item in operand):
+                    return False
+            elif op == "$ne":
+                if _match_value(value, operand):
+                    return False
+            elif op in ("$gt", "$gte", "$lt", "$lte"):
+                if not _compare(op, value, operand):
+                    return False
+            elif op == "$regex":
+                if not isinstance(value, str) or not re.search(operand, value, re.IGNORECASE if "i" in condition.get("$options", "") else 0):
+                    return False
+            elif op == "$options":
+                continue
+            elif op == "$exists":
+                if (value is not _MISSING) != bool(operand):
+                    return False
+            else:
+                raise NotImplementedError(f"Operador não suportado no armazenamento em memória: {op}")
+        return True
+    if condition is None:
+        return value is _MISSING or value is None
+    return value is not _MISSING and value == condition
+
+
+def _sort_key(value):
+    # Ordem do Mongo entre tipos, simplificada: ausente/None < números < strings < ObjectId.
+    if value is _MISSING or value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    if isinstance(value, ObjectId):
+        return (3, value.binary)
+    if isinstance(value, datetime.datetime):
+        return (4, value)
+    return (5, str(value))
+
+
+class MemoryCursor:
+    def __init__(self, docs):
+        self._docs = iter(docs)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._docs)
+
+    def close(self):
+        self._docs = iter(())
+
+
+class MemoryCollection:
+    def __init__(self, name: str, indexes=(), unique=(), text_fields=(), storage=None):
+        self.name = name
+        self.text_fields = tuple(text_fields)
+        self._storage = storage
+        self._docs = {}
+        self._unique = set(unique)
+        self._indexes = {field: {} for field in set(indexes) | self._unique}
+        self._index_names = {"_id_": {"key": [("_id", 1)]}}
+        self._lock = threading.RLock()
+
+    # Índices
+    def _index_add(self, doc):
+        for field, index in self._indexes.items():
+            index.setdefault(doc.get(field), set()).add(doc["_id"])
+
+    def _index_remove(self, doc):
+        for field, index in self._indexes.items():
+            ids = index.get(doc.get(field))
+            if ids is not None:
+                ids.discard(doc["_id"])
+                if not ids:
+                    del index[doc.get(field)]
+
+    def _check_unique(self, doc, ignore_id=None):
+        if doc["_id"] in self._docs and doc["_id"] != ignore_id:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: _id_")
+        for field in self._unique:
+            owners = self._indexes[field].get(doc.get(field), set()) - {ignore_id}
+            if owners and field in doc:
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {field}")
+
+    def create_indexes(self, indexes):
+        names = []
+        for index in indexes:
+            document = index.document
+            keys = list(document["key"].items())
+            self._index_names[document["name"]] = {"key": keys}
+            if len(keys) == 1 and keys[0][1] in (1, -1):
+                field = keys[0][0]
+                with self._lock:
+                    if field not in self._indexes:
+                        self._indexes[field] = {}
+                        for doc in self._docs.values():
+                            self._indexes[field].setdefault(doc.get(field), set()).add(doc["_id"])
+                    if document.get("unique"):
+                        self._unique.add(field)
+            if any(direction == "text" for _, direction in keys):
+                self.text_fields = tuple(field for field, direction in keys if direction == "text")
+            names.append(document["name"])
+        return names
+
+    def index_information(self):
+        return {name: dict(info) for name, info in self._index_names.items()}
+
+    def with_options(self, **options):
+        # Não há réplicas: read preference e afins não mudam nada.
+        return self
+
+    # Consulta
+    def _candidates(self, query):
+        """Ids candidatos usando _id ou um índice secundário; None = varrer tudo."""
+        for field in ("_id",) + tuple(self._indexes):
+            if field not in query:
+                continue
+            condition = query[field]
+            if isinstance(condition, dict) and set(condition) == {"$in"}:
+                values = condition["$in"]
+            elif isinstance(condition, dict) and any(str(k).startswith("$") for k in condition):
+                continue
+            else:
+                values = [condition]
+            if field == "_id":
+                return [v for v in values if v in self._docs]
+            ids = set()
+            for value in values:
+                ids.update(self._indexes[field].get(value, ()))
+            return sorted(ids, key=_sort_key)
+        return None
+
+    def _text_match(self, doc, search) -> bool:
+        terms = [t for t in re.findall(r"\w+", search.lower())]
+        words = set()
+        for field in self.text_fields:
+            if isinstance(doc.get(field), str):
+                words.update(re.findall(r"\w+", doc[field].lower()))
+        return any(term in words for term in terms)
+
+    def _matches(self, doc, query) -> bool:
+        for key, condition in query.items():
+            if key == "$and":
+                if not all(self._matches(doc, sub) for sub in condition):
+                    return False
+            elif key == "$or":
+                if not any(self._matches(doc, sub) for sub in condition):
+                    return False
+            elif key == "$text":
+                if not self._text_match(doc, condition["$search"]):
+                    return False
+            elif not _match_value(_get_path(doc, key), condition):
+                return False
+        return True
+
+    def _find_docs(self, query):
+        query = query or {}
+        ids = self._candidates(query)
+        docs = self._docs.values() if ids is None else (self._docs[i] for i in ids if i in self._docs)
+        return [doc for doc in docs if self._matches(doc, query)]
+
+    @staticmethod
+    def _project(doc, projection):
+        if not projection:
+            return dict(doc)
+        if isinstance(projection, (list, tuple)):
+            projection = {field: 1 for field in projection}
+        include = [f for f, v in projection.items() if v and f != "_id"]
+        if include:
+            result = {f: doc[f] for f in include if f in doc}
+            if projection.get("_id", 1) and "_id" in doc:
+                result["_id"] = doc["_id"]
+            return result
+        return {f: v for f, v in doc.items() if projection.get(f, 1)}
+
+    @staticmethod
+    def _sort(docs, sort):
+        for field, direction in reversed(list(sort or ())):
+            docs.sort(key=lambda d: _sort_key(d.get(field, _MISSING)), reverse=direction == -1)
+        return docs
+
+    def find(self, filter=None, projection=None, sort=None, limit=0, skip=0, **kwargs):
+        with self._lock:
+            docs = self._sort(self._find_docs(filter), sort)
+            if skip:
+                docs = docs[skip:]
+            if limit:
+                docs = docs[:limit]
+            return MemoryCursor([self._project(doc, projection) for doc in docs])
+
+    def find_one(self, filter=None, projection=None, **kwargs):
+        return next(self.find(filter, projection, limit=1, **kwargs), None)
+
+    def count_documents(self, filter, **kwargs):
+        with self._lock:
+            return len(self._find_docs(filter))
+
+    # Escrita
+    def _insert(self, doc):
+        doc.setdefault("_id", ObjectId())
+        stored = dict(doc)
+        self._check_unique(stored)
+        self._docs[stored["_id"]] = stored
+        self._index_add(stored)
+        return stored["_id"]
+
+    def insert_one(self, document, **kwargs):
+        with self._lock:
+            return InsertOneResult(self._insert(document), True)
+
+    def insert_many(self, documents, ordered=True, **kwargs):
+        documents = list(documents)
+        errors, inserted = [], []
+        with self._lock:
+            for index, doc in enumerate(documents):
+                try:
+                    inserted.append(self._insert(doc))
+                except DuplicateKeyError as e:
+                    errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+                    if ordered:
+                        break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted)})
+        return InsertManyResult(inserted, True)
+
+    @staticmethod
+    def _apply(doc, update):
+        updated = dict(doc)
+        for op, fields in update.items():
+            if op == "$set":
+                updated.update(fields)
+            elif op == "$inc":
+                for field, amount in fields.items():
+                    updated[field] = (updated.get(field) or 0) + amount
+            elif op == "$unset":
+                for field in fields:
+                    updated.pop(field, None)
+            else:
+                raise NotImplementedError(f"Operador de atualização não suportado: {op}")
+        return updated
+
+    def _replace(self, old, new):
+        self._check_unique(new, ignore_id=old["_id"])
+        self._index_remove(old)
+        self._docs[new["_id"]] = new
+        self._index_add(new)
+
+    def _upsert_doc(self, filter, update):
+        # Igualdades do filtro viram campos; subdocumentos sem operadores também.
+        base = {
+            k: v for k, v in filter.items()
+            if not k.startswith("$") and not (isinstance(v, dict) and any(str(op).startswith("$") for op in v))
+        }
+        return self._apply(base, update)
+
+    def _update(self, filter, update, many=False, upsert=False, sort=None):
+        docs = self._find_docs(filter)
+        if sort:
+            docs = self._sort(docs, sort)
+        if not many:
+            docs = docs[:1]
+        for doc in docs:
+            self._replace(doc, self._apply(doc, update))
+        if not docs and upsert:
+            upserted_id = self._insert(self._upsert_doc(filter, update))
+            return {"n": 1, "nModified": 0, "upserted": upserted_id, "ok": 1.0}
+        return {"n": len(docs), "nModified": len(docs), "ok": 1.0}
+
+    def _replace_one(self, filter, replacement, upsert=False):
+        docs = self._find_docs(filter)[:1]
+        if docs:
+            self._replace(docs[0], {**replacement, "_id": docs[0]["_id"]})
+            return {"n": 1, "ok": 1.0}
+        if upsert:
+            base = {k: v for k, v in filter.items() if k == "_id"}
+            return {"n": 0, "upserted": self._insert({**base, **replacement}), "ok": 1.0}
+        return {"n": 0, "ok": 1.0}
+
+    def replace_one(self, filter, replacement, upsert=False, **kwargs):
+        with self._lock:
+            raw = self._replace_one(filter, replacement, upsert=upsert)
+            return UpdateResult({**raw, "nModified": raw["n"]}, True)
+
+    def update_one(self, filter, update, upsert=False, **kwargs):
+        with self._lock:
+            return UpdateResult(self._update(filter, update, upsert=upsert), True)
+
+    def update_many(self, filter, update, upsert=False, **kwargs):
+        with self._lock:
+            return UpdateResult(self._update(filter, update, many=True, upsert=upsert), True)
+
+    def find_one_and_update(self, filter, update, projection=None, return_document=ReturnDocument.BEFORE,
+                            upsert=False, sort=None, **kwargs):
+        with self._lock:
+            docs = self._sort(self._find_docs(filter), sort)
+            if not docs:
+                if upsert:
+                    upserted_id = self._insert(self._upsert_doc(filter, update))
+                    if return_document == ReturnDocument.AFTER:
+                        return self._project(self._docs[upserted_id], projection)
+                return None
+            before = docs[0]
+            after = self._apply(before, update)
+            self._replace(before, after)
+            return self._project(after if return_document == ReturnDocument.AFTER else before, projection)
+
+    def _delete(self, filter, many=False):
+        docs = self._find_docs(filter)
+        if not many:
+            docs = docs[:1]
+        for doc in docs:
+            self._index_remove(doc)
+            del self._docs[doc["_id"]]
+        return docs
+
+    def delete_one(self, filter, **kwargs):
+        with self._lock:
+            return DeleteResult({"n": len(self._delete(filter)), "ok": 1.0}, True)
+
+    def delete_many(self, filter, **kwargs):
+        with self._lock:
+            return DeleteResult({"n": len(self._delete(filter, many=True)), "ok": 1.0}, True)
+
+    def find_one_and_delete(self, filter, projection=None, **kwargs):
+        with self._lock:
+            docs = self._delete(filter)
+            return self._project(docs[0], projection) if docs else None
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        result = {"writeErrors": [], "nInserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0,
+                  "nUpserted": 0, "upserted": []}
+        with self._lock:
+            for index, request in enumerate(requests):
+                try:
+                    if isinstance(request, InsertOne):
+                        self._insert(request._doc)
+                        result["nInserted"] += 1
+                    elif isinstance(request, (UpdateOne, UpdateMany)):
+                        raw = self._update(request._filter, request._doc, many=isinstance(request, UpdateMany),
+                                           upsert=bool(request._upsert))
+                        if "upserted" in raw:
+                            result["nUpserted"] += 1
+                            result["upserted"].append({"index": index, "_id": raw["upserted"]})
+                        else:
+                            result["nMatched"] += raw["n"]
+                            result["nModified"] += raw["nModified"]
+                    elif isinstance(request, ReplaceOne):
+                        raw = self._replace_one(request._filter, request._doc, upsert=bool(request._upsert))
+                        if "upserted" in raw:
+                            result["nUpserted"] += 1
+                            result["upserted"].append({"index": index, "_id": raw["upserted"]})
+                        else:
+                            result["nMatched"] += raw["n"]
+                            result["nModified"] += raw["n"]
+                    elif isinstance(request, (DeleteOne, DeleteMany)):
+                        result["nRemoved"] += len(self._delete(request._filter, many=isinstance(request, DeleteMany)))
+                    else:
+                        raise NotImplementedError(f"Operação não suportada: {type(request).__name__}")
+                except DuplicateKeyError as e:
+                    result["writeErrors"].append({"index": index, "code": 11000, "errmsg": str(e)})
+                    if ordered:
+                        break
+        if result["writeErrors"]:
+            raise BulkWriteError(result)
+        return BulkWriteResult(result, True)
+
+    # Agregação
+    def aggregate(self, pipeline, **kwargs):
+        with self._lock:
+            docs = [dict(doc) for doc in self._docs.values()]
+        for stage in pipeline:
+            (name, spec), = stage.items()
+            if name == "$match":
+                matcher = MemoryCollection(self.name, text_fields=self.text_fields)
+                docs = [doc for doc in docs if matcher._matches(doc, spec)]
+            elif name == "$group":
+                docs = self._group(docs, spec)
+            elif name == "$sort":
+                docs = self._sort(docs, list(spec.items()))
+            elif name == "$limit":
+                docs = docs[:spec]
+            elif name == "$project":
+                docs = [self._project(doc, spec) for doc in docs]
+            else:
+                raise NotImplementedError(f"Estágio não suportado no armazenamento em memória: {name}")
+        return MemoryCursor(docs)
+
+    @staticmethod
+    def _group(docs, spec):
+        def value_of(doc, expression):
+            if isinstance(expression, str) and expression.startswith("$"):
+                return doc.get(expression[1:])
+            if isinstance(expression, dict):
+                return {name: value_of(doc, sub) for name, sub in expression.items()}
+            return expression
+
+        groups = {}
+        for doc in docs:
+            key = value_of(doc, spec["_id"])
+            hashable = tuple(key.items()) if isinstance(key, dict) else key
+            group = groups.setdefault(hashable, {"_id": key})
+            for field, accumulator in spec.items():
+                if field == "_id":
+                    continue
+                (op, expression), = accumulator.items()
+                if op != "$sum":
+                    raise NotImplementedError(f"Acumulador não suportado: {op}")
+                group[field] = group.get(field, 0) + (value_of(doc, expression) or 0)
+        return list(groups.values())
+
+    def drop(self):
+        with self._lock:
+            self._docs.clear()
+            for index in self._indexes.values():
+                index.clear()
+        if self._storage is not None:
+            self._storage.drop_collection(self.name)
+
+    def watch(self, *args, **kwargs):
+        raise NotImplementedError("O armazenamento em memória não tem change streams")
+
+
+class MemoryStorage:
+    """Conjunto de coleções em memória de uma instância da aplicação."""
+
+    def __init__(self):
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def collection(self, name: str) -> MemoryCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            with self._lock:
+                collection = self._collections.get(name)
+                if collection is None:
+                    collection = self._collections[name] = MemoryCollection(
+                        name,
+                        indexes=MEMORY_INDEXES.get(name, ()),
+                        unique=MEMORY_UNIQUE.get(name, ()),
+                        text_fields=MEMORY_TEXT_FIELDS.get(name, ()),
+                        storage=self
+                    )
+        return collection
+
+    __getitem__ = collection
+
+    def database(self):
+        return self
+
+    def list_collection_names(self):
+        return list(self._collections)
+
+    def drop_collection(self, name: str):
+        with self._lock:
+            self._collections.pop(name, None)
+
+    def connect(self):
+        pass
+
+    def close(self):
+        pass
+
+    def cache_namespace(self) -> str:
+        # Os dados são só desta instância, então o cache compartilhado também.
+        return f"memory-{os.getpid()}-{id(self)}"
@@ -0,0 +1,138 @@
+"""
+Métricas em memória no formato de exposição do Prometheus.
+
+Implementação mínima (contadores, gauges e histogramas com rótulos) para não
+depender do prometheus_client. Cada worker mantém as suas próprias séries.
+"""
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        for label_values, value in self._values.items():
+            yield f"{self.name}{_labels(self.labels, label_values)} {value}"
+
+
+class Gauge(Counter):
+    def dec(self, *label_values, amount: float = 1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, *label_values, value: float):
+        self._values[label_values] = value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} gauge"
+        for label_values, value in self._values.items():
+            yield f"{self.name}{_labels(self.labels, label_values)} {value}"
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}
+
+    def observe(self, value: float, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            # Contagens por bucket (não cumulativas) + soma + total.
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, *label_values):
+        series = self._series.get(label_values)
+        return series[2] if series else 0
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        for label_values, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                labels = _labels(self.labels + ("le",), label_values + (str(bound),))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, label_values)} {total}"
+            yield f"{self.name}_count{_labels(self.labels, label_values)} {count}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Latência das requisições HTTP por rota.", ("method", "route", "status")
+)
+http_requests_in_flight = Gauge("http_requests_in_flight", "Requisições HTTP em andamento.")
+db_operation_duration = Histogram(
+    "mongo_operation_duration_seconds",
+    "Duração de cada ida ao Mongo por coleção, operação e formato da consulta.",
+    ("collection", "operation", "shape")
+)
+auth_token_decode_duration = Histogram(
+    "auth_token_decode_seconds", "Tempo de decodificação do JWT (apenas misses do cache)."
+)
+
+_metrics = [http_request_duration, http_requests_in_flight, db_operation_duration, auth_token_decode_duration]
+# Funções chamadas na hora da coleta, para expor estatísticas mantidas por outros módulos.
+_collectors = []
+
+
+def register(metric):
+    _metrics.append(metric)
+    return metric
+
+
+def register_collector(collector):
+    _collectors.append(collector)
+    return collector
+
+
+def query_shape(query) -> str:
+    """Formato da consulta sem os valores: ``{"_id": {"$gt": x}, "a": 1}`` vira ``_id:$gt,a``."""
+    if not isinstance(query, dict) or not query:
+        return "-"
+    parts = []
+    for key, value in query.items():
+        if isinstance(value, dict) and value and all(str(k).startswith("$") for k in value):
+            parts.append(f"{key}:{'|'.join(sorted(value))}")
+        else:
+            parts.append(str(key))
+    return ",".join(sorted(parts))
+
+
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        for metric in collector():
+            lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
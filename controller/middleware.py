@@ -0,0 +1,170 @@
+import asyncio
+import math
+import time
+import uuid
+from controller.database import current_storage
+from controller.metrics import http_request_duration, http_requests_in_flight
+from controller.profiling import (
+    ProfileStore,
+    current_timings,
+    profile_store,
+    save_profile,
+    should_profile,
+    start_profiler,
+    stop_profiler
+)
+from controller.rate_limit import RateLimiter, client_ip, ip_limiter
+from logs.logging_config import request_id_var
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+
+class RequestIdMiddleware:
+    """Propaga o X-Request-ID recebido (ou gera um) para os logs e para a resposta."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                request_id = value.decode("latin-1")[:128]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(REQUEST_ID_HEADER, request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
+
+
+class MetricsMiddleware:
+    """Mede latência por rota (template do path, não o path concreto) e requisições em andamento."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            http_request_duration.observe(time.perf_counter() - start, scope["method"], path, str(status["code"]))
+
+
+class StorageMiddleware:
+    """Faz as requisições (HTTP e WebSocket) usarem o armazenamento desta instância da aplicação."""
+
+    def __init__(self, app, storage):
+        self.app = app
+        self.storage = storage
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        token = current_storage.set(self.storage)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_storage.reset(token)
+
+
+class ProfilingMiddleware:
+    """Perfila as requisições marcadas com X-Profile ou sorteadas (ver controller/profiling.py)."""
+
+    def __init__(self, app, store: ProfileStore = profile_store, sample_rate: float = None):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        # Os endpoints de download usam o mesmo cabeçalho e não são perfilados.
+        if (scope["type"] != "http" or scope["path"].startswith("/debug/profiles")
+                or not should_profile(scope["headers"], self.sample_rate)):
+            await self.app(scope, receive, send)
+            return
+        profile_id = self.store.new_id(request_id_var.get())
+        status = {"code": 500}
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        timings = {}
+        token = current_timings.set(timings)
+        profiler = start_profiler()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            total = time.perf_counter() - start
+            stop_profiler(profiler)
+            current_timings.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            summary = {
+                "id": profile_id,
+                "request_id": request_id_var.get(),
+                "method": scope["method"],
+                "route": route,
+                "path": scope["path"],
+                "status": status["code"],
+                "started_at": time.time() - total,
+                "total_ms": round(total * 1000, 3),
+                "breakdown_ms": {kind: round(seconds * 1000, 3) for kind, seconds in sorted(timings.items())},
+                "cprofile": profiler is not None,
+            }
+            await asyncio.to_thread(save_profile, self.store, profile_id, summary, profiler)
+
+
+class RateLimitMiddleware:
+    """Limite por IP em todas as rotas (``RATE_LIMIT_IP``), antes do roteamento e de qualquer acesso ao banco."""
+
+    def __init__(self, app, limiter: RateLimiter = ip_limiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.limiter.enabled:
+            await self.app(scope, receive, send)
+            return
+        retry_after = await self.limiter.check(client_ip(scope))
+        if not retry_after:
+            await self.app(scope, receive, send)
+            return
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"retry-after", str(math.ceil(retry_after)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": b'{"detail":"Too many requests"}'})
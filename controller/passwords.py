@@ -0,0 +1,117 @@
+"""
+Hash de senhas com scrypt (hashlib), executado fora do event loop.
+
+Cada hash/verificação custa dezenas de milissegundos de CPU, então roda em um
+pool limitado (threads por padrão: o scrypt do OpenSSL libera o GIL). Senhas
+antigas gravadas em texto puro continuam aceitas e são convertidas no login.
+
+Formato gravado: ``scrypt$<n>$<r>$<p>$<salt base64>$<hash base64>``.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from controller.profiling import timed
+
+# Custo do scrypt: n (potência de 2) x r define CPU e memória (128 * n * r bytes).
+PASSWORD_HASH_N = int(os.getenv("PASSWORD_HASH_N", str(2 ** 14)))
+PASSWORD_HASH_R = int(os.getenv("PASSWORD_HASH_R", "8"))
+PASSWORD_HASH_P = int(os.getenv("PASSWORD_HASH_P", "1"))
+# "thread" (padrão), "process" ou "off" (calcula no próprio event loop).
+PASSWORD_POOL_KIND = os.getenv("PASSWORD_POOL_KIND", "thread")
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", str(os.cpu_count() or 2)))
+
+SCHEME = "scrypt"
+_SALT_BYTES = 16
+_KEY_BYTES = 32
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        password.encode("utf-8"), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 1024 * 1024, dklen=_KEY_BYTES
+    )
+
+
+def hash_password(password: str, n: int = None, r: int = None, p: int = None) -> str:
+    n = n or PASSWORD_HASH_N
+    r = r or PASSWORD_HASH_R
+    p = p or PASSWORD_HASH_P
+    salt = secrets.token_bytes(_SALT_BYTES)
+    return f"{SCHEME}${n}${r}${p}${_b64(salt)}${_b64(_scrypt(password, salt, n, r, p))}"
+
+
+# Hash que nenhuma senha satisfaz, com o custo atual: conferido quando o usuário não
+# existe, para que a resposta não revele pelo tempo se o username está cadastrado.
+DUMMY_HASH = (f"{SCHEME}${PASSWORD_HASH_N}${PASSWORD_HASH_R}${PASSWORD_HASH_P}$"
+              f"{_b64(secrets.token_bytes(_SALT_BYTES))}${_b64(secrets.token_bytes(_KEY_BYTES))}")
+
+
+def is_hashed(stored: str) -> bool:
+    return isinstance(stored, str) and stored.startswith(SCHEME + "$")
+
+
+def verify_password(password: str, stored: str) -> bool:
+    if not is_hashed(stored):
+        # Registro antigo em texto puro.
+        return isinstance(stored, str) and hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+    try:
+        _, n, r, p, salt, expected = stored.split("$")
+        key = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(key, base64.b64decode(expected))
+
+
+def needs_rehash(stored: str) -> bool:
+    """Texto puro ou parâmetros de custo diferentes dos atuais."""
+    if not is_hashed(stored):
+        return True
+    try:
+        _, n, r, p, _, _ = stored.split("$")
+    except ValueError:
+        return True
+    return (int(n), int(r), int(p)) != (PASSWORD_HASH_N, PASSWORD_HASH_R, PASSWORD_HASH_P)
+
+
+def _make_executor():
+    if PASSWORD_POOL_KIND == "off":
+        return None
+    if PASSWORD_POOL_KIND == "process":
+        return ProcessPoolExecutor(max_workers=PASSWORD_POOL_WORKERS)
+    return ThreadPoolExecutor(max_workers=PASSWORD_POOL_WORKERS, thread_name_prefix="password")
+
+
+password_executor = _make_executor()
+
+
+def _reset_after_fork():
+    global password_executor
+    password_executor = _make_executor()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+async def run_in_password_pool(fn, *args):
+    with timed("password"):
+        if password_executor is None:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(password_executor, fn, *args)
+
+
+async def hash_password_async(password: str) -> str:
+    return await run_in_password_pool(hash_password, password)
+
+
+async def verify_password_async(password: str, stored: str) -> bool:
+    if not is_hashed(stored):
+        # Comparação simples, não vale a ida ao pool.
+        return verify_password(password, stored)
+    return await run_in_password_pool(verify_password, password, stored)
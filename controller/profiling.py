@@ -0,0 +1,171 @@
+"""
+Perfil de requisições sob demanda.
+
+Uma requisição é perfilada quando traz o cabeçalho ``X-Profile`` com o valor de
+``PROFILE_TOKEN`` ou quando é sorteada por ``PROFILE_SAMPLE_RATE``. Para cada
+uma são gravados em ``PROFILE_DIR`` um ``<id>.prof`` (cProfile, abra com
+``pstats`` ou ``snakeviz``) e um ``<id>.json`` com o tempo gasto no Mongo, em
+JWT, em hash de senha e em serialização, além das funções mais caras. Só os
+``PROFILE_MAX_FILES`` perfis mais recentes são mantidos.
+
+O cProfile mede a thread do event loop: o que outras requisições executarem no
+loop durante a perfilada também aparece. Só uma requisição por processo é
+perfilada com cProfile de cada vez; as demais sorteadas ficam só com os tempos.
+"""
+import cProfile
+import hmac
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Valor esperado no cabeçalho X-Profile; vazio desliga o gatilho por cabeçalho e o download.
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+# Fração das requisições perfiladas sem o cabeçalho (0 desliga, 0.01 = 1%).
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "logs/profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+PROFILE_TOP_FUNCTIONS = 25
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_NAME = re.compile(r"^\d+-[A-Za-z0-9_-]+\.(prof|json)$")
+
+# Tempos por categoria da requisição perfilada atual; None fora de uma.
+current_timings = ContextVar("profile_timings", default=None)
+
+_profiler_lock = threading.Lock()
+
+
+def record_timing(kind: str, seconds: float):
+    timings = current_timings.get()
+    if timings is not None:
+        timings[kind] = timings.get(kind, 0.0) + seconds
+
+
+@contextmanager
+def timed(kind: str):
+    if current_timings.get() is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timing(kind, time.perf_counter() - start)
+
+
+def authorized(value: str) -> bool:
+    return bool(PROFILE_TOKEN) and hmac.compare_digest(value.encode("latin-1"), PROFILE_TOKEN.encode("latin-1"))
+
+
+def should_profile(headers, sample_rate: float = None) -> bool:
+    for name, value in headers:
+        if name == PROFILE_HEADER:
+            return authorized(value.decode("latin-1"))
+    sample_rate = PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+    return sample_rate > 0 and random.random() < sample_rate
+
+
+def start_profiler():
+    """Liga o cProfile, ou devolve ``None`` se outra requisição já estiver sendo perfilada."""
+    if not _profiler_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def stop_profiler(profiler):
+    if profiler is not None:
+        profiler.disable()
+        _profiler_lock.release()
+
+
+def top_functions(profiler, limit: int = PROFILE_TOP_FUNCTIONS) -> list:
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+        rows.append({
+            "function": f"{filename}:{line}({function})",
+            "calls": calls,
+            "own_ms": round(own * 1000, 3),
+            "cumulative_ms": round(cumulative * 1000, 3),
+        })
+    return sorted(rows, key=lambda row: row["cumulative_ms"], reverse=True)[:limit]
+
+
+class ProfileStore:
+    """Anel de perfis em disco: grava um par ``.prof``/``.json`` por requisição e apaga os mais antigos."""
+
+    def __init__(self, directory: str = PROFILE_DIR, max_files: int = PROFILE_MAX_FILES):
+        self.directory = directory
+        self.max_files = max_files
+
+    @staticmethod
+    def new_id(request_id: str) -> str:
+        return f"{time.time_ns() // 1000:016d}-{re.sub(r'[^A-Za-z0-9_-]', '', request_id)[:32] or 'req'}"
+
+    def save(self, profile_id: str, summary: dict, profiler=None):
+        os.makedirs(self.directory, exist_ok=True)
+        if profiler is not None:
+            profiler.dump_stats(os.path.join(self.directory, profile_id + ".prof"))
+            summary = {**summary, "top_functions": top_functions(profiler)}
+        with open(os.path.join(self.directory, profile_id + ".json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        self.prune()
+
+    def ids(self) -> list:
+        """Ids dos perfis gravados, do mais recente para o mais antigo."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted((name[:-5] for name in names if PROFILE_NAME.match(name) and name.endswith(".json")),
+                      reverse=True)
+
+    def prune(self):
+        for profile_id in self.ids()[self.max_files:]:
+            for extension in (".json", ".prof"):
+                try:
+                    os.remove(os.path.join(self.directory, profile_id + extension))
+                except FileNotFoundError:
+                    # Outro worker já apagou.
+                    pass
+
+    def summaries(self) -> list:
+        result = []
+        for profile_id in self.ids():
+            try:
+                with open(os.path.join(self.directory, profile_id + ".json"), encoding="utf-8") as f:
+                    summary = json.load(f)
+            except (FileNotFoundError, ValueError):
+                continue
+            summary.pop("top_functions", None)
+            result.append(summary)
+        return result
+
+    def path(self, name: str):
+        """Caminho de um arquivo do anel, ou ``None`` para nomes inválidos ou já apagados."""
+        if not PROFILE_NAME.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+
+profile_store = ProfileStore()
+
+
+def save_profile(store: ProfileStore, profile_id: str, summary: dict, profiler=None):
+    try:
+        store.save(profile_id, summary, profiler)
+        logging.info("Perfil %s gravado: %s %s em %.1f ms",
+                     profile_id, summary["method"], summary["route"], summary["total_ms"])
+    except OSError as e:
+        logging.error("Falha ao gravar o perfil %s: %s", profile_id, e)
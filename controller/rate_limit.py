@@ -0,0 +1,210 @@
+"""
+Limite de taxa por token bucket.
+
+Cada chave (username ou IP) tem um balde com ``burst`` fichas que se
+recompõem a ``burst / per_seconds`` fichas por segundo; cada requisição gasta
+uma. O estado de uma chave é só ``(fichas, instante)``, e um balde parado por
+``per_seconds`` já estaria cheio, então é descartado sem mudar o resultado.
+
+``POST /auth/login`` é limitado por IP e por username antes de qualquer acesso
+ao banco; ``RATE_LIMIT_IP`` limita também todas as rotas por IP. Com
+``RATE_LIMIT_BACKEND=mongo`` os baldes ficam numa coleção compartilhada entre
+os workers (com índice TTL); uma chave recusada fica bloqueada localmente até
+poder passar de novo, então uma rajada recusada não vira carga no Mongo.
+"""
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pymongo.errors import DuplicateKeyError
+from controller.cache import TTLCache
+from controller.database import async_rate_limits_collection
+from controller.metrics import Counter, register_collector
+
+# "<tentativas>/<segundos>"; vazio desliga o limite.
+LOGIN_RATE_LIMIT_IP = os.getenv("LOGIN_RATE_LIMIT_IP", "20/60")
+LOGIN_RATE_LIMIT_USERNAME = os.getenv("LOGIN_RATE_LIMIT_USERNAME", "5/60")
+# Limite por IP em todas as rotas, ex.: "100/1".
+RATE_LIMIT_IP = os.getenv("RATE_LIMIT_IP", "")
+# "memory" vale só para o processo atual; "mongo" é compartilhado entre workers.
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+# Máximo de chaves por limite no backend em memória; acima disso, descarta as menos recentes.
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Quantos proxies confiáveis acrescentam seu par a X-Forwarded-For; 0 usa o IP da conexão.
+# RATE_LIMIT_TRUST_FORWARDED=1 equivale a um proxy.
+RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv(
+    "RATE_LIMIT_TRUSTED_PROXIES", "1" if os.getenv("RATE_LIMIT_TRUST_FORWARDED", "0") == "1" else "0"
+))
+
+MONGO_RATE_LIMIT_RETRIES = 3
+
+
+def parse_rate(spec: str):
+    """``"5/60"`` -> ``(5, 60.0)``; ``None`` para limite desligado."""
+    if not spec:
+        return None
+    burst, seconds = spec.split("/", 1)
+    return int(burst), float(seconds)
+
+
+def refill(tokens: float, updated: float, now: float, burst: int, rate: float) -> float:
+    return min(burst, tokens + max(0.0, now - updated) * rate)
+
+
+class InMemoryRateLimitStore:
+    """Baldes do processo, em ordem de último uso, para expirar os parados pela frente do dict."""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS, clock=time.monotonic):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets = OrderedDict()
+
+    def _expire(self, now: float, idle: float):
+        while self._buckets:
+            key, (_, updated) = next(iter(self._buckets.items()))
+            if now - updated < idle:
+                break
+            del self._buckets[key]
+
+    def take_now(self, key: str, burst: int, per_seconds: float) -> float:
+        now = self._clock()
+        self._expire(now, per_seconds)
+        rate = burst / per_seconds
+        state = self._buckets.pop(key, None)
+        tokens = burst if state is None else refill(state[0], state[1], now, burst, rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return 0.0 if allowed else (1 - tokens) / rate
+
+    async def take(self, key: str, burst: int, per_seconds: float) -> float:
+        return self.take_now(key, burst, per_seconds)
+
+    def clear(self):
+        self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class MongoRateLimitStore:
+    """
+    Baldes numa coleção compartilhada, atualizados com compare-and-set em ``updated``.
+
+    Chaves recusadas ficam em um cache local até o ``Retry-After``, sem ir ao banco.
+    """
+
+    def __init__(self, collection, blocked_cache_size: int = RATE_LIMIT_MAX_KEYS, clock=time.time):
+        self.collection = collection
+        self._clock = clock
+        self._blocked = TTLCache(maxsize=blocked_cache_size, ttl=60)
+
+    def _document(self, tokens: float, now: float, burst: int, rate: float) -> dict:
+        full_at = now + (burst - tokens) / rate
+        return {"tokens": tokens, "updated": now, "expires_at": datetime.fromtimestamp(full_at, tz=timezone.utc)}
+
+    async def take(self, key: str, burst: int, per_seconds: float) -> float:
+        rate = burst / per_seconds
+        now = self._clock()
+        blocked_until = self._blocked.get(key)
+        if blocked_until is not None and blocked_until > now:
+            return blocked_until - now
+        for _ in range(MONGO_RATE_LIMIT_RETRIES):
+            doc = await self.collection.find_one({"_id": key})
+            tokens = burst if doc is None else refill(doc["tokens"], doc["updated"], now, burst, rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            update = self._document(tokens, now, burst, rate)
+            if doc is None:
+                try:
+                    await self.collection.insert_one({"_id": key, **update})
+                except DuplicateKeyError:
+                    continue
+            else:
+                result = await self.collection.update_one({"_id": key, "updated": doc["updated"]}, {"$set": update})
+                if not result.matched_count:
+                    # Outro worker atualizou o balde entre a leitura e a escrita.
+                    continue
+            if allowed:
+                return 0.0
+            retry_after = (1 - tokens) / rate
+            self._blocked.set(key, now + retry_after, ttl=retry_after)
+            return retry_after
+        # Disputa contínua pela mesma chave: recusa em vez de liberar sem contar.
+        return 1 / rate
+
+
+def create_store(backend: str = RATE_LIMIT_BACKEND):
+    if backend == "mongo":
+        return MongoRateLimitStore(async_rate_limits_collection)
+    if backend == "memory":
+        return InMemoryRateLimitStore()
+    raise ValueError(f"RATE_LIMIT_BACKEND inválido: {backend}")
+
+
+class RateLimiter:
+    def __init__(self, name: str, spec: str, store=None):
+        self.name = name
+        self.rate = parse_rate(spec)
+        self.store = store if store is not None else create_store()
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate is not None
+
+    async def check(self, key: str) -> float:
+        """0 se a requisição pode seguir; senão, segundos até a próxima ficha."""
+        if self.rate is None:
+            return 0.0
+        retry_after = await self.store.take(f"{self.name}:{key}", *self.rate)
+        if retry_after:
+            self.rejected += 1
+            logging.warning("Limite de taxa %s atingido para %s", self.name, key)
+        return retry_after
+
+
+login_ip_limiter = RateLimiter("login_ip", LOGIN_RATE_LIMIT_IP)
+login_username_limiter = RateLimiter("login_username", LOGIN_RATE_LIMIT_USERNAME)
+ip_limiter = RateLimiter("ip", RATE_LIMIT_IP)
+
+
+def client_ip(scope) -> str:
+    """
+    IP da chave de limite. Atrás de ``RATE_LIMIT_TRUSTED_PROXIES`` proxies, conta os
+    endereços de X-Forwarded-For pela direita: os da esquerda vêm do cliente e podem ser forjados.
+    """
+    if RATE_LIMIT_TRUSTED_PROXIES:
+        forwarded = [
+            address.strip()
+            for name, value in scope.get("headers", ())
+            if name == b"x-forwarded-for"
+            for address in value.decode("latin-1").split(",")
+        ]
+        forwarded = [address for address in forwarded if address]
+        # Com menos endereços que proxies, o cabeçalho não passou por todos eles.
+        if len(forwarded) >= RATE_LIMIT_TRUSTED_PROXIES:
+            return forwarded[-RATE_LIMIT_TRUSTED_PROXIES]
+    client = scope.get("client")
+    return client[0] if client else "-"
+
+
+async def check_login(username: str, ip: str) -> float:
+    """Confere o IP e, se ele passar, o username; devolve o Retry-After (0 = liberado)."""
+    retry_after = await login_ip_limiter.check(ip)
+    if retry_after:
+        return retry_after
+    return await login_username_limiter.check(username)
+
+
+@register_collector
+def _rate_limit_metrics():
+    rejected = Counter("rate_limit_rejected_total", "Requisições recusadas pelo limite de taxa.", ("limiter",))
+    for limiter in (login_ip_limiter, login_username_limiter, ip_limiter):
+        rejected.inc(limiter.name, amount=limiter.rejected)
+    return [rejected]
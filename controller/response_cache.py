@@ -0,0 +1,218 @@
+import asyncio
+import os
+import json
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from controller.cache import TTLCache
+from controller.database import StorageLocal, get_storage
+from controller.metrics import Counter, register_collector
+
+# "memory" (padrão): LRU por processo; "sqlite": arquivo local compartilhado pelos
+# workers da mesma máquina; "off": desliga o cache.
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+RESPONSE_CACHE_MAX_SIZE = int(os.getenv("RESPONSE_CACHE_MAX_SIZE", "10000"))
+RESPONSE_CACHE_SQLITE_PATH = os.getenv("RESPONSE_CACHE_SQLITE_PATH", "/tmp/grau_b_response_cache.sqlite3")
+
+
+class SqliteCacheBackend:
+    """
+    Cache em um arquivo SQLite local, visível para todos os workers da máquina.
+
+    Mesma interface do ``TTLCache``, mas os valores precisam ser serializáveis
+    em JSON. As chaves levam ``prefix`` (um por armazenamento), então
+    armazenamentos diferentes na mesma máquina não veem as entradas uns dos
+    outros. As entradas expiradas são ignoradas na leitura e removidas
+    periodicamente, junto com as mais antigas além de ``maxsize`` (contado no
+    arquivo todo). O acesso ao arquivo é bloqueante: o ``ReadThroughCache`` o
+    faz em ``executor``, uma única thread, para não travar o event loop.
+
+    A conexão e o executor são abertos no primeiro uso de cada processo: um
+    worker criado por fork a partir do mestre (``controller.server``) não
+    herda a conexão SQLite nem a thread do pai.
+    """
+
+    def __init__(self, path: str, maxsize: int, ttl: float, prefix: str = ""):
+        self.path = path
+        self.prefix = prefix
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._conn = None
+        self._conn_pid = None
+        self._executor = None
+        self._executor_pid = None
+        # Conexões herdadas do pai: nem usadas nem fechadas no filho (fechar mexe no WAL do pai).
+        self._inherited = []
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        if self._conn_pid != os.getpid():
+            if self._conn is not None:
+                self._inherited.append(self._conn)
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=1)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+            self._conn, self._conn_pid = conn, os.getpid()
+        return self._conn
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-cache")
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def get(self, key, default=None):
+        row = self._db.execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (self.prefix + key, time.time())
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl: float = None):
+        ttl = self.ttl if ttl is None else ttl
+        self._db.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (self.prefix + key, json.dumps(value), time.time() + ttl)
+        )
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            self._evict()
+
+    def _evict(self):
+        self._db.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        self._db.execute(
+            "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires_at LIMIT "
+            "max(0, (SELECT count(*) FROM cache) - ?))",
+            (self.maxsize,)
+        )
+
+    def pop(self, key, default=None):
+        self._db.execute("DELETE FROM cache WHERE key = ?", (self.prefix + key,))
+        return default
+
+    def clear(self):
+        self._db.execute("DELETE FROM cache WHERE substr(key, 1, ?) = ?", (len(self.prefix), self.prefix))
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": self._db.execute(
+                "SELECT count(*) FROM cache WHERE substr(key, 1, ?) = ?", (len(self.prefix), self.prefix)
+            ).fetchone()[0],
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+class ReadThroughCache:
+    """
+    Cache de leitura por id: em um miss chama ``loader`` e guarda o resultado.
+
+    Requisições simultâneas pela mesma chave esperam uma única carga
+    (single-flight), evitando que uma entrada expirada vire uma rajada de
+    consultas iguais ao banco. ``None`` (documento inexistente) não é guardado.
+    """
+
+    def __init__(self, namespace: str, backend=None):
+        self.namespace = namespace
+        self.backend = backend
+        self.coalesced = 0
+        self._inflight = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def _key(self, key) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def _call(self, name: str, *args):
+        # Backends com I/O bloqueante (SQLite) expõem um executor; a ordem das
+        # chamadas é preservada porque ele tem uma única thread.
+        method = getattr(self.backend, name)
+        executor = getattr(self.backend, "executor", None)
+        if executor is None:
+            return method(*args)
+        return await asyncio.get_running_loop().run_in_executor(executor, method, *args)
+
+    async def get_or_load(self, key, loader):
+        if self.backend is None:
+            return await loader()
+        cache_key = self._key(key)
+        value = await self._call("get", cache_key)
+        if value is not None:
+            return value
+        inflight = self._inflight.get(cache_key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
+        try:
+            value = await loader()
+            if value is not None and self._inflight.get(cache_key) is future:
+                await self._call("set", cache_key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            # Evita o aviso de exceção não recuperada quando ninguém estava esperando.
+            future.exception()
+            raise
+        finally:
+            if self._inflight.get(cache_key) is future:
+                del self._inflight[cache_key]
+
+    async def invalidate(self, key):
+        cache_key = self._key(key)
+        # Uma carga em andamento pode ter lido o valor antigo: não deixa que ela grave.
+        self._inflight.pop(cache_key, None)
+        if self.backend is not None:
+            await self._call("pop", cache_key)
+
+    def stats(self) -> dict:
+        stats = self.backend.stats() if self.backend is not None else {"hits": 0, "misses": 0, "hit_ratio": 0.0}
+        return {**stats, "coalesced": self.coalesced}
+
+
+def _make_backend():
+    if RESPONSE_CACHE_BACKEND == "off":
+        return None
+    if RESPONSE_CACHE_BACKEND == "sqlite":
+        # O arquivo é da máquina; o prefixo separa as entradas de cada armazenamento.
+        return SqliteCacheBackend(
+            RESPONSE_CACHE_SQLITE_PATH, RESPONSE_CACHE_MAX_SIZE, RESPONSE_CACHE_TTL_SECONDS,
+            prefix=f"{get_storage().cache_namespace()}:"
+        )
+    return TTLCache(maxsize=RESPONSE_CACHE_MAX_SIZE, ttl=RESPONSE_CACHE_TTL_SECONDS)
+
+
+# Um cache por armazenamento: apps com create_app(storage=...) não veem as entradas umas das outras.
+task_response_cache = StorageLocal(lambda: ReadThroughCache("task", _make_backend()))
+user_response_cache = StorageLocal(lambda: ReadThroughCache("user", _make_backend()))
+
+
+@register_collector
+def _response_cache_metrics():
+    hits = Counter("response_cache_hits_total", "Acertos do cache de respostas por recurso.", ("resource",))
+    misses = Counter("response_cache_misses_total", "Falhas do cache de respostas por recurso.", ("resource",))
+    coalesced = Counter(
+        "response_cache_coalesced_total", "Leituras que aguardaram uma carga já em andamento.", ("resource",)
+    )
+    for cache in (task_response_cache, user_response_cache):
+        stats = cache.stats()
+        hits.inc(cache.namespace, amount=stats["hits"])
+        misses.inc(cache.namespace, amount=stats["misses"])
+        coalesced.inc(cache.namespace, amount=cache.coalesced)
+    return [hits, misses, coalesced]
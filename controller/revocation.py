@@ -0,0 +1,94 @@
+import heapq
+import time
+from datetime import datetime, timezone
+from controller.cache import TTLCache
+
+
+class InMemoryRevocationStore:
+    """
+    Tokens revogados por ``jti`` dentro do processo.
+
+    Cada entrada guarda o ``exp`` do token e é descartada depois dele, então o
+    consumo de memória acompanha só os tokens revogados que ainda seriam válidos.
+    Os jtis são agrupados por segundo de expiração para a limpeza não precisar
+    de uma estrutura ordenada por token.
+    """
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._expires = {}
+        self._buckets = {}
+        self._bucket_heap = []
+
+    def _prune(self):
+        now = self._clock()
+        while self._bucket_heap and self._bucket_heap[0] <= now:
+            second = heapq.heappop(self._bucket_heap)
+            for jti in self._buckets.pop(second):
+                if self._expires.get(jti) == second:
+                    del self._expires[jti]
+
+    def add(self, jti: str, exp: float):
+        self._prune()
+        second = int(exp)
+        if second <= self._clock():
+            return
+        self._expires[jti] = second
+        bucket = self._buckets.get(second)
+        if bucket is None:
+            bucket = self._buckets[second] = []
+            heapq.heappush(self._bucket_heap, second)
+        bucket.append(jti)
+
+    def __contains__(self, jti: str) -> bool:
+        exp = self._expires.get(jti)
+        return exp is not None and exp > self._clock()
+
+    def __len__(self):
+        self._prune()
+        return len(self._expires)
+
+    async def revoke(self, jti: str, exp: float):
+        self.add(jti, exp)
+
+    async def is_revoked(self, jti: str) -> bool:
+        return jti in self
+
+
+class MongoRevocationStore:
+    """
+    Tokens revogados numa coleção com índice TTL, compartilhada entre workers.
+
+    Revogações feitas neste processo valem na hora; as feitas por outros workers
+    são vistas em até ``negative_cache_ttl`` segundos, tempo pelo qual uma consulta
+    "não revogado" fica em cache para não ir ao banco em toda requisição.
+    """
+
+    def __init__(self, collection, negative_cache_ttl: float = 5, negative_cache_size: int = 10000):
+        self.collection = collection
+        self._local = InMemoryRevocationStore()
+        self._not_revoked = TTLCache(maxsize=negative_cache_size, ttl=negative_cache_ttl)
+
+    async def revoke(self, jti: str, exp: float):
+        self._local.add(jti, exp)
+        self._not_revoked.pop(jti)
+        await self.collection.update_one(
+            {"_id": jti},
+            {"$set": {"expires_at": datetime.fromtimestamp(exp, tz=timezone.utc)}},
+            upsert=True
+        )
+
+    async def is_revoked(self, jti: str) -> bool:
+        if jti in self._local:
+            return True
+        if self._not_revoked.get(jti):
+            return False
+        doc = await self.collection.find_one({"_id": jti})
+        if doc is None:
+            self._not_revoked.set(jti, True)
+            return False
+        expires_at = doc["expires_at"]
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        self._local.add(jti, expires_at.timestamp())
+        return True
@@ -0,0 +1,212 @@
+"""
+Sobe a API em vários processos, um por núcleo por padrão.
+
+O processo mestre importa a aplicação uma vez (preload), abre o socket e faz
+fork dos workers, que herdam o socket e o código já importado. Nada de conexão
+é herdado: importar ``controller.main`` não cria o cliente do Mongo, e cada
+worker abre o seu no lifespan (os executores e o pipeline de log também são
+recriados depois do fork). Com mais de um worker, cada um grava o próprio
+arquivo de log (``SERVER_LOG_PER_WORKER``), e o mestre avisa no log das
+configurações que deixam estado restrito a cada worker.
+
+Com SIGTERM ou SIGINT, o mestre repassa o sinal aos workers: cada um para de
+aceitar conexões, espera as requisições em andamento por até
+``SERVER_GRACEFUL_TIMEOUT_SECONDS`` e roda o desligamento do lifespan. Workers
+que morrem fora de um desligamento são recriados.
+
+    python -m controller.server --workers 4 --host 0.0.0.0 --port 8000
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import time
+import uvicorn
+
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+SERVER_WORKERS = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+# Tempo que uma conexão keep-alive ociosa fica aberta; atrás de um balanceador,
+# use um valor maior que o timeout ocioso dele.
+SERVER_KEEP_ALIVE_SECONDS = int(os.getenv("SERVER_KEEP_ALIVE_SECONDS", "5"))
+SERVER_GRACEFUL_TIMEOUT_SECONDS = float(os.getenv("SERVER_GRACEFUL_TIMEOUT_SECONDS", "30"))
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", "2048"))
+# Limite de conexões simultâneas por worker (acima dele, 503); 0 desliga.
+SERVER_LIMIT_CONCURRENCY = int(os.getenv("SERVER_LIMIT_CONCURRENCY", "0"))
+
+# Um arquivo de log por worker (logs/app.worker-1.log, ...): a rotação do
+# BatchingRotatingFileHandler não é segura com vários processos no mesmo arquivo.
+SERVER_LOG_PER_WORKER = os.getenv("SERVER_LOG_PER_WORKER", "1") == "1"
+
+# (variável, padrão, valores compartilhados entre workers, consequência dos outros).
+PROCESS_LOCAL_SETTINGS = (
+    ("TOKEN_REVOCATION_BACKEND", "memory", ("mongo",), "logout só vale no worker que o recebeu"),
+    ("RATE_LIMIT_BACKEND", "memory", ("mongo",), "cada worker conta as tentativas de login separadamente"),
+    ("TASK_EVENTS_SOURCE", "local", ("changestream",), "GET /tasks/events só recebe as escritas do próprio worker"),
+    ("RESPONSE_CACHE_BACKEND", "memory", ("sqlite", "off"),
+     "GET /tasks/{id} e GET /users/{id} podem servir corpo e ETag antigos depois de uma escrita em outro worker "
+     "(até RESPONSE_CACHE_TTL_SECONDS; If-Match com o ETag novo responde 412)"),
+    ("AUTH_USER_CACHE_TTL_SECONDS", "60", ("0",),
+     "um usuário removido ou desativado continua autenticando nos outros workers até o TTL"),
+    ("SERVER_LOG_PER_WORKER", "1", ("1",), "todos os workers gravam e rotacionam o mesmo LOG_FILE"),
+    ("STORAGE_BACKEND", "mongo", ("mongo",), "cada worker tem os seus próprios dados"),
+)
+
+
+def process_local_warnings(environ=os.environ) -> list:
+    """Avisos para configurações que não são compartilhadas entre workers."""
+    warnings = []
+    for name, default, shared, consequence in PROCESS_LOCAL_SETTINGS:
+        value = environ.get(name, default)
+        if value not in shared:
+            warnings.append(f"{name}={value}: {consequence}")
+    return warnings
+
+
+def bind_socket(host: str, port: int, backlog: int = SERVER_BACKLOG) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def worker_config(app, keep_alive: int = SERVER_KEEP_ALIVE_SECONDS,
+                  graceful_timeout: float = SERVER_GRACEFUL_TIMEOUT_SECONDS,
+                  limit_concurrency: int = SERVER_LIMIT_CONCURRENCY) -> uvicorn.Config:
+    return uvicorn.Config(
+        app,
+        lifespan="on",
+        timeout_keep_alive=keep_alive,
+        timeout_graceful_shutdown=graceful_timeout,
+        limit_concurrency=limit_concurrency or None,
+        # O log da aplicação já é configurado por logs/logging_config.py.
+        log_config=None,
+        access_log=False,
+    )
+
+
+class Supervisor:
+    """Processo mestre: faz fork dos workers, recria os que morrem e coordena o desligamento."""
+
+    def __init__(self, app, sock: socket.socket, workers: int, config_factory=worker_config,
+                 log_per_worker: bool = False):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.config_factory = config_factory
+        self.log_per_worker = log_per_worker
+        # pid -> posição do worker (1..workers); um worker recriado herda a posição e o arquivo de log.
+        self.children = {}
+        self.stopping = False
+
+    def _run_worker(self, slot: int) -> int:
+        # Sinais com o comportamento padrão: o uvicorn instala os seus ao subir.
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        if self.log_per_worker:
+            from logs.logging_config import use_log_file, worker_log_file
+            use_log_file(worker_log_file(slot))
+        server = uvicorn.Server(self.config_factory(self.app))
+        server.run(sockets=[self.sock])
+        return 0 if server.started else 1
+
+    def spawn(self, slot: int) -> int:
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = self._run_worker(slot)
+            except BaseException:
+                logging.exception("Worker %s encerrado por erro", os.getpid())
+            finally:
+                from logs.logging_config import shutdown_logging
+                shutdown_logging()
+                os._exit(code)
+        self.children[pid] = slot
+        logging.info("Worker %s iniciado (posição %s)", pid, slot)
+        return pid
+
+    def _handle_stop(self, signum, frame):
+        self.stopping = True
+
+    def _reap(self, block: bool = False):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, 0 if block else os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if pid == 0:
+                return
+            slot = self.children.pop(pid, None)
+            if not self.stopping and slot is not None:
+                logging.error("Worker %s terminou inesperadamente (status %s); recriando", pid, status)
+                # Evita um laço de recriação apertado se o worker falha ao subir.
+                time.sleep(1)
+                self.spawn(slot)
+            if block:
+                return
+
+    def stop(self, timeout: float = SERVER_GRACEFUL_TIMEOUT_SECONDS):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self.children.pop(pid, None)
+        deadline = time.monotonic() + timeout + 5
+        while self.children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self.children):
+            logging.warning("Worker %s não terminou a tempo; encerrando à força", pid)
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        while self.children:
+            self._reap(block=True)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        for slot in range(1, self.workers + 1):
+            self.spawn(slot)
+        while not self.stopping:
+            self._reap()
+            time.sleep(0.2)
+        logging.info("Desligando %s workers", len(self.children))
+        self.stop()
+        self.sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sobe a API com vários workers.")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    parser.add_argument("--keep-alive", type=int, default=SERVER_KEEP_ALIVE_SECONDS)
+    parser.add_argument("--graceful-timeout", type=float, default=SERVER_GRACEFUL_TIMEOUT_SECONDS)
+    args = parser.parse_args(argv)
+
+    # Preload: a aplicação é importada uma vez, antes do fork.
+    from controller.main import app
+    if args.workers > 1:
+        for warning in process_local_warnings():
+            logging.warning("Vários workers com %s", warning)
+    sock = bind_socket(args.host, args.port)
+    logging.info("Servidor em %s:%s com %s workers", args.host, args.port, args.workers)
+
+    def config_factory(app):
+        return worker_config(app, keep_alive=args.keep_alive, graceful_timeout=args.graceful_timeout)
+
+    log_per_worker = SERVER_LOG_PER_WORKER and args.workers > 1
+    Supervisor(app, sock, args.workers, config_factory, log_per_worker=log_per_worker).run()
+
+
+if __name__ == "__main__":
+    main()
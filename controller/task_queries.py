@@ -0,0 +1,92 @@
+"""
+Montagem e validação das consultas de ``GET /tasks``.
+
+Só são aceitas as combinações de filtro e ordenação atendidas por um índice
+(ver ``TASK_QUERY_SHAPES`` e ``controller/indexes.py``); as demais são
+recusadas com 400 em vez de virarem uma varredura da coleção.
+"""
+import base64
+import json
+import re
+from bson import ObjectId
+from fastapi import HTTPException
+
+SORT_FIELDS = {"id": "_id", "title": "title"}
+
+# (filtros usados, campo de ordenação) -> índice que atende a consulta.
+TASK_QUERY_SHAPES = {
+    (frozenset(), "id"): "_id_",
+    (frozenset({"assigned_to"}), "id"): "assigned_to_id",
+    (frozenset({"status"}), "id"): "status_id",
+    (frozenset({"assigned_to", "status"}), "id"): "assigned_to_status_id",
+    (frozenset(), "title"): "title_id",
+    (frozenset({"title_prefix"}), "title"): "title_id",
+    (frozenset({"assigned_to"}), "title"): "assigned_to_title_id",
+    (frozenset({"assigned_to", "title_prefix"}), "title"): "assigned_to_title_id",
+    (frozenset({"q"}), "id"): "title_description_text",
+}
+
+
+def _bad_request(detail: str):
+    raise HTTPException(status_code=400, detail=detail)
+
+
+def parse_sort(sort: str, filters: set):
+    """``title``/``-title``/``id``/``-id``; sem valor, usa a ordenação natural do filtro."""
+    if not sort:
+        sort = "title" if "title_prefix" in filters else "id"
+    field, direction = (sort[1:], -1) if sort.startswith("-") else (sort, 1)
+    if field not in SORT_FIELDS:
+        _bad_request(f"Invalid sort: {sort}")
+    return field, direction
+
+
+def encode_cursor(task: dict, field: str) -> str:
+    if field == "id":
+        return str(task["_id"])
+    raw = json.dumps([task.get(SORT_FIELDS[field]), str(task["_id"])], ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(after: str, field: str):
+    try:
+        if field == "id":
+            return None, ObjectId(after)
+        value, last_id = json.loads(base64.urlsafe_b64decode(after.encode("ascii")))
+        return value, ObjectId(last_id)
+    except Exception:
+        _bad_request("Invalid cursor")
+
+
+def build_task_query(assigned_to=None, status=None, title_prefix=None, q=None, sort=None, after=None):
+    """Devolve ``(filtro, sort, campo de ordenação, índice)`` ou levanta 400."""
+    query = {}
+    if assigned_to:
+        query["assigned_to"] = assigned_to
+    if status:
+        query["status"] = status[0] if len(status) == 1 else {"$in": list(status)}
+    if title_prefix:
+        # Regex ancorada e sensível a maiúsculas: vira um intervalo no índice de title.
+        query["title"] = {"$regex": "^" + re.escape(title_prefix)}
+    if q:
+        query["$text"] = {"$search": q}
+    filters = {name for name, value in
+               (("assigned_to", assigned_to), ("status", status), ("title_prefix", title_prefix), ("q", q)) if value}
+    field, direction = parse_sort(sort, filters)
+    index = TASK_QUERY_SHAPES.get((frozenset(filters), field))
+    if index is None:
+        _bad_request(
+            f"Unsupported filter combination: {', '.join(sorted(filters)) or 'none'} sorted by {field}"
+        )
+
+    if after:
+        value, last_id = _decode_cursor(after, field)
+        op = "$gt" if direction == 1 else "$lt"
+        if field == "id":
+            query["_id"] = {op: last_id}
+        else:
+            # Keyset em (title, _id): continua depois do último par devolvido.
+            keyset = {"$or": [{"title": {op: value}}, {"title": value, "_id": {op: last_id}}]}
+            query = {"$and": [query, keyset]} if query else keyset
+    sort_spec = [("_id", direction)] if field == "id" else [("title", direction), ("_id", direction)]
+    return query, sort_spec, field, index
@@ -0,0 +1,129 @@
+"""
+Contadores de tarefas por ``status``, por ``assigned_to`` e pelo par dos dois.
+
+Cada escrita em tarefas aplica um ``$inc`` nos contadores afetados, então
+``GET /tasks/stats`` lê alguns poucos documentos em vez de varrer a coleção.
+A reconciliação periódica recalcula tudo com uma agregação e corrige qualquer
+desvio (escritas concorrentes nos lotes, falhas entre a escrita e o ``$inc``).
+Com ``assigned_to``, o total e ``by_status`` vêm dos contadores por par, então
+refletem só as tarefas daquele responsável.
+"""
+import asyncio
+import logging
+import os
+from collections import Counter
+from pymongo import DeleteMany, UpdateOne
+from controller.database import async_task_counters_collection, async_tasks_collection
+
+# Intervalo da reconciliação com a coleção de tarefas; 0 desliga a tarefa periódica.
+TASK_STATS_RECONCILE_SECONDS = float(os.getenv("TASK_STATS_RECONCILE_SECONDS", "3600"))
+
+COUNTED_FIELDS = ("status", "assigned_to")
+# Contador por (responsável, status); o valor é o subdocumento {assigned_to, status}.
+PAIR_FIELD = "assigned_to_status"
+
+
+def pair_value(assigned_to, status) -> dict:
+    # Ordem fixa das chaves: o Mongo compara subdocumentos campo a campo.
+    return {"assigned_to": assigned_to, "status": status}
+
+
+def task_delta(task: dict, sign: int = 1) -> Counter:
+    """Variação dos contadores ao incluir (``sign=1``) ou remover (``-1``) a tarefa."""
+    delta = Counter({(field, task.get(field)): sign for field in COUNTED_FIELDS})
+    delta[(PAIR_FIELD, (task.get("assigned_to"), task.get("status")))] += sign
+    return delta
+
+
+def update_delta(previous: dict, updated: dict) -> Counter:
+    delta = task_delta(updated)
+    delta.subtract(task_delta(previous))
+    return delta
+
+
+class TaskCounters:
+    def __init__(self, counters, tasks):
+        self.counters = counters
+        self.tasks = tasks
+
+    async def apply(self, delta: Counter):
+        ops = [
+            UpdateOne(
+                {"field": field, "value": pair_value(*value) if field == PAIR_FIELD else value},
+                {"$inc": {"count": amount}},
+                upsert=True
+            )
+            for (field, value), amount in delta.items() if amount
+        ]
+        if ops:
+            await self.counters.bulk_write(ops, ordered=False)
+
+    async def stats(self, assigned_to: str = None) -> dict:
+        query = {"field": {"$in": list(COUNTED_FIELDS)}}
+        if assigned_to is not None:
+            query = {"$or": [
+                {"field": PAIR_FIELD, "value.assigned_to": assigned_to},
+                {"field": "assigned_to", "value": assigned_to},
+            ]}
+        result = {"total": 0, "by_status": {}, "by_assigned_to": {}}
+        async for counter in self.counters.reader("task_stats").find(query, projection={"_id": 0}):
+            field, value = counter["field"], counter["value"]
+            if field == PAIR_FIELD:
+                field, value = "status", value.get("status")
+            if counter["count"] <= 0 or value is None:
+                continue
+            result["by_" + field][value] = counter["count"]
+        result["total"] = sum(result["by_status"].values())
+        return result
+
+    async def reconcile(self):
+        ops = []
+        for field in COUNTED_FIELDS:
+            cursor = self.tasks.aggregate([{"$group": {"_id": f"${field}", "count": {"$sum": 1}}}])
+            counts = {group["_id"]: group["count"] async for group in cursor}
+            ops.extend(
+                UpdateOne({"field": field, "value": value}, {"$set": {"count": count}}, upsert=True)
+                for value, count in counts.items()
+            )
+            ops.append(DeleteMany({"field": field, "value": {"$nin": list(counts)}}))
+        cursor = self.tasks.aggregate(
+            [{"$group": {"_id": {"assigned_to": "$assigned_to", "status": "$status"}, "count": {"$sum": 1}}}]
+        )
+        # Campos ausentes ficam fora do _id composto do $group.
+        pairs = [
+            (pair_value(group["_id"].get("assigned_to"), group["_id"].get("status")), group["count"])
+            async for group in cursor
+        ]
+        ops.extend(
+            UpdateOne({"field": PAIR_FIELD, "value": value}, {"$set": {"count": count}}, upsert=True)
+            for value, count in pairs
+        )
+        ops.append(DeleteMany({"field": PAIR_FIELD, "value": {"$nin": [value for value, _ in pairs]}}))
+        await self.counters.bulk_write(ops, ordered=False)
+        logging.info("Contadores de tarefas reconciliados: %s contadores", len(ops) - len(COUNTED_FIELDS) - 1)
+
+    async def warm(self):
+        # Primeira subida, ou contadores gravados antes dos pares (responsável, status):
+        # monta os contadores do zero.
+        if await self.counters.find_one({"field": PAIR_FIELD}, projection={"_id": 1}) is None:
+            await self.reconcile()
+
+    async def reconcile_forever(self, interval: float = TASK_STATS_RECONCILE_SECONDS):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logging.error("Falha ao reconciliar contadores de tarefas: %s", e)
+
+
+task_counters = TaskCounters(async_task_counters_collection, async_tasks_collection)
+
+
+def main():
+    """Reconstrói os contadores a partir da coleção de tarefas."""
+    asyncio.run(task_counters.reconcile())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,213 @@
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import time
+
+LOG_FILE = os.getenv("LOG_FILE", "logs/app.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# "text" mantém o formato histórico do app.log; "json" grava um objeto por linha.
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "midnight")
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "7"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "100"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "1.0"))
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s:%(message)s'
+
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+_listener = None
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+class BatchingRotatingFileHandler(logging.handlers.TimedRotatingFileHandler):
+    """
+    Arquivo rotacionado por tempo ou por tamanho (o que vier primeiro), com
+    escrita em lote: o flush em disco acontece a cada ``batch_size`` registros
+    ou ``flush_interval`` segundos, e não a cada linha.
+
+    Várias rotações no mesmo período ganham um sequencial depois da data
+    (``app.log.2024-05-01``, ``app.log.2024-05-01.001``, ...), em vez de
+    sobrescrever o backup anterior.
+    """
+
+    def __init__(self, filename, max_bytes=0, batch_size=100, flush_interval=1.0, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def shouldRollover(self, record):
+        if super().shouldRollover(record):
+            return True
+        return self.max_bytes > 0 and self.stream is not None and self.stream.tell() >= self.max_bytes
+
+    def rotation_filename(self, default_name):
+        name = super().rotation_filename(default_name)
+        sequence = 0
+        candidate = name
+        while os.path.exists(candidate):
+            sequence += 1
+            candidate = f"{name}.{sequence:03d}"
+        return candidate
+
+    def flush(self):
+        now = time.monotonic()
+        self._pending += 1
+        if self._pending >= self.batch_size or now - self._last_flush >= self.flush_interval:
+            self.force_flush()
+
+    def force_flush(self):
+        self.acquire()
+        try:
+            if self.stream and hasattr(self.stream, "flush"):
+                self.stream.flush()
+            self._pending = 0
+            self._last_flush = time.monotonic()
+        finally:
+            self.release()
+
+    def doRollover(self):
+        self.force_flush()
+        super().doRollover()
+
+    def close(self):
+        self.force_flush()
+        super().close()
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enfileira o registro sem formatá-lo: a interpolação dos argumentos ``%`` e a
+    formatação ficam para a thread do listener. Os argumentos dos logs da
+    aplicação são valores imutáveis (ids, nomes), então podem ser lidos depois.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class BatchingQueueListener(logging.handlers.QueueListener):
+    """Descarrega os lotes pendentes quando a fila fica ociosa por ``flush_interval``."""
+
+    def __init__(self, log_queue, *handlers, flush_interval=1.0, **kwargs):
+        super().__init__(log_queue, *handlers, **kwargs)
+        self.flush_interval = flush_interval
+
+    def dequeue(self, block):
+        if not block:
+            return super().dequeue(block)
+        while True:
+            try:
+                return self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                for handler in self.handlers:
+                    if hasattr(handler, "force_flush"):
+                        handler.force_flush()
+
 
 def setup_logging():
-    logging.basicConfig(
-        filename='logs/app.log',
-        level=logging.INFO,
-        format='%(asctime)s %(levelname)s:%(message)s'
-    )
\ No newline at end of file
+    """Liga o log da aplicação: os handlers só enfileiram, e uma thread grava no arquivo."""
+    global _listener
+    if _listener is not None:
+        return _listener
+    file_handler = BatchingRotatingFileHandler(
+        LOG_FILE,
+        max_bytes=LOG_MAX_BYTES,
+        batch_size=LOG_BATCH_SIZE,
+        flush_interval=LOG_FLUSH_INTERVAL,
+        when=LOG_ROTATE_WHEN,
+        backupCount=LOG_BACKUP_COUNT,
+        encoding="utf-8",
+        delay=True
+    )
+    file_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(queue_handler)
+
+    _listener = BatchingQueueListener(
+        log_queue, file_handler, flush_interval=LOG_FLUSH_INTERVAL, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging():
+    """Esvazia a fila e fecha o arquivo; pode ser chamada mais de uma vez."""
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler) and handler.queue is listener.queue:
+            root.removeHandler(handler)
+
+
+def worker_log_file(slot: int, log_file: str = None) -> str:
+    """Arquivo do worker ``slot`` ao lado de ``LOG_FILE``: ``logs/app.log`` -> ``logs/app.worker-1.log``."""
+    log_file = log_file or LOG_FILE
+    if log_file == os.devnull:
+        return log_file
+    root, ext = os.path.splitext(log_file)
+    return f"{root}.worker-{slot}{ext}"
+
+
+def use_log_file(filename: str):
+    """Passa a gravar em ``filename``; o worker do ``controller.server`` usa um arquivo próprio."""
+    global LOG_FILE
+    shutdown_logging()
+    LOG_FILE = filename
+    setup_logging()
+
+
+def _reset_after_fork():
+    # A thread do listener não existe no processo filho: recria a fila e o listener.
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler) and handler.queue is listener.queue:
+            root.removeHandler(handler)
+    setup_logging()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
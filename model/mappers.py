@@ -0,0 +1,55 @@
+"""
+Conversão direta de documentos do Mongo para JSON.
+
+Os documentos lidos do banco já foram validados na escrita, então a resposta é
+montada como dict simples e serializada com orjson, sem construir o modelo
+Pydantic nem validar de novo pelo ``response_model``. Os modelos em
+``model/models.py`` continuam descrevendo o formato (OpenAPI e validação da entrada).
+"""
+import datetime
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from controller.profiling import current_timings, timed
+
+TASK_FIELDS = ("title", "description", "status", "assigned_to")
+USER_FIELDS = ("username", "email", "is_active")
+
+
+def task_document(doc: dict, fields=TASK_FIELDS) -> dict:
+    data = {"id": str(doc["_id"])}
+    for field in fields:
+        data[field] = doc.get(field)
+    return data
+
+
+def user_document(doc: dict) -> dict:
+    return {
+        "id": str(doc["_id"]),
+        "username": doc["username"],
+        "email": doc["email"],
+        "is_active": doc.get("is_active", True),
+    }
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+def dumps(value) -> bytes:
+    # Fora de uma requisição perfilada, sem o custo do gerenciador de contexto (chamada por item nos streams).
+    if current_timings.get() is None:
+        return orjson.dumps(value, default=_default)
+    with timed("serialization"):
+        return orjson.dumps(value, default=_default)
+
+
+class DocumentResponse(JSONResponse):
+    """Resposta JSON serializada com orjson, aceitando ObjectId."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 
 class User(BaseModel):
     id: str
@@ -23,12 +23,20 @@ class Task(BaseModel):
     status: str
     assigned_to: Optional[str] = None
 
+class TaskWithAssignee(Task):
+    assignee: Optional[User] = None
+
 class TaskCreate(BaseModel):
     title: str
     description: str
     status: str
     assigned_to: str
 
+class TaskStats(BaseModel):
+    total: int
+    by_status: Dict[str, int]
+    by_assigned_to: Dict[str, int]
+
 class TaskUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
@@ -41,4 +49,30 @@ class AuthRequest(BaseModel):
 
 class AuthResponse(BaseModel):
     access_token: str
-    token_type: str = "bearer"
\ No newline at end of file
+    token_type: str = "bearer"
+
+class TaskBulkCreate(BaseModel):
+    tasks: List[TaskCreate]
+    ordered: bool = True
+
+class TaskBulkUpdateItem(TaskUpdate):
+    id: str
+
+class TaskBulkUpdate(BaseModel):
+    tasks: List[TaskBulkUpdateItem]
+    ordered: bool = True
+
+class TaskBulkDelete(BaseModel):
+    ids: List[str]
+    ordered: bool = True
+
+class BulkItemResult(BaseModel):
+    index: int
+    id: Optional[str] = None
+    status: str
+    detail: Optional[str] = None
+
+class BulkResult(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult]
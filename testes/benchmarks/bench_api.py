@@ -0,0 +1,255 @@
+"""
+Teste de carga da API: login, CRUD de usuários e tarefas e listagem.
+
+Roda a aplicação em processo (httpx + ASGITransport) contra um banco de teste:
+o motor em memória (``--backend memory``, sem dependências),
+``mongomock`` (offline, precisa de ``pip install mongomock``) ou um mongod
+real (``--backend mongo``, usa o MONGO_URI do config_URI ou ``--mongo-uri``).
+As coleções usadas ficam no banco ``--database``, que é limpo no início.
+
+    python -m testes.benchmarks.bench_api --backend mongomock --users 200 --tasks 5000 --requests 500 --concurrency 50
+    python -m testes.benchmarks.bench_api --compare testes/benchmarks/results/antigo.json
+
+Os limites de taxa (``controller.rate_limit``) ficam desligados durante a medição.
+Para cada endpoint imprime p50/p95/p99 e req/s e grava tudo em JSON
+(``--output``), para comparar execuções entre commits com ``--compare``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import time
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from httpx import AsyncClient, ASGITransport
+
+from controller.assignees import active_usernames
+from controller.auth_utils import token_cache, user_cache
+from controller.database import MongoStorage, current_storage
+from controller.main import app
+from controller.rate_limit import ip_limiter, login_ip_limiter, login_username_limiter
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+SCENARIOS = (
+    "login", "get_user", "update_user", "delete_user",
+    "create_task", "get_task", "update_task", "list_tasks", "delete_task",
+)
+
+
+def open_database(args):
+    if args.backend == "memory":
+        from controller.memory_storage import MemoryStorage
+        database = MemoryStorage()
+        current_storage.set(database)
+        return database
+    if args.backend == "mongomock":
+        import mongomock
+        client = mongomock.MongoClient()
+    else:
+        from pymongo import MongoClient
+        if args.mongo_uri:
+            uri = args.mongo_uri
+        else:
+            from controller.config_URI import MONGO_URI as uri
+        client = MongoClient(uri)
+    client.drop_database(args.database)
+    database = client[args.database]
+    # Todas as coleções da aplicação (contadores, arquivo, limites...) vão para o banco de rascunho.
+    current_storage.set(MongoStorage(database))
+    return database
+
+
+def disable_rate_limits():
+    """Todas as requisições saem do mesmo IP e repetem usernames; o limite de login recusaria quase todas."""
+    for limiter in (login_ip_limiter, login_username_limiter, ip_limiter):
+        limiter.rate = None
+
+
+def seed(database, args):
+    users = [
+        {"_id": ObjectId(), "username": f"bench{i}", "email": f"bench{i}@email.com",
+         "password": "123456", "is_active": True}
+        for i in range(args.users + args.requests)
+    ]
+    database["users"].insert_many(users)
+    tasks = [
+        {"_id": ObjectId(), "title": f"Tarefa {i}", "description": "Descrição",
+         "status": "aberta", "assigned_to": users[i % args.users]["username"]}
+        for i in range(args.tasks)
+    ]
+    if tasks:
+        database["tasks"].insert_many(tasks)
+    # Os últimos ``requests`` usuários só existem para o cenário de deleção.
+    return users[:args.users], users[args.users:], tasks
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_scenario(ac, name, build_request, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        method, url, kwargs = build_request(i)
+        async with semaphore:
+            start = time.perf_counter()
+            resp = await ac.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+        if resp.status_code >= 400:
+            errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "req_per_s": total / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+async def run(args):
+    database = open_database(args)
+    users, disposable_users, tasks = seed(database, args)
+    disable_rate_limits()
+    token_cache.clear()
+    user_cache.clear()
+    await active_usernames.warm()
+    rng = random.Random(args.seed)
+    created_tasks = []
+    results = {}
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as ac:
+        sessions = []
+        for user in users[:min(len(users), 50)]:
+            resp = await ac.post("/auth/login", json={"username": user["username"], "password": "123456"})
+            sessions.append((user, {"Authorization": f"Bearer {resp.json()['access_token']}"}))
+
+        def auth():
+            return rng.choice(sessions)
+
+        def login(i):
+            user = rng.choice(users)
+            return "POST", "/auth/login", {"json": {"username": user["username"], "password": "123456"}}
+
+        def get_user(i):
+            _, headers = auth()
+            return "GET", f"/users/{rng.choice(users)['_id']}", {"headers": headers}
+
+        def update_user(i):
+            _, headers = auth()
+            return "PUT", f"/users/{rng.choice(users)['_id']}", {"headers": headers, "json": {"email": f"novo{i}@email.com"}}
+
+        def delete_user(i):
+            _, headers = auth()
+            return "DELETE", f"/users/{disposable_users[i]['_id']}", {"headers": headers}
+
+        def create_task(i):
+            user, headers = auth()
+            body = {"title": f"Nova {i}", "description": "Descrição", "status": "aberta", "assigned_to": user["username"]}
+            return "POST", "/tasks", {"headers": headers, "json": body}
+
+        def get_task(i):
+            _, headers = auth()
+            return "GET", f"/tasks/{rng.choice(tasks)['_id']}", {"headers": headers}
+
+        def update_task(i):
+            _, headers = auth()
+            return "PUT", f"/tasks/{rng.choice(tasks)['_id']}", {"headers": headers, "json": {"status": "fechada"}}
+
+        def list_tasks(i):
+            user, headers = auth()
+            return "GET", "/tasks", {"headers": headers, "params": {"assigned_to": user["username"], "limit": args.page_size}}
+
+        def delete_task(i):
+            _, headers = auth()
+            return "DELETE", f"/tasks/{created_tasks[i]}", {"headers": headers}
+
+        builders = {
+            "login": login, "get_user": get_user, "update_user": update_user, "delete_user": delete_user,
+            "create_task": create_task, "get_task": get_task, "update_task": update_task,
+            "list_tasks": list_tasks, "delete_task": delete_task,
+        }
+        for name in args.scenarios:
+            if name in ("get_task", "update_task") and not tasks:
+                continue
+            if name == "create_task":
+                before = {t["_id"] for t in database["tasks"].find({}, {"_id": 1})}
+            results[name] = await run_scenario(ac, name, builders[name], args.requests, args.concurrency)
+            if name == "create_task":
+                created_tasks = [str(t["_id"]) for t in database["tasks"].find({}, {"_id": 1}) if t["_id"] not in before]
+            print(format_row(name, results[name]))
+    return results
+
+
+def format_row(name, result, previous=None):
+    row = (f"{name:12s} {result['req_per_s']:9.1f} req/s  p50 {result['p50_ms']:7.2f} ms  "
+           f"p95 {result['p95_ms']:7.2f} ms  p99 {result['p99_ms']:7.2f} ms  erros {result['errors']}")
+    if previous:
+        change = (result["req_per_s"] / previous["req_per_s"] - 1) * 100 if previous["req_per_s"] else 0
+        row += f"  ({change:+.1f}% req/s, p95 antes {previous['p95_ms']:.2f} ms)"
+    return row
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=("memory", "mongomock", "mongo"), default="mongomock")
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--database", default="Grau_B_bench")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="arquivo JSON de saída (padrão: testes/benchmarks/results/api-<commit>.json)")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    revision = git_revision()
+    report = {
+        "revision": revision,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"api-{revision}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"resultados gravados em {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+        print(f"\ncomparação com {previous['revision']} ({args.compare}):")
+        for name, result in results.items():
+            print(format_row(name, result, previous["results"].get(name)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark de concorrência: acesso bloqueante ao pymongo vs. AsyncCollection.
+
+Simula a latência de ida e volta ao Mongo com uma coleção falsa que dorme
+``--latency`` segundos por chamada e dispara ``--requests`` requisições com
+``--concurrency`` clientes simultâneos contra um único event loop.
+
+    python -m testes.benchmarks.bench_async_db --requests 500 --concurrency 200
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+
+from controller.database import AsyncCollection
+
+
+class SlowCollection:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def find_one(self, query):
+        time.sleep(self.latency)
+        return {"_id": 1, **query}
+
+
+def build_app(latency):
+    app = FastAPI()
+    blocking = SlowCollection(latency)
+    non_blocking = AsyncCollection(SlowCollection(latency))
+
+    @app.get("/blocking")
+    async def blocking_route():
+        return {"ok": bool(blocking.find_one({"username": "bench"}))}
+
+    @app.get("/async")
+    async def async_route():
+        return {"ok": bool(await non_blocking.find_one({"username": "bench"}))}
+
+    return app
+
+
+async def drive(app, path, total, concurrency):
+    transport = ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+    async with AsyncClient(transport=transport, base_url="http://bench") as ac:
+        async def one():
+            async with semaphore:
+                resp = await ac.get(path)
+                assert resp.status_code == 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return time.perf_counter() - start
+
+
+async def main(args):
+    app = build_app(args.latency)
+    for path in ("/blocking", "/async"):
+        elapsed = await drive(app, path, args.requests, args.concurrency)
+        print(f"{path:10s} {args.requests} req em {elapsed:.2f}s -> {args.requests / elapsed:.1f} req/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.005)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,99 @@
+"""
+Benchmark da latência dos handlers com o log desligado, com o antigo FileHandler
+síncrono e com o pipeline em fila (QueueHandler + thread gravando em lote).
+
+Chama ``get_task`` diretamente, com a coleção de tarefas trocada por uma falsa
+em memória, para isolar o custo do log dentro do handler. ``--flush-latency``
+simula um disco lento (ex.: volume de rede) somando uma espera a cada flush.
+
+    python -m testes.benchmarks.bench_logging --calls 20000 --flush-latency 0.0005
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+from bson import ObjectId
+
+from controller.database import async_tasks_collection
+from logs import logging_config
+from model.models import User
+from view.tasks import get_task
+
+
+class FakeTasks:
+    def __init__(self, task):
+        self.task = task
+
+    def find_one(self, query):
+        return self.task
+
+
+def reset_root():
+    logging_config.shutdown_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    logging.disable(logging.NOTSET)
+
+
+def slow_flush(handler, latency):
+    if not latency:
+        return
+    flush = handler.stream.flush
+
+    def delayed_flush():
+        time.sleep(latency)
+        flush()
+
+    handler.stream.flush = delayed_flush
+
+
+async def measure(calls, task_id, user):
+    start = time.perf_counter()
+    for _ in range(calls):
+        await get_task(task_id, expand=None, if_none_match=None, current_user=user)
+    return (time.perf_counter() - start) / calls
+
+
+async def main(args):
+    task_id = ObjectId()
+    async_tasks_collection.bind(FakeTasks({"_id": task_id, "title": "t", "status": "aberta", "assigned_to": "u"}))
+    user = User(id=str(ObjectId()), username="u", email="u@email.com")
+    log_dir = tempfile.mkdtemp()
+
+    reset_root()
+    logging.disable(logging.CRITICAL)
+    off = await measure(args.calls, str(task_id), user)
+
+    reset_root()
+    logging.basicConfig(
+        filename=os.path.join(log_dir, "sync.log"),
+        level=logging.INFO,
+        format=logging_config.TEXT_FORMAT
+    )
+    slow_flush(logging.getLogger().handlers[0], args.flush_latency)
+    sync = await measure(args.calls, str(task_id), user)
+
+    reset_root()
+    logging_config.LOG_FILE = os.path.join(log_dir, "queue.log")
+    listener = logging_config.setup_logging()
+    file_handler = listener.handlers[0]
+    file_handler.stream = file_handler._open()
+    slow_flush(file_handler, args.flush_latency)
+    queued = await measure(args.calls, str(task_id), user)
+    reset_root()
+
+    print(f"log desligado:         {off * 1e6:8.1f} us/chamada")
+    print(f"FileHandler síncrono:  {sync * 1e6:8.1f} us/chamada")
+    print(f"fila + lote:           {queued * 1e6:8.1f} us/chamada")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--flush-latency", type=float, default=0.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,109 @@
+"""
+Benchmark de uma rajada de logins com senhas em hash (scrypt).
+
+Dispara ``--logins`` logins simultâneos e, ao mesmo tempo, requisições a um
+endpoint barato (``GET /users/{id}``), medindo a vazão de logins, a latência
+das outras requisições e o atraso do event loop. Compara a verificação dentro
+do event loop (``off``) com o pool de threads e o de processos. Usa ``mongomock``,
+com os limites de taxa desligados.
+
+    python -m testes.benchmarks.bench_login --logins 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+
+from bson import ObjectId
+from httpx import AsyncClient, ASGITransport
+
+from controller import passwords
+from controller.auth_utils import create_access_token, token_cache, user_cache
+from controller.database import MongoStorage, current_storage
+from controller.main import app
+from testes.benchmarks.bench_api import disable_rate_limits, percentile
+
+
+def open_database(args):
+    import mongomock
+    database = mongomock.MongoClient()[args.database]
+    current_storage.set(MongoStorage(database))
+    return database
+
+
+async def loop_lag(stop, interval=0.005):
+    lags = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+    return sorted(lags)
+
+
+async def run(args, kind):
+    passwords.PASSWORD_POOL_KIND = kind
+    passwords.password_executor = passwords._make_executor()
+    database = open_database(args)
+    database["users"].delete_many({})
+    stored = passwords.hash_password("123456")
+    users = [
+        {"_id": ObjectId(), "username": f"login{i}", "email": f"login{i}@email.com",
+         "password": stored, "is_active": True, "version": 1}
+        for i in range(args.users)
+    ]
+    database["users"].insert_many(users)
+    token_cache.clear()
+    user_cache.clear()
+    disable_rate_limits()
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': str(users[0]['_id'])})}"}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    other_latencies = []
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as ac:
+        async def login(i):
+            async with semaphore:
+                user = users[i % len(users)]
+                resp = await ac.post("/auth/login", json={"username": user["username"], "password": "123456"})
+                assert resp.status_code == 200, resp.text
+
+        async def other(stop):
+            while not stop.is_set():
+                start = time.perf_counter()
+                await ac.get(f"/users/{users[0]['_id']}", headers=headers)
+                other_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.005)
+
+        stop = asyncio.Event()
+        lag_task = asyncio.create_task(loop_lag(stop))
+        other_task = asyncio.create_task(other(stop))
+        start = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(args.logins)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        lags = await lag_task
+        await other_task
+
+    if passwords.password_executor is not None:
+        passwords.password_executor.shutdown()
+    other_latencies.sort()
+    print(f"{kind:8s} {args.logins / elapsed:8.1f} logins/s  "
+          f"GET /users p50 {percentile(other_latencies, 0.5) * 1000:7.2f} ms  "
+          f"p99 {percentile(other_latencies, 0.99) * 1000:7.2f} ms ({len(other_latencies)} reqs)  "
+          f"atraso do loop p99 {percentile(lags, 0.99) * 1000:7.2f} ms  máx {lags[-1] * 1000 if lags else 0:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--database", default="Grau_B_bench_login")
+    parser.add_argument("--pools", nargs="+", choices=("off", "thread", "process"), default=["off", "thread", "process"])
+    args = parser.parse_args()
+    print(f"scrypt n={passwords.PASSWORD_HASH_N} r={passwords.PASSWORD_HASH_R} p={passwords.PASSWORD_HASH_P}, "
+          f"{passwords.PASSWORD_POOL_WORKERS} workers no pool")
+    for kind in args.pools:
+        asyncio.run(run(args, kind))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark do armazenamento de tokens revogados.
+
+Revoga ``--tokens`` jtis no InMemoryRevocationStore e mede a taxa de revogação,
+o custo por consulta e a memória ocupada, comparando com o antigo ``set`` de
+tokens JWT completos.
+
+    python -m testes.benchmarks.bench_revocation --tokens 1000000
+"""
+import argparse
+import secrets
+import time
+import tracemalloc
+
+from controller.auth_utils import create_access_token
+from controller.revocation import InMemoryRevocationStore
+
+
+def measure_memory(build):
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def main(args):
+    now = time.time()
+    jtis = [secrets.token_urlsafe(12) for _ in range(args.tokens)]
+
+    def build_store():
+        store = InMemoryRevocationStore()
+        for i, jti in enumerate(jtis):
+            store.add(jti, now + 60 + i % 1800)
+        return store
+
+    # Os jtis são gerados fora da medição; a memória deles entra aqui.
+    jti_bytes = sum(len(jti) + 49 for jti in jtis)
+
+    start = time.perf_counter()
+    store, store_bytes = measure_memory(build_store)
+    revoke_elapsed = time.perf_counter() - start
+
+    probes = jtis[:: max(1, args.tokens // args.lookups)][: args.lookups]
+    misses = [secrets.token_urlsafe(12) for _ in range(len(probes))]
+    start = time.perf_counter()
+    for jti in probes:
+        assert jti in store
+    for jti in misses:
+        assert jti not in store
+    lookup_elapsed = time.perf_counter() - start
+
+    sample = create_access_token({"sub": "0" * 24})
+    sample_size = min(args.tokens, 100000)
+    _, set_bytes = measure_memory(lambda: {sample + str(i) for i in range(sample_size)})
+    set_bytes = set_bytes * args.tokens / sample_size
+
+    print(f"tokens revogados:      {len(store)}")
+    print(f"revogação:             {args.tokens / revoke_elapsed:,.0f} ops/s (com tracemalloc)")
+    print(f"consulta:              {lookup_elapsed / (2 * len(probes)) * 1e9:,.0f} ns/op")
+    print(f"memória (jti):         {(store_bytes + jti_bytes) / 2**20:,.1f} MiB")
+    print(f"memória (set de JWTs): {set_bytes / 2**20:,.1f} MiB (estimada, sem expiração)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=1000000)
+    parser.add_argument("--lookups", type=int, default=100000)
+    main(parser.parse_args())
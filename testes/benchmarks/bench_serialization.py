@@ -0,0 +1,76 @@
+"""
+Benchmark da serialização da listagem de tarefas.
+
+Compara, para ``--tasks`` documentos, o caminho antigo (monta um ``Task`` por
+documento, revalida pelo ``response_model`` e serializa com ``jsonable_encoder``
++ ``json.dumps``, como o FastAPI faz) com o mapeador ``model.mappers``
+(dict direto do documento + orjson). Mede tempo e pico de memória alocada.
+
+    python -m testes.benchmarks.bench_serialization --tasks 10000 --repeat 20
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from typing import List
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from model.mappers import dumps, task_document
+from model.models import Task
+
+
+def build_documents(count):
+    return [
+        {"_id": ObjectId(), "title": f"Tarefa {i}", "description": "Descrição da tarefa",
+         "status": "aberta", "assigned_to": f"user{i % 100}", "version": 1}
+        for i in range(count)
+    ]
+
+
+def serialize_models(docs, adapter):
+    tasks = [
+        Task(id=str(doc["_id"]), title=doc["title"], description=doc.get("description"),
+             status=doc["status"], assigned_to=doc.get("assigned_to"))
+        for doc in docs
+    ]
+    # O response_model valida de novo o retorno antes de codificar.
+    validated = adapter.validate_python(tasks, from_attributes=True)
+    return json.dumps(jsonable_encoder(validated), ensure_ascii=False).encode("utf-8")
+
+
+def serialize_mapper(docs):
+    return dumps([task_document(doc) for doc in docs])
+
+
+def measure(name, fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:10s} {elapsed * 1000:8.2f} ms/lista  pico {peak / 1024 / 1024:7.2f} MiB  {len(body)} bytes")
+    return elapsed
+
+
+def main(args):
+    docs = build_documents(args.tasks)
+    adapter = TypeAdapter(List[Task])
+    assert json.loads(serialize_models(docs, adapter)) == json.loads(serialize_mapper(docs))
+    print(f"{args.tasks} tarefas, média de {args.repeat} execuções")
+    models = measure("pydantic", lambda: serialize_models(docs, adapter), args.repeat)
+    mapper = measure("mapper", lambda: serialize_mapper(docs), args.repeat)
+    print(f"mapper {models / mapper:.1f}x mais rápido")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    main(parser.parse_args())
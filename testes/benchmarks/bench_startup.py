@@ -0,0 +1,80 @@
+"""
+Tempo de importação e de subida da aplicação.
+
+Mede ``import controller.main`` em processos novos (mediana de ``--runs``),
+lista os módulos mais caros segundo ``python -X importtime`` e, com
+``--lifespan``, o tempo do lifespan (conexão, índices, aquecimento dos caches)
+contra ``mongomock`` ou um mongod (``--backend mongo``, usa o MONGO_URI).
+
+    python -m testes.benchmarks.bench_startup --runs 5 --lifespan
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+IMPORT_SCRIPT = "import time; s = time.perf_counter(); import controller.main; print(time.perf_counter() - s)"
+
+
+def import_times(runs):
+    env = {**os.environ, "MONGO_URI": os.getenv("MONGO_URI", "mongodb://localhost:27017")}
+    return [
+        float(subprocess.check_output([sys.executable, "-c", IMPORT_SCRIPT], cwd=ROOT, env=env, text=True))
+        for _ in range(runs)
+    ]
+
+
+def slowest_imports(top):
+    env = {**os.environ, "MONGO_URI": os.getenv("MONGO_URI", "mongodb://localhost:27017")}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import controller.main"],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        # Formato: "import time: <próprio us> | <acumulado us> | <módulo>"
+        parts = [part.strip() for part in line.replace("import time:", "").split("|")]
+        if len(parts) != 3 or not parts[0].isdigit():
+            continue
+        rows.append((int(parts[1]), int(parts[0]), parts[2]))
+    return sorted(rows, key=lambda row: row[1], reverse=True)[:top]
+
+
+async def lifespan_time(backend):
+    if backend == "mongomock":
+        import mongomock
+        from controller import database
+        database.MongoClient = mongomock.MongoClient
+        os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+    from controller.main import app, lifespan
+    start = time.perf_counter()
+    async with lifespan(app):
+        elapsed = time.perf_counter() - start
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--lifespan", action="store_true", help="mede também a subida do lifespan")
+    parser.add_argument("--backend", choices=("mongomock", "mongo"), default="mongomock")
+    args = parser.parse_args()
+
+    times = import_times(args.runs)
+    print(f"import controller.main: mediana {statistics.median(times) * 1000:.0f} ms "
+          f"(mín {min(times) * 1000:.0f} ms, máx {max(times) * 1000:.0f} ms, {args.runs} execuções)")
+    print("\nmódulos com maior tempo próprio de importação:")
+    for cumulative, own, name in slowest_imports(args.top):
+        print(f"  {own / 1000:8.1f} ms  (acumulado {cumulative / 1000:8.1f} ms)  {name}")
+    if args.lifespan:
+        elapsed = asyncio.run(lifespan_time(args.backend))
+        print(f"\nlifespan (conexão, índices, aquecimento): {elapsed * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Escala do servidor com vários workers: req/s de ``GET /tasks`` de 1 a N workers.
+
+Para cada quantidade de workers sobe ``controller.server`` num subprocesso,
+dispara carga HTTP real a partir de ``--clients`` processos e encerra o
+servidor com SIGTERM (o mesmo desligamento gracioso de produção). Com
+``--backend memory`` os dados são semeados no processo mestre antes do fork,
+então todos os workers enxergam as mesmas tarefas; ``--backend mongo`` usa o
+MONGO_URI do config_URI e um banco já populado (ex.: pelo bench_api).
+
+    python -m testes.benchmarks.bench_workers --workers 1 2 4 8 --duration 10
+
+A escala só aparece até o número de núcleos livres da máquina: os processos de
+carga disputam a CPU com os workers.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+from bson import ObjectId
+
+BENCH_USERNAME = "bench0"
+BENCH_USER_ID = ObjectId("650000000000000000000000")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def seed(tasks: int):
+    from controller.database import default_storage
+    default_storage["users"].insert_one({
+        "_id": BENCH_USER_ID, "username": BENCH_USERNAME, "email": "bench0@email.com",
+        "password": "123456", "is_active": True
+    })
+    default_storage["tasks"].insert_many([
+        {"_id": ObjectId(), "title": f"Tarefa {i}", "description": "Descrição",
+         "status": "aberta", "assigned_to": BENCH_USERNAME}
+        for i in range(tasks)
+    ])
+
+
+def serve(args):
+    """Modo servidor: semeia antes do fork (backend em memória) e sobe o supervisor."""
+    from controller import server
+    if os.getenv("STORAGE_BACKEND") == "memory":
+        seed(args.tasks)
+    server.main(["--workers", str(args.serve), "--port", str(args.port)])
+
+
+def start_server(workers: int, port: int, args) -> subprocess.Popen:
+    env = dict(os.environ, STORAGE_BACKEND=args.backend, LOG_FILE=os.devnull)
+    cmd = [sys.executable, "-m", "testes.benchmarks.bench_workers",
+           "--serve", str(workers), "--port", str(port), "--tasks", str(args.tasks)]
+    return subprocess.Popen(cmd, env=env)
+
+
+def wait_ready(url: str, headers: dict, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, headers=headers).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Servidor não respondeu em {timeout}s")
+
+
+async def _load(url: str, headers: dict, concurrency: int, duration: float) -> tuple:
+    done = errors = 0
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(headers=headers, limits=limits) as client:
+        async def worker():
+            nonlocal done, errors
+            while time.monotonic() < deadline:
+                resp = await client.get(url)
+                done += 1
+                if resp.status_code != 200:
+                    errors += 1
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return done, errors
+
+
+def load(job) -> tuple:
+    return asyncio.run(_load(*job))
+
+
+def measure(workers: int, args, headers: dict) -> dict:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/tasks?limit={args.page_size}"
+    proc = start_server(workers, port, args)
+    try:
+        wait_ready(url, headers)
+        # Aquece os caches de cada worker antes de medir.
+        load((url, headers, args.concurrency, 1))
+        jobs = [(url, headers, args.concurrency, args.duration)] * args.clients
+        with multiprocessing.get_context("spawn").Pool(args.clients) as pool:
+            results = pool.map(load, jobs)
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=60)
+    done = sum(r[0] for r in results)
+    return {"workers": workers, "requests": done, "errors": sum(r[1] for r in results),
+            "req_per_s": done / args.duration}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--backend", choices=("memory", "mongo"), default="memory")
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--clients", type=int, default=os.cpu_count() or 1,
+                        help="processos gerando carga")
+    parser.add_argument("--concurrency", type=int, default=32, help="requisições simultâneas por cliente")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args)
+        return
+
+    from controller.auth_utils import create_access_token
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(BENCH_USER_ID)})}"}
+    print(f"{os.cpu_count()} núcleos, {args.clients} clientes x {args.concurrency} conexões, {args.duration:.0f}s")
+    baseline = None
+    for workers in args.workers:
+        result = measure(workers, args, headers)
+        baseline = baseline or result["req_per_s"]
+        print(f"{workers:3d} workers {result['req_per_s']:9.1f} req/s  "
+              f"({result['req_per_s'] / baseline:4.2f}x)  erros {result['errors']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import os
+
+# A suíte roda no motor em memória por padrão (sem mongod e isolada por processo,
+# o que permite ``pytest -n auto``). Para rodar contra o Mongo: STORAGE_BACKEND=mongo.
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+import pytest
+from controller.database import MongoStorage, current_storage, mongo_uri
+from controller.rate_limit import InMemoryRateLimitStore, ip_limiter, login_ip_limiter, login_username_limiter
+
+
+@pytest.fixture
+def mongo_storage():
+    """Para os testes do cliente do Mongo em si, qualquer que seja o armazenamento padrão."""
+    try:
+        mongo_uri()
+    except ImportError:
+        pytest.skip("Mongo não configurado (MONGO_URI ou controller/config_URI.py)")
+    token = current_storage.set(MongoStorage())
+    yield
+    current_storage.reset(token)
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """Relógio controlado pelo teste, para caches e armazenamentos que recebem ``clock``."""
+    return FakeClock()
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """Todos os testes logam do mesmo IP; cada um começa com os baldes cheios."""
+    for limiter in (login_ip_limiter, login_username_limiter, ip_limiter):
+        if isinstance(limiter.store, InMemoryRateLimitStore):
+            limiter.store.clear()
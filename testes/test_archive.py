@@ -0,0 +1,193 @@
+import pytest
+from collections import Counter
+from datetime import datetime, timedelta
+from bson import ObjectId
+from controller import archive
+from controller.archive import TaskArchiver, archive_filter, may_be_archived
+from controller.database import AsyncCollection, db, tasks_collection
+from controller.task_stats import TaskCounters, task_delta
+
+
+def test_archive_filter_uses_id_for_legacy_tasks():
+    now = datetime(2024, 6, 1)
+    query = archive_filter(now)
+    assert query["status"] == {"$in": list(archive.TASK_ARCHIVE_STATUSES)}
+    legacy = query["$or"][1]
+    assert legacy["updated_at"] is None
+    assert legacy["_id"]["$lt"].generation_time.replace(tzinfo=None) == now - timedelta(days=archive.TASK_ARCHIVE_AFTER_DAYS)
+
+
+
+def test_may_be_archived():
+    now = datetime(2024, 6, 1)
+    assert not may_be_archived(ObjectId.from_datetime(now - timedelta(days=1)), now)
+    assert may_be_archived(ObjectId.from_datetime(now - timedelta(days=archive.TASK_ARCHIVE_AFTER_DAYS + 1)), now)
+
+@pytest.mark.asyncio
+async def test_archive_batches(monkeypatch):
+    monkeypatch.setattr(archive, "TASK_ARCHIVE_STATUSES", ("arq_fechada",))
+    monkeypatch.setattr(archive, "TASK_ARCHIVE_AFTER_DAYS", 30)
+    monkeypatch.setattr(archive, "TASK_ARCHIVE_BATCH_SIZE", 2)
+    archive_collection, counters_collection = db["tasks_archive_test"], db["task_counters_archive_test"]
+    archive_collection.delete_many({})
+    counters_collection.delete_many({})
+    old = datetime.utcnow() - timedelta(days=60)
+    tasks_collection.insert_many([
+        {"title": f"arq {i}", "status": "arq_fechada", "assigned_to": "arquser", "version": 1, "updated_at": old}
+        for i in range(3)
+    ] + [
+        # Sem updated_at: a idade vem do _id.
+        {"_id": ObjectId.from_datetime(old), "title": "arq antiga", "status": "arq_fechada", "assigned_to": "arquser"},
+        {"title": "arq recente", "status": "arq_fechada", "assigned_to": "arquser", "updated_at": datetime.utcnow()},
+        {"title": "arq aberta", "status": "arq_aberta", "assigned_to": "arquser", "updated_at": old},
+    ])
+    counters = TaskCounters(AsyncCollection(counters_collection), AsyncCollection(tasks_collection))
+    await counters.reconcile()
+    archiver = TaskArchiver(AsyncCollection(tasks_collection), AsyncCollection(archive_collection), counters)
+
+    assert await archiver.archive_all() == 4
+    assert sorted(t["title"] for t in tasks_collection.find({"assigned_to": "arquser"})) == ["arq aberta", "arq recente"]
+    archived = list(archive_collection.find({}))
+    assert len(archived) == 4 and all("archived_at" in t for t in archived)
+    stats = await counters.stats("arquser")
+    assert stats["by_status"] == {"arq_aberta": 1, "arq_fechada": 1}
+    assert await archiver.archive_all() == 0
+
+    tasks_collection.delete_many({"assigned_to": "arquser"})
+    archive_collection.drop()
+    counters_collection.drop()
+
+
+@pytest.mark.asyncio
+async def test_archive_keeps_tasks_changed_during_the_batch(monkeypatch):
+    monkeypatch.setattr(archive, "TASK_ARCHIVE_STATUSES", ("arq_fechada",))
+    archive_collection, counters_collection = db["tasks_archive_test"], db["task_counters_archive_test"]
+    old = datetime.utcnow() - timedelta(days=archive.TASK_ARCHIVE_AFTER_DAYS + 1)
+    task_id = tasks_collection.insert_one(
+        {"title": "arq corrida", "status": "arq_fechada", "assigned_to": "arquser", "version": 1, "updated_at": old}
+    ).inserted_id
+
+    class ChangedMidway(AsyncCollection):
+        async def delete_one(self, *args, **kwargs):
+            # Alteração concorrente entre a cópia para o arquivo e a remoção.
+            tasks_collection.update_one({"_id": task_id}, {"$inc": {"version": 1}})
+            return await AsyncCollection(self.collection).delete_one(*args, **kwargs)
+
+    counters = TaskCounters(AsyncCollection(counters_collection), AsyncCollection(tasks_collection))
+    archiver = TaskArchiver(ChangedMidway(tasks_collection), AsyncCollection(archive_collection), counters)
+    assert await archiver.archive_batch() == (0, 1)
+    assert tasks_collection.find_one({"_id": task_id})["version"] == 2
+    assert archive_collection.find_one({"_id": task_id}) is None
+
+    tasks_collection.delete_many({"assigned_to": "arquser"})
+    archive_collection.drop()
+    counters_collection.drop()
+
+
+@pytest.mark.asyncio
+async def test_archive_does_not_revive_tasks_deleted_during_the_batch(monkeypatch):
+    monkeypatch.setattr(archive, "TASK_ARCHIVE_STATUSES", ("arq_fechada",))
+    archive_collection, counters_collection = db["tasks_archive_test"], db["task_counters_archive_test"]
+    old = datetime.utcnow() - timedelta(days=archive.TASK_ARCHIVE_AFTER_DAYS + 1)
+    task_id = tasks_collection.insert_one(
+        {"title": "arq removida", "status": "arq_fechada", "assigned_to": "arquser", "version": 1, "updated_at": old}
+    ).inserted_id
+    counters = TaskCounters(AsyncCollection(counters_collection), AsyncCollection(tasks_collection))
+    await counters.reconcile()
+
+    class DeletedMidway(AsyncCollection):
+        async def delete_one(self, *args, **kwargs):
+            # DELETE /tasks/{id} entre a cópia para o arquivo e a remoção.
+            tasks_collection.delete_one({"_id": task_id})
+            await counters.apply(Counter(task_delta({"status": "arq_fechada", "assigned_to": "arquser"}, -1)))
+            return await AsyncCollection(self.collection).delete_one(*args, **kwargs)
+
+    archiver = TaskArchiver(DeletedMidway(tasks_collection), AsyncCollection(archive_collection), counters)
+    assert await archiver.archive_batch() == (0, 1)
+    assert archive_collection.find_one({"_id": task_id}) is None
+    assert (await counters.stats("arquser"))["by_status"].get("arq_fechada", 0) == 0
+
+    archive_collection.drop()
+    counters_collection.drop()
+
+
+@pytest.mark.asyncio
+async def test_archive_keeps_the_copy_of_the_worker_that_moved_the_task(monkeypatch):
+    monkeypatch.setattr(archive, "TASK_ARCHIVE_STATUSES", ("arq_fechada",))
+    archive_collection, counters_collection = db["tasks_archive_test"], db["task_counters_archive_test"]
+    old = datetime.utcnow() - timedelta(days=archive.TASK_ARCHIVE_AFTER_DAYS + 1)
+    task_id = tasks_collection.insert_one(
+        {"title": "arq disputada", "status": "arq_fechada", "assigned_to": "arquser", "version": 1, "updated_at": old}
+    ).inserted_id
+    counters = TaskCounters(AsyncCollection(counters_collection), AsyncCollection(tasks_collection))
+    other = TaskArchiver(AsyncCollection(tasks_collection), AsyncCollection(archive_collection), counters)
+    loser_result = []
+
+    class RacedByAnotherWorker(AsyncCollection):
+        async def delete_one(self, *args, **kwargs):
+            # Outro worker copia e move a mesma tarefa; a cópia dele sobrescreve a deste lote.
+            loser_result.append(await other.archive_batch())
+            return await AsyncCollection(self.collection).delete_one(*args, **kwargs)
+
+    archiver = TaskArchiver(RacedByAnotherWorker(tasks_collection), AsyncCollection(archive_collection), counters)
+    assert await archiver.archive_batch() == (0, 1)
+    assert loser_result == [(1, 1)]
+    assert archive_collection.find_one({"_id": task_id})["title"] == "arq disputada"
+    assert tasks_collection.find_one({"_id": task_id}) is None
+
+    archive_collection.drop()
+    counters_collection.drop()
+
+
+@pytest.mark.asyncio
+async def test_archive_rewrites_a_copy_undone_by_another_worker(monkeypatch):
+    monkeypatch.setattr(archive, "TASK_ARCHIVE_STATUSES", ("arq_fechada",))
+    archive_collection, counters_collection = db["tasks_archive_test"], db["task_counters_archive_test"]
+    old = datetime.utcnow() - timedelta(days=archive.TASK_ARCHIVE_AFTER_DAYS + 1)
+    doc = {"title": "arq sobrescrita", "status": "arq_fechada", "assigned_to": "arquser", "version": 1, "updated_at": old}
+    task_id = tasks_collection.insert_one(doc).inserted_id
+
+    class OverwrittenMidway(AsyncCollection):
+        async def delete_one(self, *args, **kwargs):
+            # Outro worker sobrescreve a cópia, perde a remoção e desfaz a própria cópia.
+            other_run = ObjectId()
+            archive_collection.replace_one({"_id": task_id}, {**doc, "archive_run": other_run}, upsert=True)
+            result = await AsyncCollection(self.collection).delete_one(*args, **kwargs)
+            archive_collection.delete_one({"_id": task_id, "archive_run": other_run})
+            return result
+
+    counters = TaskCounters(AsyncCollection(counters_collection), AsyncCollection(tasks_collection))
+    archiver = TaskArchiver(OverwrittenMidway(tasks_collection), AsyncCollection(archive_collection), counters)
+    assert await archiver.archive_batch() == (1, 1)
+    assert archive_collection.find_one({"_id": task_id})["title"] == "arq sobrescrita"
+
+    archive_collection.drop()
+    counters_collection.drop()
+
+
+@pytest.mark.asyncio
+async def test_archive_all_continues_after_a_full_batch_with_changed_tasks(monkeypatch):
+    monkeypatch.setattr(archive, "TASK_ARCHIVE_STATUSES", ("arq_fechada",))
+    monkeypatch.setattr(archive, "TASK_ARCHIVE_BATCH_SIZE", 2)
+    archive_collection, counters_collection = db["tasks_archive_test"], db["task_counters_archive_test"]
+    old = datetime.utcnow() - timedelta(days=archive.TASK_ARCHIVE_AFTER_DAYS + 1)
+    ids = tasks_collection.insert_many([
+        {"title": f"arq lote {i}", "status": "arq_fechada", "assigned_to": "arquser", "version": 1, "updated_at": old}
+        for i in range(3)
+    ]).inserted_ids
+
+    class FirstChangedMidway(AsyncCollection):
+        async def delete_one(self, query, *args, **kwargs):
+            if query["_id"] == ids[0]:
+                # A primeira tarefa é reaberta no meio do primeiro lote.
+                tasks_collection.update_one({"_id": ids[0]}, {"$set": {"status": "arq_aberta"}, "$inc": {"version": 1}})
+            return await AsyncCollection(self.collection).delete_one(query, *args, **kwargs)
+
+    counters = TaskCounters(AsyncCollection(counters_collection), AsyncCollection(tasks_collection))
+    archiver = TaskArchiver(FirstChangedMidway(tasks_collection), AsyncCollection(archive_collection), counters)
+    assert await archiver.archive_all() == 2
+    assert [t["_id"] for t in tasks_collection.find({"assigned_to": "arquser"})] == [ids[0]]
+
+    tasks_collection.delete_many({"assigned_to": "arquser"})
+    archive_collection.drop()
+    counters_collection.drop()
@@ -0,0 +1,68 @@
+import pytest
+from controller.assignees import ActiveUsernameIndex
+from controller.database import AsyncCollection, users_collection
+
+
+@pytest.mark.asyncio
+async def test_active_username_index():
+    users_collection.insert_one({
+        "username": "assigneeuser",
+        "email": "assigneeuser@email.com",
+        "password": "123456",
+        "is_active": True
+    })
+    index = ActiveUsernameIndex(AsyncCollection(users_collection))
+    await index.warm()
+    assert await index.exists("assigneeuser")
+    assert index.hits == 1
+    index.discard("assigneeuser")
+    users_collection.update_one({"username": "assigneeuser"}, {"$set": {"is_active": False}})
+    assert not await index.exists("assigneeuser")
+    assert await index.existing({"assigneeuser", None}) == set()
+    users_collection.delete_one({"username": "assigneeuser"})
+
+
+@pytest.mark.asyncio
+async def test_active_username_index_falls_back_to_db():
+    index = ActiveUsernameIndex(AsyncCollection(users_collection))
+    await index.warm()
+    users_collection.insert_one({
+        "username": "otherworker",
+        "email": "otherworker@email.com",
+        "password": "123456",
+        "is_active": True
+    })
+    # Criado fora deste processo: ainda é encontrado e passa a ficar em memória
+    assert await index.exists("otherworker")
+    assert "otherworker" in await index.existing({"otherworker"})
+    assert index.hits == 1
+    users_collection.delete_one({"username": "otherworker"})
+
+
+@pytest.mark.asyncio
+async def test_warm_keeps_removals_made_during_the_scan():
+    users_collection.insert_one({
+        "username": "scanuser",
+        "email": "scanuser@email.com",
+        "password": "123456",
+        "is_active": True
+    })
+
+    class RemovedDuringScan(AsyncCollection):
+        def find(self, *args, **kwargs):
+            cursor = super().find(*args, **kwargs)
+
+            async def docs():
+                async for doc in cursor:
+                    yield doc
+                    if doc["username"] == "scanuser":
+                        # Desativado depois de a leitura já ter passado por ele.
+                        users_collection.update_one({"username": "scanuser"}, {"$set": {"is_active": False}})
+                        index.discard("scanuser")
+            return docs()
+
+    index = ActiveUsernameIndex(RemovedDuringScan(users_collection))
+    await index.warm()
+    assert "scanuser" not in index._usernames
+    assert not await index.exists("scanuser")
+    users_collection.delete_one({"username": "scanuser"})
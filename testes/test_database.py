@@ -0,0 +1,134 @@
+import pytest
+from controller.database import (
+    AsyncCollection,
+    AsyncCursor,
+    MongoStorage,
+    async_task_counters_collection,
+    current_storage,
+    tasks_collection
+)
+from controller.memory_storage import MemoryStorage
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query=None):
+        return iter([d for d in self.docs if all(d.get(k) == v for k, v in (query or {}).items())])
+
+    def find_one(self, query):
+        return next(self.find(query), None)
+
+
+@pytest.mark.asyncio
+async def test_async_collection_find_one():
+    coll = AsyncCollection(FakeCollection([{"_id": 1, "username": "a"}]))
+    assert await coll.find_one({"username": "a"}) == {"_id": 1, "username": "a"}
+    assert await coll.find_one({"username": "b"}) is None
+
+
+@pytest.mark.asyncio
+async def test_async_cursor_batches():
+    docs = [{"_id": i} for i in range(25)]
+    cursor = AsyncCursor(iter(docs), batch_size=10)
+    assert [d async for d in cursor] == docs
+
+
+@pytest.mark.asyncio
+async def test_async_collection_bind():
+    coll = AsyncCollection(FakeCollection([{"_id": 1, "assigned_to": "x"}]))
+    coll.bind(FakeCollection([{"_id": 2, "assigned_to": "x"}]))
+    assert await coll.find({"assigned_to": "x"}).to_list() == [{"_id": 2, "assigned_to": "x"}]
+
+
+@pytest.mark.asyncio
+async def test_async_collection_wraps_pymongo():
+    coll = AsyncCollection(tasks_collection)
+    result = await coll.insert_one({"title": "async", "status": "aberta", "assigned_to": "asyncuser"})
+    found = await coll.find({"assigned_to": "asyncuser"}).to_list()
+    assert [t["_id"] for t in found] == [result.inserted_id]
+    await coll.delete_many({"assigned_to": "asyncuser"})
+
+
+class ReplicaSetStandIn(FakeCollection):
+    """Primário com um secundário atrasado: leituras não primárias veem só ``secondary_docs``."""
+
+    def __init__(self, docs, secondary_docs, read_preference=None):
+        super().__init__(docs)
+        self.secondary_docs = secondary_docs
+        self.read_preference = read_preference
+
+    def with_options(self, read_preference=None):
+        return ReplicaSetStandIn(self.docs, self.secondary_docs, read_preference)
+
+    def find(self, query=None):
+        docs = self.docs if self.read_preference is None else self.secondary_docs
+        return iter([d for d in docs if all(d.get(k) == v for k, v in (query or {}).items())])
+
+
+@pytest.mark.asyncio
+async def test_reader_routes_reads_by_read_preference(monkeypatch):
+    from controller import database
+    monkeypatch.setattr(database, "READ_PREFERENCE", "secondaryPreferred")
+    monkeypatch.setattr(database, "READ_PREFERENCE_ROUTES", {"get_task": "primary"})
+    coll = AsyncCollection(ReplicaSetStandIn([{"_id": 1}, {"_id": 2}], [{"_id": 1}]))
+
+    assert coll.reader("get_task") is coll
+    assert await coll.reader("get_task").find_one({"_id": 2}) == {"_id": 2}
+    reader = coll.reader("list_tasks")
+    assert reader is coll.reader("list_tasks")
+    assert reader.collection.read_preference.mongos_mode == "secondaryPreferred"
+    assert reader.collection.read_preference.max_staleness == database.READ_MAX_STALENESS_SECONDS
+    # Leitura logo após a escrita: o secundário ainda não tem o documento, o primário tem.
+    assert await reader.find_one({"_id": 2}) is None
+    assert await coll.find_one({"_id": 2}) == {"_id": 2}
+
+    coll.bind(ReplicaSetStandIn([], []))
+    assert coll.reader("list_tasks") is not reader
+
+    monkeypatch.setattr(database, "READ_PREFERENCE_ROUTES", {"get_task": "secundario"})
+    with pytest.raises(ValueError):
+        coll.reader("get_task")
+
+
+def test_lazy_collection_with_options(mongo_storage):
+    from pymongo.read_preferences import Secondary
+    from controller.database import LazyCollection
+    reader = LazyCollection("tasks").with_options(read_preference=Secondary())
+    assert reader.name == "tasks"
+    assert reader.read_preference == Secondary()
+
+
+@pytest.mark.asyncio
+async def test_response_cache_fills_from_primary(monkeypatch):
+    from bson import ObjectId
+    from controller import database
+    from controller.database import async_tasks_collection
+    from controller.response_cache import task_response_cache
+    from model.models import User
+    from view.tasks import get_task
+    monkeypatch.setattr(database, "READ_PREFERENCE", "secondary")
+    monkeypatch.setattr(database, "READ_PREFERENCE_ROUTES", {})
+    task_id = ObjectId()
+    task = {"_id": task_id, "title": "t", "status": "aberta", "assigned_to": "u"}
+    # O secundário ainda tem a versão anterior à última escrita.
+    stand_in = ReplicaSetStandIn([{**task, "version": 2}], [{**task, "version": 1}])
+    monkeypatch.setattr(async_tasks_collection, "collection", stand_in)
+    monkeypatch.setattr(async_tasks_collection, "_readers", {})
+    await task_response_cache.invalidate(str(task_id))
+    user = User(id=str(ObjectId()), username="u", email="u@email.com")
+    resp = await get_task(str(task_id), expand=None, if_none_match=None, current_user=user)
+    assert resp.headers["ETag"] == '"2"'
+    await task_response_cache.invalidate(str(task_id))
+
+
+@pytest.mark.asyncio
+async def test_mongo_storage_on_given_database():
+    database = MemoryStorage()
+    token = current_storage.set(MongoStorage(database))
+    try:
+        await async_task_counters_collection.insert_one({"field": "status", "value": "aberta", "count": 1})
+    finally:
+        current_storage.reset(token)
+    assert database["task_counters"].count_documents({}) == 1
@@ -0,0 +1,102 @@
+import pytest
+from bson import ObjectId
+from controller.events import TaskEventBus, change_to_event
+from view.tasks import _event_stream
+
+
+@pytest.mark.asyncio
+async def test_bus_routes_by_assignee():
+    bus = TaskEventBus(queue_size=10)
+    ana, bia, everyone = bus.subscribe("ana"), bus.subscribe("bia"), bus.subscribe()
+    bus.publish({"type": "updated", "id": "1", "changes": {"assigned_to": "bia"}}, ("ana", "bia"))
+    bus.publish({"type": "created", "task": {"id": "2"}}, ("ana",))
+    assert ana.queue.qsize() == 2 and bia.queue.qsize() == 1 and everyone.queue.qsize() == 2
+    assert await bia.get(0.1) == {"type": "updated", "id": "1", "changes": {"assigned_to": "bia"}}
+    assert await bia.get(0.01) is None
+    for subscription in (ana, bia, everyone):
+        bus.unsubscribe(subscription)
+    assert bus.subscriber_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_is_disconnected():
+    bus = TaskEventBus(queue_size=3)
+    slow = bus.subscribe("ana")
+    for i in range(10):
+        bus.publish({"type": "deleted", "id": str(i)}, ("ana",))
+    # A fila nunca passa do limite: só sobra o aviso de overflow.
+    assert slow.queue.qsize() == 1
+    assert bus.overflows == 1
+    chunks = [chunk async for chunk in _event_stream(slow)]
+    assert chunks == [b'event: overflow\ndata: {"type":"overflow"}\n\n']
+    assert bus.subscriber_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_event_stream_heartbeat(monkeypatch):
+    import view.tasks
+    monkeypatch.setattr(view.tasks, "TASK_EVENTS_HEARTBEAT_SECONDS", 0.01)
+    bus = TaskEventBus()
+    subscription = bus.subscribe()
+    stream = _event_stream(subscription)
+    assert await stream.__anext__() == b": keepalive\n\n"
+    bus.publish({"type": "deleted", "id": "1"})
+    assert await stream.__anext__() == b'event: deleted\ndata: {"type":"deleted","id":"1"}\n\n'
+    await stream.aclose()
+    assert bus.subscriber_count() == 0
+
+
+def test_change_to_event():
+    oid = ObjectId()
+    event, assignees = change_to_event({
+        "operationType": "update", "documentKey": {"_id": oid},
+        "updateDescription": {"updatedFields": {"status": "fechada", "version": 2}},
+        "fullDocument": {"_id": oid, "assigned_to": "bia"},
+        "fullDocumentBeforeChange": {"_id": oid, "assigned_to": "ana"},
+    })
+    assert event == {"type": "updated", "id": str(oid), "changes": {"status": "fechada"}}
+    assert assignees == ("ana", "bia")
+    event, assignees = change_to_event({"operationType": "delete", "documentKey": {"_id": oid}})
+    assert event == {"type": "deleted", "id": str(oid)} and assignees == (None,)
+
+
+def test_event_websocket():
+    from fastapi.testclient import TestClient
+    from controller.auth_utils import create_access_token
+    from controller.database import users_collection
+    from controller.main import app
+    user_id = users_collection.insert_one({
+        "username": "wsuser", "email": "wsuser@email.com", "password": "123456", "is_active": True
+    }).inserted_id
+    token = create_access_token(data={"sub": str(user_id)})
+    client = TestClient(app)
+    with client.websocket_connect("/tasks/events/ws?assigned_to=wsuser", subprotocols=["bearer", token]) as ws:
+        assert ws.accepted_subprotocol == "bearer"
+        body = {"title": "WS", "description": "d", "status": "aberta", "assigned_to": "wsuser"}
+        task_id = client.post("/tasks", json=body, headers={"Authorization": f"Bearer {token}"}).json()["id"]
+        event = ws.receive_json()
+        assert event["type"] == "created" and event["task"]["id"] == task_id
+        # Ids em maiúsculas são aceitos, mas os eventos usam a forma canônica, como no created.
+        headers = {"Authorization": f"Bearer {token}"}
+        client.put(f"/tasks/{task_id.upper()}", json={"status": "fechada"}, headers=headers)
+        assert ws.receive_json() == {"type": "updated", "id": task_id, "changes": {"status": "fechada"}}
+        client.patch("/tasks/bulk", json={"tasks": [{"id": task_id.upper(), "status": "aberta"}]}, headers=headers)
+        assert ws.receive_json() == {"type": "updated", "id": task_id, "changes": {"status": "aberta"}}
+    for kwargs in ({"subprotocols": ["bearer", "invalido"]}, {}):
+        with pytest.raises(Exception):
+            with client.websocket_connect("/tasks/events/ws", **kwargs) as ws:
+                ws.receive_json()
+    with client.websocket_connect("/tasks/events/ws", headers={"Authorization": f"Bearer {token}"}) as ws:
+        assert ws.accepted_subprotocol is None
+    # O token na query string não é mais aceito.
+    with pytest.raises(Exception):
+        with client.websocket_connect(f"/tasks/events/ws?token={token}") as ws:
+            ws.receive_json()
+    with client.websocket_connect("/tasks/events/ws?assigned_to=wsuser", subprotocols=["bearer", token]) as ws:
+        client.delete(f"/tasks/{task_id.upper()}", headers=headers)
+        assert ws.receive_json() == {"type": "deleted", "id": task_id}
+        other_id = client.post("/tasks", json=body, headers=headers).json()["id"]
+        assert ws.receive_json()["type"] == "created"
+        client.request("DELETE", "/tasks/bulk", json={"ids": [other_id.upper()]}, headers=headers)
+        assert ws.receive_json() == {"type": "deleted", "id": other_id}
+    users_collection.delete_one({"_id": user_id})
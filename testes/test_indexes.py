@@ -0,0 +1,28 @@
+from controller.database import db
+from controller.archive import ARCHIVE_SORT, archive_filter
+from controller.indexes import HOT_QUERIES, INDEXES, ensure_indexes, plan_stages
+
+
+def test_ensure_indexes_idempotent():
+    ensure_indexes(db)
+    ensure_indexes(db)
+    for collection_name, indexes in INDEXES.items():
+        existing = db[collection_name].index_information()
+        for index in indexes:
+            assert index.document["name"] in existing
+
+
+def test_plan_stages():
+    plan = {
+        "stage": "FETCH",
+        "inputStage": {"stage": "IXSCAN", "indexName": "assigned_to_id"},
+    }
+    assert plan_stages(plan) == ["FETCH", "IXSCAN"]
+    assert plan_stages({"queryPlan": {"stage": "COLLSCAN"}}) == ["COLLSCAN"]
+
+
+def test_archive_hot_query_matches_archiver():
+    shape = next(q for q in HOT_QUERIES if q["name"] == "archive tasks")
+    assert shape["filter"].keys() == archive_filter().keys()
+    assert shape["filter"]["$or"][1].keys() == {"updated_at", "_id"}
+    assert shape["sort"] == ARCHIVE_SORT
@@ -0,0 +1,55 @@
+import json
+import logging
+import pytest
+from httpx import AsyncClient, ASGITransport
+from controller.main import app
+from logs.logging_config import BatchingRotatingFileHandler, JsonFormatter, RequestIdFilter, request_id_var
+
+
+def test_json_formatter_includes_request_id():
+    token = request_id_var.set("abc123")
+    record = logging.LogRecord("root", logging.INFO, __file__, 1, "Tarefa consultada: %s", ("42",), None)
+    RequestIdFilter().filter(record)
+    request_id_var.reset(token)
+    data = json.loads(JsonFormatter().format(record))
+    assert data["message"] == "Tarefa consultada: 42"
+    assert data["request_id"] == "abc123"
+    assert data["level"] == "INFO"
+
+
+@pytest.mark.asyncio
+async def test_request_id_header():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        resp = await ac.get("/tasks", headers={"X-Request-ID": "req-1"})
+        assert resp.headers["X-Request-ID"] == "req-1"
+        resp = await ac.get("/tasks")
+        assert len(resp.headers["X-Request-ID"]) == 32
+
+
+def test_size_rollovers_keep_every_backup(tmp_path):
+    path = tmp_path / "a.log"
+    handler = BatchingRotatingFileHandler(str(path), max_bytes=200, batch_size=1, backupCount=7, when="midnight")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+
+    def write(start, count):
+        for i in range(start, start + count):
+            handler.emit(logging.LogRecord("root", logging.INFO, __file__, 1, "linha %03d com algum texto", (i,), None))
+
+    def backups():
+        return sorted(p.name for p in tmp_path.iterdir() if p.name != "a.log")
+
+    def lines():
+        files = [tmp_path / name for name in backups()] + [path]
+        return [line for p in files for line in p.read_text().splitlines()]
+
+    write(0, 40)
+    handler.force_flush()
+    assert len(backups()) > 1
+    assert lines() == [f"linha {i:03d} com algum texto" for i in range(40)]
+    # Além de backupCount, só os backups mais antigos são descartados.
+    write(40, 100)
+    handler.close()
+    assert len(backups()) == 7
+    assert lines()[-1] == "linha 139 com algum texto"
+    assert lines() == sorted(lines())
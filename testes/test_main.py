@@ -2,6 +2,8 @@ import pytest
 from httpx import AsyncClient, ASGITransport
 from controller.main import app
 from controller.database import users_collection, tasks_collection
+from controller.auth_utils import user_cache
+from controller.passwords import is_hashed
 
 @pytest.mark.asyncio
 async def test_create_user():
@@ -294,4 +296,436 @@ async def test_auth_logout():
         resp = await ac.get("/users/invalidid", headers=headers)
         assert resp.status_code == 401 or resp.status_code == 400
 
-        users_collection.delete_one({"username": "logoutuser"})
\ No newline at end of file
+        users_collection.delete_one({"username": "logoutuser"})
+@pytest.mark.asyncio
+async def test_list_tasks_pagination():
+    transport = ASGITransport(app=app)
+    users_collection.insert_one({
+        "username": "pageuser",
+        "email": "pageuser@email.com",
+        "password": "123456",
+        "is_active": True
+    })
+    tasks_collection.insert_many([
+        {"title": f"Tarefa {i}", "description": "Descrição", "status": "aberta", "assigned_to": "pageuser"}
+        for i in range(5)
+    ])
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        resp = await ac.post("/auth/login", json={
+            "username": "pageuser",
+            "password": "123456"
+        })
+        token = resp.json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        # Primeira página
+        resp = await ac.get("/tasks", params={"assigned_to": "pageuser", "limit": 3}, headers=headers)
+        assert resp.status_code == 200
+        assert [t["title"] for t in resp.json()] == ["Tarefa 0", "Tarefa 1", "Tarefa 2"]
+        cursor = resp.headers["X-Next-Cursor"]
+        # Segunda página
+        resp = await ac.get("/tasks", params={"assigned_to": "pageuser", "limit": 3, "after": cursor}, headers=headers)
+        assert [t["title"] for t in resp.json()] == ["Tarefa 3", "Tarefa 4"]
+        assert "X-Next-Cursor" not in resp.headers
+        # Projeção
+        resp = await ac.get("/tasks", params={"assigned_to": "pageuser", "fields": "title"}, headers=headers)
+        assert resp.status_code == 200
+        assert set(resp.json()[0]) == {"id", "title"}
+        resp = await ac.get("/tasks", params={"fields": "password"}, headers=headers)
+        assert resp.status_code == 400
+        # Streaming NDJSON
+        resp = await ac.get("/tasks", params={"assigned_to": "pageuser", "stream": True}, headers=headers)
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("application/x-ndjson")
+        assert len(resp.text.strip().splitlines()) == 5
+        # Limpeza
+        tasks_collection.delete_many({"assigned_to": "pageuser"})
+        users_collection.delete_one({"username": "pageuser"})
+
+@pytest.mark.asyncio
+async def test_auth_user_cache():
+    transport = ASGITransport(app=app)
+    users_collection.insert_one({
+        "username": "cacheuser",
+        "email": "cacheuser@email.com",
+        "password": "123456",
+        "is_active": True
+    })
+    user_id = str(users_collection.find_one({"username": "cacheuser"})["_id"])
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        resp = await ac.post("/auth/login", json={
+            "username": "cacheuser",
+            "password": "123456"
+        })
+        token = resp.json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        await ac.get(f"/users/{user_id}", headers=headers)
+        hits = user_cache.hits
+        resp = await ac.get(f"/users/{user_id}", headers=headers)
+        assert resp.status_code == 200
+        assert user_cache.hits == hits + 1
+        # Atualização invalida o usuário em cache
+        resp = await ac.put(f"/users/{user_id}", json={"email": "novo@email.com"}, headers=headers)
+        assert user_cache.get(user_id) is None
+        # Soft delete invalida o usuário: o token deixa de autenticar
+        resp = await ac.delete(f"/users/{user_id}", headers=headers)
+        assert resp.status_code == 200
+        resp = await ac.get(f"/users/{user_id}", headers=headers)
+        assert resp.status_code == 401
+        users_collection.delete_one({"username": "cacheuser"})
+
+@pytest.mark.asyncio
+async def test_bulk_tasks():
+    transport = ASGITransport(app=app)
+    users_collection.insert_one({
+        "username": "bulkuser",
+        "email": "bulkuser@email.com",
+        "password": "123456",
+        "is_active": True
+    })
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        resp = await ac.post("/auth/login", json={
+            "username": "bulkuser",
+            "password": "123456"
+        })
+        token = resp.json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        task = {"title": "Lote", "description": "Descrição", "status": "aberta", "assigned_to": "bulkuser"}
+        # Criação não ordenada: o item inválido não impede os demais
+        resp = await ac.post("/tasks/bulk", json={
+            "tasks": [task, dict(task, assigned_to="ninguem"), task],
+            "ordered": False
+        }, headers=headers)
+        assert resp.status_code == 200
+        body = resp.json()
+        assert [r["status"] for r in body["results"]] == ["created", "error", "created"]
+        ids = [r["id"] for r in body["results"] if r["status"] == "created"]
+        # Criação ordenada: para no primeiro erro
+        resp = await ac.post("/tasks/bulk", json={
+            "tasks": [dict(task, assigned_to="ninguem"), task]
+        }, headers=headers)
+        assert [r["status"] for r in resp.json()["results"]] == ["error", "skipped"]
+        # Atualização em lote
+        resp = await ac.patch("/tasks/bulk", json={
+            "tasks": [{"id": ids[0], "status": "fechada"}, {"id": "invalido", "status": "fechada"}, {"id": ids[1], "status": "fechada"}],
+            "ordered": False
+        }, headers=headers)
+        assert [r["status"] for r in resp.json()["results"]] == ["updated", "error", "updated"]
+        assert tasks_collection.count_documents({"assigned_to": "bulkuser", "status": "fechada"}) == 2
+        # Deleção em lote
+        resp = await ac.request("DELETE", "/tasks/bulk", json={"ids": ids}, headers=headers)
+        assert resp.json()["succeeded"] == 2
+        assert tasks_collection.count_documents({"assigned_to": "bulkuser"}) == 0
+        users_collection.delete_one({"username": "bulkuser"})
+
+@pytest.mark.asyncio
+async def test_metrics():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        await ac.post("/auth/login", json={"username": "ninguem", "password": "123456"})
+        resp = await ac.get("/metrics")
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/plain")
+        body = resp.text
+        assert 'http_request_duration_seconds_count{method="POST",route="/auth/login",status="401"}' in body
+        assert 'mongo_operation_duration_seconds_count{collection="users",operation="find_one",shape="is_active,username"}' in body
+        assert "http_requests_in_flight" in body
+        assert 'auth_cache_hits_total{cache="user"}' in body
+
+@pytest.mark.asyncio
+async def test_task_etags():
+    transport = ASGITransport(app=app)
+    users_collection.insert_one({
+        "username": "etaguser",
+        "email": "etaguser@email.com",
+        "password": "123456",
+        "is_active": True
+    })
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        resp = await ac.post("/auth/login", json={
+            "username": "etaguser",
+            "password": "123456"
+        })
+        token = resp.json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        resp = await ac.post("/tasks", json={
+            "title": "Minha Tarefa",
+            "description": "Descrição",
+            "status": "aberta",
+            "assigned_to": "etaguser"
+        }, headers=headers)
+        task_id = resp.json()["id"]
+        etag = resp.headers["ETag"]
+        # Leitura condicional
+        resp = await ac.get(f"/tasks/{task_id}", headers={**headers, "If-None-Match": etag})
+        assert resp.status_code == 304
+        assert resp.content == b""
+        # O id em maiúsculas é a mesma tarefa e a mesma entrada do cache
+        resp = await ac.get(f"/tasks/{task_id.upper()}", headers=headers)
+        assert resp.headers["ETag"] == etag
+        # Atualização com a versão correta
+        resp = await ac.put(f"/tasks/{task_id}", json={"status": "fechada"}, headers={**headers, "If-Match": etag})
+        assert resp.status_code == 200
+        assert resp.json()["status"] == "fechada"
+        new_etag = resp.headers["ETag"]
+        assert new_etag != etag
+        resp = await ac.get(f"/tasks/{task_id.upper()}", headers=headers)
+        assert resp.headers["ETag"] == new_etag
+        # Atualização com versão antiga
+        resp = await ac.put(f"/tasks/{task_id}", json={"status": "aberta"}, headers={**headers, "If-Match": etag})
+        assert resp.status_code == 412
+        resp = await ac.get(f"/tasks/{task_id}", headers={**headers, "If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.headers["ETag"] == new_etag
+        tasks_collection.delete_many({"assigned_to": "etaguser"})
+        users_collection.delete_one({"username": "etaguser"})
+
+@pytest.mark.asyncio
+async def test_user_etags():
+    transport = ASGITransport(app=app)
+    users_collection.insert_one({
+        "username": "etaguser2",
+        "email": "etaguser2@email.com",
+        "password": "123456",
+        "is_active": True
+    })
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        resp = await ac.post("/auth/login", json={
+            "username": "etaguser2",
+            "password": "123456"
+        })
+        token = resp.json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        user_id = str(users_collection.find_one({"username": "etaguser2"})["_id"])
+        # Documento sem o campo version é tratado como versão 0
+        resp = await ac.get(f"/users/{user_id}", headers=headers)
+        assert resp.headers["ETag"] == '"0"'
+        resp = await ac.put(f"/users/{user_id}", json={"email": "novo@email.com"}, headers={**headers, "If-Match": '"0"'})
+        assert resp.status_code == 200
+        assert resp.headers["ETag"] == '"1"'
+        resp = await ac.get(f"/users/{user_id}", headers={**headers, "If-None-Match": '"1"'})
+        assert resp.status_code == 304
+        users_collection.delete_one({"username": "etaguser2"})
+
+@pytest.mark.asyncio
+async def test_password_hashed_and_legacy_rehashed_on_login():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        resp = await ac.post("/users", json={"username": "hashuser", "email": "hash@email.com", "password": "123456"})
+        assert resp.status_code == 200
+        assert is_hashed(users_collection.find_one({"username": "hashuser"})["password"])
+        resp = await ac.post("/auth/login", json={"username": "hashuser", "password": "123456"})
+        assert resp.status_code == 200
+        resp = await ac.post("/auth/login", json={"username": "hashuser", "password": "errada"})
+        assert resp.status_code == 401
+        users_collection.delete_one({"username": "hashuser"})
+
+        users_collection.insert_one({
+            "username": "legacyuser", "email": "legacy@email.com", "password": "123456", "is_active": True
+        })
+        resp = await ac.post("/auth/login", json={"username": "legacyuser", "password": "123456"})
+        assert resp.status_code == 200
+        stored = users_collection.find_one({"username": "legacyuser"})["password"]
+        assert is_hashed(stored)
+        resp = await ac.post("/auth/login", json={"username": "legacyuser", "password": "123456"})
+        assert resp.status_code == 200
+        assert users_collection.find_one({"username": "legacyuser"})["password"] == stored
+        users_collection.delete_one({"username": "legacyuser"})
+
+@pytest.mark.asyncio
+async def test_task_stats():
+    transport = ASGITransport(app=app)
+    users_collection.insert_one({
+        "username": "statsowner", "email": "statsowner@email.com", "password": "123456", "is_active": True
+    })
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        resp = await ac.post("/auth/login", json={"username": "statsowner", "password": "123456"})
+        headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+        async def stats():
+            resp = await ac.get("/tasks/stats", params={"assigned_to": "statsowner"}, headers=headers)
+            assert resp.status_code == 200
+            return resp.json()
+
+        before = (await stats())["by_status"]
+        body = {"title": "Stats", "description": "d", "status": "aberta", "assigned_to": "statsowner"}
+        ids = [(await ac.post("/tasks", json=body, headers=headers)).json()["id"] for _ in range(3)]
+        await ac.put(f"/tasks/{ids[0]}", json={"status": "fechada"}, headers=headers)
+        await ac.delete(f"/tasks/{ids[1]}", headers=headers)
+        resp = await ac.post("/tasks/bulk", json={"tasks": [body, body]}, headers=headers)
+        assert resp.json()["succeeded"] == 2
+
+        after = await stats()
+        assert after["by_assigned_to"] == {"statsowner": 4}
+        assert after["by_status"]["aberta"] - before.get("aberta", 0) == 3
+        assert after["by_status"]["fechada"] - before.get("fechada", 0) == 1
+        # Só as tarefas do responsável filtrado entram em by_status e no total.
+        assert after["by_status"] == {"aberta": 3, "fechada": 1}
+        assert after["total"] == 4
+        tasks_collection.delete_many({"assigned_to": "statsowner"})
+        users_collection.delete_one({"username": "statsowner"})
+
+@pytest.mark.asyncio
+async def test_list_tasks_filters_and_sort():
+    transport = ASGITransport(app=app)
+    users_collection.insert_one({
+        "username": "filteruser", "email": "filteruser@email.com", "password": "123456", "is_active": True
+    })
+    tasks_collection.insert_many([
+        {"title": f"Filtro {i}", "description": "d", "status": ["aberta", "andamento", "fechada"][i % 3],
+         "assigned_to": "filteruser"}
+        for i in range(6)
+    ] + [{"title": "Outra", "description": "d", "status": "aberta", "assigned_to": "filteruser"}])
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        resp = await ac.post("/auth/login", json={"username": "filteruser", "password": "123456"})
+        headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+        resp = await ac.get("/tasks", params={"assigned_to": "filteruser", "status": ["aberta", "fechada"]},
+                            headers=headers)
+        assert resp.status_code == 200
+        assert sorted(t["status"] for t in resp.json()) == ["aberta", "aberta", "aberta", "fechada", "fechada"]
+
+        titles, after = [], None
+        while True:
+            params = {"assigned_to": "filteruser", "title_prefix": "Filtro", "sort": "-title", "limit": 4}
+            if after:
+                params["after"] = after
+            resp = await ac.get("/tasks", params=params, headers=headers)
+            titles += [t["title"] for t in resp.json()]
+            after = resp.headers.get("X-Next-Cursor")
+            if not after:
+                break
+        assert titles == [f"Filtro {i}" for i in range(5, -1, -1)]
+
+        resp = await ac.get("/tasks", params={"status": "aberta", "title_prefix": "Filtro"}, headers=headers)
+        assert resp.status_code == 400
+        resp = await ac.get("/tasks", params={"sort": "status"}, headers=headers)
+        assert resp.status_code == 400
+    tasks_collection.delete_many({"assigned_to": "filteruser"})
+    users_collection.delete_one({"username": "filteruser"})
+
+@pytest.mark.asyncio
+async def test_task_handlers_publish_events():
+    from controller.events import task_events
+    transport = ASGITransport(app=app)
+    users_collection.insert_one({
+        "username": "eventuser", "email": "eventuser@email.com", "password": "123456", "is_active": True
+    })
+    subscription = task_events.subscribe("eventuser")
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        resp = await ac.post("/auth/login", json={"username": "eventuser", "password": "123456"})
+        headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+        body = {"title": "Evento", "description": "d", "status": "aberta", "assigned_to": "eventuser"}
+        task_id = (await ac.post("/tasks", json=body, headers=headers)).json()["id"]
+        await ac.put(f"/tasks/{task_id}", json={"status": "fechada"}, headers=headers)
+        await ac.delete(f"/tasks/{task_id}", headers=headers)
+    events = [await subscription.get(1) for _ in range(3)]
+    task_events.unsubscribe(subscription)
+    assert [e["type"] for e in events] == ["created", "updated", "deleted"]
+    assert events[0]["task"]["id"] == task_id
+    assert events[1]["changes"] == {"status": "fechada"}
+    users_collection.delete_one({"username": "eventuser"})
+
+@pytest.mark.asyncio
+async def test_expand_assignee():
+    from controller.metrics import db_operation_duration
+    transport = ASGITransport(app=app)
+    users_collection.insert_many([
+        {"username": f"expand{i}", "email": f"expand{i}@email.com", "password": "123456", "is_active": True,
+         "version": 1}
+        for i in range(5)
+    ])
+    tasks_collection.insert_many([
+        {"title": f"Expand {i}", "description": "d", "status": "aberta", "assigned_to": f"expand{i % 5}"}
+        for i in range(250)
+    ] + [{"title": "Órfã", "description": "d", "status": "expand_orfa", "assigned_to": "expandninguem"}])
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        resp = await ac.post("/auth/login", json={"username": "expand0", "password": "123456"})
+        headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+        lookups = db_operation_duration.count("users", "find", "username:$in")
+        resp = await ac.get("/tasks", params={"assigned_to": "expand3", "expand": "assignee", "limit": 1000},
+                            headers=headers)
+        tasks = resp.json()
+        assert len(tasks) == 50
+        assert all(t["assignee"]["email"] == "expand3@email.com" for t in tasks)
+        assert "password" not in tasks[0]["assignee"]
+        assert db_operation_duration.count("users", "find", "username:$in") == lookups + 1
+
+        resp = await ac.get("/tasks", params={"status": "expand_orfa", "expand": "assignee",
+                                              "fields": "title"}, headers=headers)
+        assert resp.json()[0]["assignee"] is None
+        assert "assigned_to" not in resp.json()[0]
+
+        resp = await ac.get(f"/tasks/{tasks[0]['id']}", params={"expand": "assignee"}, headers=headers)
+        assert resp.json()["assignee"]["username"] == "expand3"
+        etag = resp.headers["ETag"]
+        resp = await ac.get(f"/tasks/{tasks[0]['id']}", params={"expand": "assignee"},
+                            headers={**headers, "If-None-Match": etag})
+        assert resp.status_code == 304
+        users_collection.update_one({"username": "expand3"}, {"$set": {"email": "novo@email.com"}, "$inc": {"version": 1}})
+        resp = await ac.get(f"/tasks/{tasks[0]['id']}", params={"expand": "assignee"},
+                            headers={**headers, "If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.json()["assignee"]["email"] == "novo@email.com"
+
+        resp = await ac.get("/tasks", params={"expand": "owner"}, headers=headers)
+        assert resp.status_code == 400
+    tasks_collection.delete_many({"title": {"$regex": "^(Expand|Órfã)"}})
+    users_collection.delete_many({"username": {"$regex": "^expand"}})
+
+@pytest.mark.asyncio
+async def test_archived_tasks():
+    import json
+    from bson import ObjectId
+    from controller.database import tasks_archive_collection
+    transport = ASGITransport(app=app)
+    users_collection.insert_one({
+        "username": "archiveuser", "email": "archiveuser@email.com", "password": "123456", "is_active": True
+    })
+    from datetime import datetime, timedelta
+    # Só tarefas criadas antes do prazo de arquivamento podem estar no arquivo.
+    created = datetime.utcnow() - timedelta(days=365)
+    ids = [ObjectId.from_datetime(created + timedelta(seconds=i)) for i in range(4)]
+    tasks_collection.insert_many([
+        {"_id": ids[0], "title": "Quente 0", "status": "aberta", "assigned_to": "archiveuser"},
+        {"_id": ids[2], "title": "Quente 2", "status": "aberta", "assigned_to": "archiveuser"},
+    ])
+    tasks_archive_collection.insert_many([
+        {"_id": ids[1], "title": "Arquivada 1", "status": "fechada", "assigned_to": "archiveuser"},
+        {"_id": ids[3], "title": "Arquivada 3", "status": "fechada", "assigned_to": "archiveuser"},
+    ])
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        resp = await ac.post("/auth/login", json={"username": "archiveuser", "password": "123456"})
+        headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+        resp = await ac.get("/tasks", params={"assigned_to": "archiveuser"}, headers=headers)
+        assert [t["title"] for t in resp.json()] == ["Quente 0", "Quente 2"]
+
+        params = {"assigned_to": "archiveuser", "include_archived": True, "limit": 3}
+        resp = await ac.get("/tasks", params=params, headers=headers)
+        assert [t["title"] for t in resp.json()] == ["Quente 0", "Arquivada 1", "Quente 2"]
+        resp = await ac.get("/tasks", params={**params, "after": resp.headers["X-Next-Cursor"]}, headers=headers)
+        assert [t["title"] for t in resp.json()] == ["Arquivada 3"]
+
+        resp = await ac.get("/tasks", params={**params, "sort": "-title", "stream": True}, headers=headers)
+        assert [json.loads(line)["title"] for line in resp.text.splitlines()] == ["Quente 2", "Quente 0", "Arquivada 3"]
+
+        resp = await ac.get(f"/tasks/{ids[1]}", headers=headers)
+        assert resp.status_code == 200
+        assert resp.json()["title"] == "Arquivada 1"
+
+        # Somente leitura: atualização responde 409; a deleção remove do arquivo.
+        resp = await ac.put(f"/tasks/{ids[1]}", json={"status": "aberta"}, headers=headers)
+        assert resp.status_code == 409
+        resp = await ac.patch("/tasks/bulk", json={"tasks": [{"id": str(ids[1]), "status": "aberta"}]}, headers=headers)
+        assert resp.json()["results"][0]["detail"] == "Task is archived"
+        resp = await ac.request("DELETE", "/tasks/bulk", json={"ids": [str(ids[3])]}, headers=headers)
+        assert resp.json()["results"][0]["detail"] == "Task is archived"
+        resp = await ac.delete(f"/tasks/{ids[1]}", headers=headers)
+        assert resp.status_code == 200
+        resp = await ac.get(f"/tasks/{ids[1]}", headers=headers)
+        assert resp.status_code == 404
+        assert tasks_archive_collection.find_one({"_id": ids[1]}) is None
+    tasks_collection.delete_many({"assigned_to": "archiveuser"})
+    tasks_archive_collection.delete_many({"assigned_to": "archiveuser"})
+    users_collection.delete_one({"username": "archiveuser"})
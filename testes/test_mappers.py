@@ -0,0 +1,27 @@
+import orjson
+from bson import ObjectId
+from model.mappers import DocumentResponse, dumps, task_document, user_document
+from model.models import Task, User
+
+
+def test_task_document_matches_model():
+    doc = {"_id": ObjectId(), "title": "Tarefa", "description": None, "status": "aberta",
+           "assigned_to": "ana", "version": 3}
+    data = task_document(doc)
+    assert data == Task(id=str(doc["_id"]), title="Tarefa", status="aberta", assigned_to="ana").model_dump()
+    assert task_document(doc, ("title",)) == {"id": str(doc["_id"]), "title": "Tarefa"}
+
+
+def test_user_document_hides_password():
+    doc = {"_id": ObjectId(), "username": "ana", "email": "ana@email.com", "password": "123", "is_active": True}
+    data = user_document(doc)
+    assert "password" not in data
+    assert data == User(id=str(doc["_id"]), username="ana", email="ana@email.com").model_dump()
+
+
+def test_dumps_object_id():
+    oid = ObjectId()
+    assert orjson.loads(dumps({"_id": oid, "nome": "ção"})) == {"_id": str(oid), "nome": "ção"}
+    response = DocumentResponse([{"id": oid}], headers={"X-Next-Cursor": str(oid)})
+    assert response.body == f'[{{"id":"{oid}"}}]'.encode()
+    assert response.headers["x-next-cursor"] == str(oid)
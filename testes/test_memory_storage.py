@@ -0,0 +1,102 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+from pymongo import DeleteOne, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from controller.database import MongoStorage, create_storage
+from controller.main import create_app
+from controller.memory_storage import MemoryStorage
+
+
+def test_create_storage():
+    assert isinstance(create_storage("memory"), MemoryStorage)
+    assert isinstance(create_storage("mongo"), MongoStorage)
+    with pytest.raises(ValueError):
+        create_storage("redis")
+
+
+def test_memory_queries_use_secondary_index():
+    tasks = MemoryStorage().collection("tasks")
+    tasks.insert_many([
+        {"title": "Relatório", "description": "mensal", "status": "aberta", "assigned_to": "ana"},
+        {"title": "Revisão", "description": "código", "status": "fechada", "assigned_to": "ana"},
+        {"title": "Deploy", "status": "aberta", "assigned_to": "bia"},
+    ])
+    assert set(tasks._indexes["assigned_to"]) == {"ana", "bia"}
+    assert [t["title"] for t in tasks.find({"assigned_to": "ana"}, sort=[("title", -1)])] == ["Revisão", "Relatório"]
+    assert [t["title"] for t in tasks.find({"assigned_to": {"$in": ["bia"]}, "status": "aberta"})] == ["Deploy"]
+    assert [t["title"] for t in tasks.find({"title": {"$regex": "^Re"}}, sort=[("title", 1)], limit=1)] == ["Relatório"]
+    assert [t["title"] for t in tasks.find({"$text": {"$search": "código"}})] == ["Revisão"]
+    assert tasks.find_one({"status": "fechada"}, projection={"_id": 0, "title": 1}) == {"title": "Revisão"}
+
+    previous = tasks.find_one_and_update({"title": "Deploy"}, {"$set": {"assigned_to": "ana"}})
+    assert previous["assigned_to"] == "bia"
+    assert "bia" not in tasks._indexes["assigned_to"]
+    assert tasks.count_documents({"assigned_to": "ana"}) == 3
+
+
+def test_memory_writes():
+    storage = MemoryStorage()
+    users = storage["users"]
+    users.create_indexes([IndexModel([("username", 1)], name="username_unique", unique=True)])
+    user_id = users.insert_one({"username": "ana", "is_active": True}).inserted_id
+    with pytest.raises(DuplicateKeyError):
+        users.insert_one({"username": "ana"})
+    with pytest.raises(BulkWriteError) as e:
+        users.insert_many([{"username": "bia"}, {"username": "ana"}, {"username": "cris"}])
+    assert e.value.details["nInserted"] == 1
+    assert "username_unique" in users.index_information()
+
+    updated = users.find_one_and_update({"_id": user_id}, {"$inc": {"version": 1}}, return_document=ReturnDocument.AFTER)
+    assert updated["version"] == 1
+    result = users.bulk_write([
+        UpdateOne({"username": "dani"}, {"$set": {"is_active": False}}, upsert=True),
+        DeleteOne({"username": "bia"}),
+    ])
+    assert result.upserted_count == 1 and result.deleted_count == 1
+    groups = {g["_id"]: g["count"] for g in users.aggregate([{"$group": {"_id": "$is_active", "count": {"$sum": 1}}}])}
+    assert groups == {True: 1, False: 1}
+    assert users.delete_many({}).deleted_count == 2
+
+
+@pytest.mark.asyncio
+async def test_apps_with_own_storage_are_isolated():
+    first, second = create_app(storage=MemoryStorage()), create_app(storage=MemoryStorage())
+    user = {"username": "isolado", "email": "isolado@email.com", "password": "123456"}
+    async with AsyncClient(transport=ASGITransport(app=first), base_url="http://test") as ac:
+        resp = await ac.post("/users", json=user)
+        assert resp.status_code == 200
+        login = await ac.post("/auth/login", json={"username": "isolado", "password": "123456"})
+        assert login.status_code == 200
+    assert first.state.storage["users"].find_one({"username": "isolado"}) is not None
+    assert second.state.storage["users"].find_one({"username": "isolado"}) is None
+    async with AsyncClient(transport=ASGITransport(app=second), base_url="http://test") as ac:
+        resp = await ac.post("/auth/login", json={"username": "isolado", "password": "123456"})
+        assert resp.status_code == 401
+        resp = await ac.post("/users", json=user)
+        assert resp.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_in_process_caches_are_per_storage():
+    first, second = create_app(storage=MemoryStorage()), create_app(storage=MemoryStorage())
+    second.state.storage["users"].insert_one(
+        {"username": "me", "email": "me@email.com", "password": "123456", "is_active": True}
+    )
+    async with AsyncClient(transport=ASGITransport(app=first), base_url="http://test") as ac:
+        resp = await ac.post("/users", json={"username": "so_no_a", "email": "a@email.com", "password": "123456"})
+        assert resp.status_code == 200
+    async with AsyncClient(transport=ASGITransport(app=second), base_url="http://test") as ac:
+        login = await ac.post("/auth/login", json={"username": "me", "password": "123456"})
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        # O índice de usernames ativos do primeiro app não vale para o segundo.
+        task = {"title": "t", "description": "d", "status": "aberta", "assigned_to": "so_no_a"}
+        resp = await ac.post("/tasks", json=task, headers=headers)
+        assert resp.status_code == 400
+        resp = await ac.post("/tasks/bulk", json={"tasks": [task]}, headers=headers)
+        assert resp.json()["failed"] == 1
+        resp = await ac.post("/tasks", json={**task, "assigned_to": "me"}, headers=headers)
+        assert resp.status_code == 200
+        task_id = resp.json()["id"]
+        assert (await ac.get(f"/tasks/{task_id}", headers=headers)).status_code == 200
+    assert second.state.storage["tasks"].count_documents({}) == 1
+    assert first.state.storage["tasks"].count_documents({}) == 0
@@ -0,0 +1,19 @@
+from controller.metrics import Histogram, query_shape
+
+
+def test_query_shape():
+    assert query_shape({"username": "x", "is_active": True}) == "is_active,username"
+    assert query_shape({"_id": {"$gt": 1}, "assigned_to": "x"}) == "_id:$gt,assigned_to"
+    assert query_shape({}) == "-"
+
+
+def test_histogram_render():
+    histogram = Histogram("latencia", "Teste.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5, "/a")
+    lines = list(histogram.render())
+    assert 'latencia_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latencia_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'latencia_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latencia_count{route="/a"} 3' in lines
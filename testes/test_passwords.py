@@ -0,0 +1,40 @@
+import asyncio
+import pytest
+from controller import passwords
+from controller.passwords import hash_password, needs_rehash, verify_password, verify_password_async
+
+
+def test_hash_and_verify():
+    stored = hash_password("123456", n=1024)
+    assert stored.startswith("scrypt$1024$")
+    assert stored != hash_password("123456", n=1024)
+    assert verify_password("123456", stored)
+    assert not verify_password("654321", stored)
+    assert not verify_password("123456", "scrypt$corrompido")
+
+
+def test_legacy_plaintext_and_rehash():
+    assert verify_password("123456", "123456")
+    assert not verify_password("123456", "1234567")
+    assert needs_rehash("123456")
+    assert needs_rehash(hash_password("123456", n=1024))
+    assert not needs_rehash(hash_password("123456"))
+
+
+@pytest.mark.asyncio
+async def test_verify_runs_off_the_event_loop():
+    stored = hash_password("123456")
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    results = await asyncio.gather(*(verify_password_async("123456", stored) for _ in range(4)))
+    task.cancel()
+    assert all(results)
+    if passwords.password_executor is not None:
+        assert ticks > 0
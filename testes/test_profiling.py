@@ -0,0 +1,71 @@
+import os
+import pstats
+import pytest
+from httpx import AsyncClient, ASGITransport
+from controller import profiling
+from controller.main import create_app
+from controller.memory_storage import MemoryStorage
+from controller.passwords import hash_password
+from controller.profiling import ProfileStore, should_profile
+
+
+def test_should_profile(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "segredo")
+    assert should_profile([(b"x-profile", b"segredo")], sample_rate=0)
+    assert not should_profile([(b"x-profile", b"errado")], sample_rate=1)
+    assert should_profile([], sample_rate=1)
+    assert not should_profile([], sample_rate=0)
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "")
+    assert not should_profile([(b"x-profile", b"")], sample_rate=0)
+
+
+def test_profile_store_ring(tmp_path):
+    store = ProfileStore(str(tmp_path), max_files=3)
+    ids = [f"{i:016d}-req{i}" for i in range(5)]
+    for i, profile_id in enumerate(ids):
+        store.save(profile_id, {"id": profile_id, "method": "GET", "route": "/tasks", "total_ms": i})
+    assert store.ids() == ids[:1:-1]
+    assert len(os.listdir(tmp_path)) == 3
+    assert [s["id"] for s in store.summaries()] == ids[:1:-1]
+    assert store.path("../requests.jsonl") is None
+    assert store.path(ids[0] + ".json") is None
+
+
+@pytest.mark.asyncio
+async def test_profiled_request(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "segredo")
+    monkeypatch.setattr(profiling.profile_store, "directory", str(tmp_path))
+    storage = MemoryStorage()
+    storage["users"].insert_one({
+        "username": "profileuser", "email": "profileuser@email.com",
+        "password": hash_password("123456"), "is_active": True
+    })
+    storage["tasks"].insert_many([
+        {"title": f"Perfil {i}", "description": "d", "status": "aberta", "assigned_to": "profileuser"}
+        for i in range(20)
+    ])
+    app = create_app(storage=storage)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        resp = await ac.post("/auth/login", json={"username": "profileuser", "password": "123456"})
+        assert "X-Profile-Id" not in resp.headers
+        headers = {"Authorization": f"Bearer {resp.json()['access_token']}", "X-Profile": "segredo"}
+        resp = await ac.get("/tasks", params={"assigned_to": "profileuser"}, headers=headers)
+        assert resp.status_code == 200
+        profile_id = resp.headers["X-Profile-Id"]
+
+        resp = await ac.get("/debug/profiles", headers={"X-Profile": "segredo"})
+        summary = resp.json()[0]
+        assert summary["id"] == profile_id
+        assert summary["route"] == "/tasks" and summary["status"] == 200
+        assert {"mongo", "jwt", "serialization"} <= set(summary["breakdown_ms"])
+        assert summary["cprofile"] is True
+
+        resp = await ac.get(f"/debug/profiles/{profile_id}.json", headers={"X-Profile": "segredo"})
+        assert resp.json()["top_functions"]
+        resp = await ac.get(f"/debug/profiles/{profile_id}.prof", headers={"X-Profile": "segredo"})
+        assert resp.status_code == 200
+        assert pstats.Stats(str(tmp_path / f"{profile_id}.prof")).total_calls > 0
+
+        resp = await ac.get("/debug/profiles", headers={"X-Profile": "errado"})
+        assert resp.status_code == 404
+        assert [s["id"] for s in profiling.profile_store.summaries()] == [profile_id]
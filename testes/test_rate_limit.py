@@ -0,0 +1,105 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+from controller.database import AsyncCollection
+from controller.main import create_app
+from controller.memory_storage import MemoryStorage
+from controller.metrics import db_operation_duration
+from controller.rate_limit import (
+    InMemoryRateLimitStore,
+    MongoRateLimitStore,
+    RateLimiter,
+    client_ip,
+    ip_limiter,
+    parse_rate
+)
+
+
+def test_parse_rate():
+    assert parse_rate("5/60") == (5, 60.0)
+    assert parse_rate("") is None
+
+
+def test_in_memory_token_bucket(clock):
+    store = InMemoryRateLimitStore(max_keys=2, clock=clock)
+    assert [store.take_now("a", 3, 3) for _ in range(3)] == [0, 0, 0]
+    assert store.take_now("a", 3, 3) == pytest.approx(1.0)
+    clock.now += 1
+    assert store.take_now("a", 3, 3) == 0
+    assert store.take_now("a", 3, 3) > 0
+    # Um balde parado por per_seconds já estaria cheio e é descartado.
+    store.take_now("b", 3, 3)
+    clock.now += 3
+    store.take_now("c", 3, 3)
+    assert len(store) == 1
+    store.take_now("d", 3, 3)
+    store.take_now("e", 3, 3)
+    assert len(store) == 2
+
+
+class Unavailable:
+    def __getattr__(self, name):
+        raise AssertionError("não deveria acessar o banco")
+
+
+@pytest.mark.asyncio
+async def test_mongo_store_shares_buckets_and_blocks_locally(clock):
+    collection = AsyncCollection(MemoryStorage()["rate_limits"])
+    first, second = MongoRateLimitStore(collection, clock=clock), MongoRateLimitStore(collection, clock=clock)
+    assert await first.take("k", 2, 60) == 0
+    assert await second.take("k", 2, 60) == 0
+    assert await first.take("k", 2, 60) == pytest.approx(30)
+    # Recusada uma vez, a chave fica bloqueada sem novas idas ao banco.
+    first.collection = Unavailable()
+    clock.now += 10
+    assert await first.take("k", 2, 60) == pytest.approx(20)
+    clock.now += 20
+    assert await second.take("k", 2, 60) == 0
+
+
+@pytest.mark.asyncio
+async def test_login_throttled_before_db():
+    storage = MemoryStorage()
+    app = create_app(storage=storage)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        for _ in range(5):
+            resp = await ac.post("/auth/login", json={"username": "ratelimituser", "password": "errada"})
+            assert resp.status_code == 401
+        lookups = db_operation_duration.count("users", "find_one", "is_active,username")
+        resp = await ac.post("/auth/login", json={"username": "ratelimituser", "password": "errada"})
+        assert resp.status_code == 429
+        assert int(resp.headers["Retry-After"]) >= 1
+        assert db_operation_duration.count("users", "find_one", "is_active,username") == lookups
+        # Outros usernames do mesmo IP seguem até o limite por IP.
+        resp = await ac.post("/auth/login", json={"username": "outrouser", "password": "errada"})
+        assert resp.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_all_routes(monkeypatch):
+    monkeypatch.setattr(ip_limiter, "rate", (2, 60.0))
+    monkeypatch.setattr(ip_limiter, "store", InMemoryRateLimitStore())
+    app = create_app(storage=MemoryStorage())
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        assert (await ac.get("/metrics")).status_code == 200
+        assert (await ac.get("/metrics")).status_code == 200
+        resp = await ac.get("/metrics")
+        assert resp.status_code == 429
+        assert resp.json() == {"detail": "Too many requests"}
+        assert "X-Request-ID" in resp.headers
+    assert RateLimiter("desligado", "").enabled is False
+
+
+def test_client_ip_counts_trusted_proxies_from_the_right(monkeypatch):
+    scope = {
+        "client": ("10.0.0.2", 1234),
+        "headers": [(b"x-forwarded-for", b"6.6.6.6, 203.0.113.7"), (b"x-forwarded-for", b"10.0.0.1")],
+    }
+    assert client_ip(scope) == "10.0.0.2"
+    monkeypatch.setattr("controller.rate_limit.RATE_LIMIT_TRUSTED_PROXIES", 1)
+    assert client_ip(scope) == "10.0.0.1"
+    monkeypatch.setattr("controller.rate_limit.RATE_LIMIT_TRUSTED_PROXIES", 2)
+    # O primeiro endereço foi enviado pelo cliente e não vira a chave.
+    assert client_ip(scope) == "203.0.113.7"
+    monkeypatch.setattr("controller.rate_limit.RATE_LIMIT_TRUSTED_PROXIES", 5)
+    assert client_ip(scope) == "10.0.0.2"
+    assert client_ip({"client": ("10.0.0.2", 1234), "headers": []}) == "10.0.0.2"
@@ -0,0 +1,127 @@
+import asyncio
+import os
+import threading
+import pytest
+from controller.cache import TTLCache
+from controller import response_cache
+from controller.database import current_storage
+from controller.memory_storage import MemoryStorage
+from controller.response_cache import ReadThroughCache, SqliteCacheBackend
+
+
+@pytest.mark.asyncio
+async def test_read_through_single_flight():
+    cache = ReadThroughCache("task", TTLCache(maxsize=10, ttl=60))
+    loads = 0
+
+    async def loader():
+        nonlocal loads
+        loads += 1
+        await asyncio.sleep(0.01)
+        return ('"1"', '{"id": "1"}')
+
+    results = await asyncio.gather(*(cache.get_or_load("1", loader) for _ in range(10)))
+    assert loads == 1
+    assert all(r == ('"1"', '{"id": "1"}') for r in results)
+    assert cache.coalesced == 9
+    await cache.get_or_load("1", loader)
+    assert loads == 1
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_read_through_invalidate():
+    cache = ReadThroughCache("task", TTLCache(maxsize=10, ttl=60))
+    versions = iter(["v1", "v2"])
+
+    async def loader():
+        return next(versions)
+
+    assert await cache.get_or_load("1", loader) == "v1"
+    await cache.invalidate("1")
+    assert await cache.get_or_load("1", loader) == "v2"
+
+
+@pytest.mark.asyncio
+async def test_read_through_does_not_cache_missing():
+    cache = ReadThroughCache("task", TTLCache(maxsize=10, ttl=60))
+
+    async def loader():
+        return None
+
+    assert await cache.get_or_load("1", loader) is None
+    assert len(cache.backend) == 0
+
+
+def test_sqlite_backend_shared(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    worker_a = SqliteCacheBackend(path, maxsize=10, ttl=60)
+    worker_b = SqliteCacheBackend(path, maxsize=10, ttl=60)
+    worker_a.set("task:1", ['"1"', "{}"])
+    assert worker_b.get("task:1") == ['"1"', "{}"]
+    worker_b.pop("task:1")
+    assert worker_a.get("task:1") is None
+
+
+@pytest.mark.asyncio
+async def test_read_through_sqlite_off_the_event_loop(tmp_path):
+    backend = SqliteCacheBackend(str(tmp_path / "cache.sqlite3"), maxsize=10, ttl=60)
+    cache = ReadThroughCache("task", backend)
+    threads = set()
+    get = backend.get
+
+    def recording_get(key, default=None):
+        threads.add(threading.current_thread().name)
+        return get(key, default)
+
+    backend.get = recording_get
+
+    async def loader():
+        return ['"1"', "{}"]
+
+    assert await cache.get_or_load("1", loader) == ['"1"', "{}"]
+    assert await cache.get_or_load("1", loader) == ['"1"', "{}"]
+    assert threads and all(name.startswith("response-cache") for name in threads)
+    await cache.invalidate("1")
+    assert get("task:1") is None
+
+
+def test_sqlite_backend_reopens_after_fork(tmp_path):
+    backend = SqliteCacheBackend(str(tmp_path / "cache.sqlite3"), maxsize=10, ttl=60)
+    backend.set("task:1", ['"1"', "{}"])
+    parent_conn, parent_executor = backend._conn, backend.executor
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        ok = False
+        try:
+            ok = (backend.get("task:1") == ['"1"', "{}"]
+                  and backend._conn is not parent_conn
+                  and backend.executor is not parent_executor)
+        finally:
+            os.write(write, b"1" if ok else b"0")
+            os._exit(0)
+    os.waitpid(pid, 0)
+    assert os.read(read, 1) == b"1"
+    assert backend._conn is parent_conn
+    assert backend.get("task:1") == ['"1"', "{}"]
+
+
+def test_sqlite_backend_separates_storages(tmp_path, monkeypatch):
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE_BACKEND", "sqlite")
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE_SQLITE_PATH", str(tmp_path / "cache.sqlite3"))
+    backends = []
+    for storage in (MemoryStorage(), MemoryStorage()):
+        token = current_storage.set(storage)
+        try:
+            backends.append(response_cache._make_backend())
+        finally:
+            current_storage.reset(token)
+    first, second = backends
+    assert first.prefix != second.prefix
+    first.set("task:1", ['"1"', "{}"])
+    assert second.get("task:1") is None
+    second.set("task:1", ['"2"', "{}"])
+    second.clear()
+    assert first.get("task:1") == ['"1"', "{}"]
+    assert first.stats()["size"] == 1 and second.stats()["size"] == 0
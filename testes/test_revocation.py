@@ -0,0 +1,34 @@
+import time
+import pytest
+from controller.database import AsyncCollection, revoked_tokens_collection
+from controller.revocation import InMemoryRevocationStore, MongoRevocationStore
+
+
+@pytest.mark.asyncio
+async def test_in_memory_store_evicts_after_exp(clock):
+    store = InMemoryRevocationStore(clock=clock)
+    await store.revoke("a", 1010)
+    await store.revoke("b", 1100)
+    assert await store.is_revoked("a")
+    assert not await store.is_revoked("c")
+    clock.now = 1050
+    assert not await store.is_revoked("a")
+    assert len(store) == 1
+
+
+@pytest.mark.asyncio
+async def test_in_memory_store_ignores_expired_tokens(clock):
+    store = InMemoryRevocationStore(clock=clock)
+    await store.revoke("a", 999)
+    assert len(store) == 0
+
+
+@pytest.mark.asyncio
+async def test_mongo_store_shared_between_instances():
+    collection = AsyncCollection(revoked_tokens_collection)
+    worker_a = MongoRevocationStore(collection, negative_cache_ttl=0)
+    worker_b = MongoRevocationStore(collection, negative_cache_ttl=0)
+    assert not await worker_b.is_revoked("jti-teste")
+    await worker_a.revoke("jti-teste", time.time() + 60)
+    assert await worker_b.is_revoked("jti-teste")
+    revoked_tokens_collection.delete_one({"_id": "jti-teste"})
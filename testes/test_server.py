@@ -0,0 +1,70 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+import httpx
+from controller import database, passwords
+from controller.server import process_local_warnings
+from logs.logging_config import worker_log_file
+from testes.benchmarks.bench_workers import free_port
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_process_local_warnings():
+    names = [w.split("=")[0] for w in process_local_warnings({})]
+    assert names == ["TOKEN_REVOCATION_BACKEND", "RATE_LIMIT_BACKEND", "TASK_EVENTS_SOURCE",
+                     "RESPONSE_CACHE_BACKEND", "AUTH_USER_CACHE_TTL_SECONDS"]
+    shared = {"TOKEN_REVOCATION_BACKEND": "mongo", "RATE_LIMIT_BACKEND": "mongo",
+              "TASK_EVENTS_SOURCE": "changestream", "RESPONSE_CACHE_BACKEND": "sqlite",
+              "AUTH_USER_CACHE_TTL_SECONDS": "0"}
+    assert process_local_warnings(shared) == []
+    assert process_local_warnings({**shared, "STORAGE_BACKEND": "memory"})
+    assert process_local_warnings({**shared, "SERVER_LOG_PER_WORKER": "0"})
+
+
+def test_worker_log_file():
+    assert worker_log_file(2, "logs/app.log") == "logs/app.worker-2.log"
+    assert worker_log_file(1, os.devnull) == os.devnull
+
+
+def test_fork_resets_client_and_executors():
+    database._client = object()
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        ok = (database._client is None
+              and not database.db_executor._threads
+              and (passwords.password_executor is None or not passwords.password_executor._threads))
+        os.write(write, b"1" if ok else b"0")
+        os._exit(0)
+    os.waitpid(pid, 0)
+    database._client = None
+    assert os.read(read, 1) == b"1"
+
+
+def test_workers_serve_and_shut_down_gracefully(tmp_path):
+    port = free_port()
+    log_file = tmp_path / "app.log"
+    env = {**os.environ, "STORAGE_BACKEND": "memory", "LOG_FILE": str(log_file)}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "controller.server", "--workers", "2", "--port", str(port)], cwd=ROOT, env=env
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                resp = httpx.get(f"http://127.0.0.1:{port}/tasks")
+                break
+            except httpx.TransportError:
+                assert time.monotonic() < deadline
+                time.sleep(0.2)
+        assert resp.status_code == 401
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        assert proc.wait(timeout=60) == 0
+    # O mestre grava em LOG_FILE e cada worker no próprio arquivo.
+    assert "Desligando 2 workers" in log_file.read_text()
+    for slot in (1, 2):
+        assert "Application startup complete" in (tmp_path / f"app.worker-{slot}.log").read_text()
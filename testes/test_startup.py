@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+import pytest
+from controller import database
+from controller.main import app, lifespan
+
+# Orçamento de tempo para ``import controller.main`` em um processo novo.
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "3.0"))
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import controller.main
+from controller import database
+print(time.perf_counter() - start, database._client is None)
+"""
+
+
+def test_import_is_fast_and_does_not_connect():
+    env = {**os.environ, "MONGO_URI": "mongodb://invalid-host.example:27017"}
+    output = subprocess.check_output([sys.executable, "-c", IMPORT_SCRIPT], cwd=ROOT, env=env, text=True)
+    elapsed, no_client = output.split()
+    assert no_client == "True"
+    assert float(elapsed) < IMPORT_BUDGET_SECONDS
+
+
+def test_client_options():
+    options = database.client_options()
+    assert options["maxPoolSize"] == database.MONGO_MAX_POOL_SIZE
+    assert options["minPoolSize"] == database.MONGO_MIN_POOL_SIZE
+    assert "serverSelectionTimeoutMS" in options and "socketTimeoutMS" in options
+
+
+@pytest.mark.asyncio
+async def test_lifespan_opens_and_closes_client(mongo_storage):
+    database.close_client()
+    async with lifespan(app):
+        assert database._client is not None
+        assert database.users_collection.name == "users"
+    assert database._client is None
+    # Um acesso depois do encerramento abre um cliente novo.
+    database.users_collection.find_one({})
+    assert database._client is not None
@@ -0,0 +1,33 @@
+import pytest
+from fastapi import HTTPException
+from controller.task_queries import build_task_query, encode_cursor
+
+
+def test_build_task_query_shapes():
+    query, sort, field, index = build_task_query(assigned_to="ana", status=["aberta", "fechada"])
+    assert query == {"assigned_to": "ana", "status": {"$in": ["aberta", "fechada"]}}
+    assert sort == [("_id", 1)] and index == "assigned_to_status_id"
+
+    query, sort, field, index = build_task_query(title_prefix="Rel.")
+    assert query == {"title": {"$regex": "^Rel\\."}}
+    assert sort == [("title", 1), ("_id", 1)] and field == "title"
+
+    query, _, _, index = build_task_query(q="relatório")
+    assert query == {"$text": {"$search": "relatório"}} and index == "title_description_text"
+
+
+def test_build_task_query_rejects_unindexed_combinations():
+    for kwargs in ({"status": ["aberta"], "title_prefix": "a"}, {"q": "x", "assigned_to": "ana"},
+                   {"title_prefix": "a", "sort": "id"}, {"sort": "status"}):
+        with pytest.raises(HTTPException) as e:
+            build_task_query(**kwargs)
+        assert e.value.status_code == 400
+
+
+def test_title_cursor_round_trip():
+    task = {"_id": "64b7f0000000000000000001", "title": "Ação"}
+    cursor = encode_cursor(task, "title")
+    query, _, _, _ = build_task_query(sort="-title", after=cursor)
+    assert query["$or"][0] == {"title": {"$lt": "Ação"}}
+    with pytest.raises(HTTPException):
+        build_task_query(sort="title", after="invalido")
@@ -0,0 +1,42 @@
+import pytest
+from controller.database import AsyncCollection, db, tasks_collection
+from controller.task_stats import TaskCounters, task_delta, update_delta
+
+
+def test_update_delta():
+    delta = update_delta({"status": "aberta", "assigned_to": "ana"}, {"status": "fechada", "assigned_to": "ana"})
+    assert {k: v for k, v in delta.items() if v} == {
+        ("status", "aberta"): -1, ("status", "fechada"): 1,
+        ("assigned_to_status", ("ana", "aberta")): -1, ("assigned_to_status", ("ana", "fechada")): 1,
+    }
+    assert task_delta({"status": "aberta", "assigned_to": "ana"}, -1)[("assigned_to", "ana")] == -1
+
+
+@pytest.mark.asyncio
+async def test_task_counters_reconcile():
+    counters_collection = db["task_counters_test"]
+    counters_collection.delete_many({})
+    counters = TaskCounters(AsyncCollection(counters_collection), AsyncCollection(tasks_collection))
+    tasks_collection.insert_many([
+        {"title": "a", "status": "stats_aberta", "assigned_to": "statsuser"},
+        {"title": "b", "status": "stats_aberta", "assigned_to": "statsuser"},
+        {"title": "c", "status": "stats_fechada", "assigned_to": "statsuser"},
+        {"title": "d", "status": "stats_fechada", "assigned_to": "statsoutro"},
+    ])
+    # Um contador errado e um que não existe mais são corrigidos pela reconciliação.
+    await counters.apply(task_delta({"status": "stats_aberta", "assigned_to": "statsuser"}, 5))
+    await counters.apply(task_delta({"status": "stats_sumida", "assigned_to": "statsfantasma"}))
+    await counters.reconcile()
+    stats = await counters.stats("statsuser")
+    assert stats["by_status"]["stats_aberta"] == 2
+    assert stats["by_status"]["stats_fechada"] == 1
+    assert "stats_sumida" not in stats["by_status"]
+    assert stats["by_assigned_to"] == {"statsuser": 3}
+    # Filtrado por responsável, o total e by_status são só os dele.
+    assert stats["by_status"] == {"stats_aberta": 2, "stats_fechada": 1}
+    assert stats["total"] == 3
+    everyone = await counters.stats()
+    assert everyone["by_status"]["stats_fechada"] == 2
+    assert everyone["by_assigned_to"]["statsoutro"] == 1
+    tasks_collection.delete_many({"assigned_to": {"$in": ["statsuser", "statsoutro"]}})
+    counters_collection.drop()
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import FileResponse
+from controller.profiling import authorized, profile_store
+
+router = APIRouter()
+
+
+def _check_profile_token(x_profile: str):
+    # 404 em vez de 401/403 para não expor os endpoints sem o token.
+    if not x_profile or not authorized(x_profile):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+@router.get("/debug/profiles", include_in_schema=False)
+async def list_profiles(x_profile: str = Header(None)):
+    _check_profile_token(x_profile)
+    return profile_store.summaries()
+
+
+@router.get("/debug/profiles/{name}", include_in_schema=False)
+async def download_profile(name: str, x_profile: str = Header(None)):
+    _check_profile_token(x_profile)
+    path = profile_store.path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "application/json" if name.endswith(".json") else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=name)
@@ -1,9 +1,55 @@
-from fastapi import APIRouter, HTTPException, Depends
-from model.models import Task, TaskCreate, TaskUpdate, User
-from controller.database import tasks_collection, users_collection
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response, WebSocket
+from fastapi.responses import StreamingResponse
+from model.models import (
+    BulkItemResult,
+    BulkResult,
+    Task,
+    TaskBulkCreate,
+    TaskBulkDelete,
+    TaskBulkUpdate,
+    TaskCreate,
+    TaskStats,
+    TaskUpdate,
+    TaskWithAssignee,
+    User
+)
+from model.mappers import TASK_FIELDS, DocumentResponse, dumps, task_document, user_document
+from controller.archive import may_be_archived
+from controller.assignees import active_usernames
+from controller.database import (
+    DB_CURSOR_BATCH_SIZE,
+    async_tasks_archive_collection,
+    async_tasks_collection,
+    async_users_collection
+)
+from controller.etags import (
+    apply_update,
+    document_etag,
+    etag_matches,
+    expanded_etag,
+    expected_version,
+    version_filter,
+    versioned_update
+)
+from controller.events import (
+    TASK_EVENTS_HEARTBEAT_SECONDS,
+    publish_created,
+    publish_deleted,
+    publish_updated,
+    task_events
+)
+from controller.response_cache import task_response_cache
+from controller.task_queries import build_task_query, encode_cursor
+from controller.task_stats import task_counters, task_delta, update_delta
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import BulkWriteError
 from typing import List, Optional
+import asyncio
 import logging
+from collections import Counter
+from datetime import datetime
 from controller.auth_utils import (
     create_access_token,
     get_current_user,
@@ -15,95 +61,520 @@ router = APIRouter()
 
 @router.post("/tasks", response_model=Task)
 async def create_task(task: TaskCreate, current_user: User = Depends(get_current_user)):
-    if not users_collection.find_one({"username": task.assigned_to, "is_active": True}):
-        logging.warning(f"Tentativa de atribuir tarefa para usuário inexistente: {task.assigned_to}")
+    if not await active_usernames.exists(task.assigned_to):
+        logging.warning("Tentativa de atribuir tarefa para usuário inexistente: %s", task.assigned_to)
         raise HTTPException(status_code=400, detail="Assigned user does not exist")
     task_doc = {
         "title": task.title,
         "description": task.description,
         "status": task.status,
-        "assigned_to": task.assigned_to
+        "assigned_to": task.assigned_to,
+        "version": 1,
+        "updated_at": datetime.utcnow()
     }
-    result = tasks_collection.insert_one(task_doc)
-    logging.info(f"Tarefa criada: {task.title} (id: {result.inserted_id}) atribuída para {task.assigned_to}")
-    return Task(
-        id=str(result.inserted_id),
-        title=task.title,
-        description=task.description,
-        status=task.status,
-        assigned_to=task.assigned_to
+    await async_tasks_collection.insert_one(task_doc)
+    await task_counters.apply(task_delta(task_doc))
+    publish_created(task_document(task_doc))
+    logging.info("Tarefa criada: %s (id: %s) atribuída para %s", task.title, task_doc["_id"], task.assigned_to)
+    return DocumentResponse(task_document(task_doc), headers={"ETag": document_etag(task_doc)})
+
+MAX_BULK_SIZE = 10000
+
+def _check_bulk_size(size: int):
+    if size == 0 or size > MAX_BULK_SIZE:
+        logging.warning("Lote de tarefas com tamanho inválido: %s", size)
+        raise HTTPException(status_code=400, detail=f"Bulk size must be between 1 and {MAX_BULK_SIZE}")
+
+async def _existing_tasks(ids) -> dict:
+    # _id -> campos contados nas estatísticas, para calcular a variação dos contadores.
+    if not ids:
+        return {}
+    cursor = async_tasks_collection.find({"_id": {"$in": list(ids)}}, projection={"status": 1, "assigned_to": 1})
+    return {task["_id"]: task async for task in cursor}
+
+async def _archived_ids(ids) -> set:
+    # Só ids antigos o bastante podem estar no arquivo; os demais nem vão ao banco.
+    candidates = [oid for oid in ids if may_be_archived(oid)]
+    if not candidates:
+        return set()
+    cursor = async_tasks_archive_collection.find({"_id": {"$in": candidates}}, projection={"_id": 1})
+    return {task["_id"] async for task in cursor}
+
+def _parse_id(value: str):
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+async def _write_errors(write) -> dict:
+    # Índice da operação no lote -> mensagem de erro do Mongo.
+    try:
+        await write
+    except BulkWriteError as e:
+        return {err["index"]: err.get("errmsg", "Write error") for err in e.details.get("writeErrors", [])}
+    return {}
+
+def _bulk_result(results: list, positions: list, ids: list, errors: dict, ordered: bool, status: str) -> BulkResult:
+    first_error = min(errors) if errors else None
+    for op_index, (position, item_id) in enumerate(zip(positions, ids)):
+        if op_index in errors:
+            results[position] = BulkItemResult(index=position, id=item_id, status="error", detail=errors[op_index])
+        elif ordered and first_error is not None and op_index > first_error:
+            continue
+        else:
+            results[position] = BulkItemResult(index=position, id=item_id, status=status)
+    for position, result in enumerate(results):
+        if result is None:
+            # Modo ordenado: itens depois do primeiro erro não são tentados.
+            results[position] = BulkItemResult(index=position, status="skipped")
+    succeeded = sum(1 for r in results if r.status == status)
+    return BulkResult(succeeded=succeeded, failed=len(results) - succeeded, results=results)
+
+def _succeeded(response: BulkResult, positions: list, items: list, status: str) -> list:
+    return [item for position, item in zip(positions, items) if response.results[position].status == status]
+
+async def _apply_deltas(deltas):
+    delta = Counter()
+    for item_delta in deltas:
+        delta.update(item_delta)
+    await task_counters.apply(delta)
+
+@router.post("/tasks/bulk", response_model=BulkResult)
+async def bulk_create_tasks(bulk: TaskBulkCreate, current_user: User = Depends(get_current_user)):
+    _check_bulk_size(len(bulk.tasks))
+    valid_assignees = await active_usernames.existing({task.assigned_to for task in bulk.tasks})
+    results = [None] * len(bulk.tasks)
+    docs, positions = [], []
+    for index, task in enumerate(bulk.tasks):
+        if task.assigned_to not in valid_assignees:
+            results[index] = BulkItemResult(index=index, status="error", detail="Assigned user does not exist")
+            if bulk.ordered:
+                break
+            continue
+        docs.append({
+            "title": task.title,
+            "description": task.description,
+            "status": task.status,
+            "assigned_to": task.assigned_to,
+            "version": 1,
+            "updated_at": datetime.utcnow()
+        })
+        positions.append(index)
+    errors = {}
+    if docs:
+        errors = await _write_errors(async_tasks_collection.insert_many(docs, ordered=bulk.ordered))
+    response = _bulk_result(results, positions, [str(doc.get("_id")) for doc in docs], errors, bulk.ordered, "created")
+    created = _succeeded(response, positions, docs, "created")
+    await _apply_deltas(task_delta(doc) for doc in created)
+    for doc in created:
+        publish_created(task_document(doc))
+    logging.info("Criação de tarefas em lote: %s criadas, %s com falha", response.succeeded, response.failed)
+    return response
+
+@router.patch("/tasks/bulk", response_model=BulkResult)
+async def bulk_update_tasks(bulk: TaskBulkUpdate, current_user: User = Depends(get_current_user)):
+    _check_bulk_size(len(bulk.tasks))
+    object_ids = [_parse_id(item.id) for item in bulk.tasks]
+    existing, valid_assignees = await asyncio.gather(
+        _existing_tasks({oid for oid in object_ids if oid is not None}),
+        active_usernames.existing({item.assigned_to for item in bulk.tasks})
     )
+    archived = await _archived_ids({oid for oid in object_ids if oid is not None} - set(existing))
+    results = [None] * len(bulk.tasks)
+    ops, positions, ids, changes = [], [], [], []
+    for index, (item, oid) in enumerate(zip(bulk.tasks, object_ids)):
+        update_data = {k: v for k, v in item.dict(exclude={"id"}).items() if v is not None}
+        if oid is None:
+            detail = "Invalid task id"
+        elif oid in archived:
+            detail = "Task is archived"
+        elif oid not in existing:
+            detail = "Task not found"
+        elif not update_data:
+            detail = "No fields to update"
+        elif "assigned_to" in update_data and update_data["assigned_to"] not in valid_assignees:
+            detail = "Assigned user does not exist"
+        else:
+            ops.append(UpdateOne({"_id": oid}, versioned_update(update_data)))
+            positions.append(index)
+            ids.append(item.id)
+            changes.append((str(oid), existing[oid], update_data))
+            continue
+        results[index] = BulkItemResult(index=index, id=item.id, status="error", detail=detail)
+        if bulk.ordered:
+            break
+    errors = {}
+    if ops:
+        errors = await _write_errors(async_tasks_collection.bulk_write(ops, ordered=bulk.ordered))
+    for task_id in ids:
+        await task_response_cache.invalidate(str(ObjectId(task_id)))
+    response = _bulk_result(results, positions, ids, errors, bulk.ordered, "updated")
+    updated = _succeeded(response, positions, changes, "updated")
+    await _apply_deltas(update_delta(previous, apply_update(previous, data)) for _, previous, data in updated)
+    for task_id, previous, data in updated:
+        publish_updated(task_id, data, previous.get("assigned_to"))
+    logging.info("Atualização de tarefas em lote: %s atualizadas, %s com falha", response.succeeded, response.failed)
+    return response
+
+@router.delete("/tasks/bulk", response_model=BulkResult)
+async def bulk_delete_tasks(bulk: TaskBulkDelete, current_user: User = Depends(get_current_user)):
+    _check_bulk_size(len(bulk.ids))
+    object_ids = [_parse_id(task_id) for task_id in bulk.ids]
+    existing = await _existing_tasks({oid for oid in object_ids if oid is not None})
+    archived = await _archived_ids({oid for oid in object_ids if oid is not None} - set(existing))
+    results = [None] * len(bulk.ids)
+    ops, positions, ids, previous = [], [], [], []
+    for index, (task_id, oid) in enumerate(zip(bulk.ids, object_ids)):
+        if oid is None or oid not in existing:
+            # Tarefas arquivadas só saem pelo DELETE /tasks/{id}.
+            detail = "Invalid task id" if oid is None else "Task is archived" if oid in archived else "Task not found"
+            results[index] = BulkItemResult(index=index, id=task_id, status="error", detail=detail)
+            if bulk.ordered:
+                break
+            continue
+        ops.append(DeleteOne({"_id": oid}))
+        positions.append(index)
+        ids.append(task_id)
+        previous.append((str(oid), existing[oid]))
+    errors = {}
+    if ops:
+        errors = await _write_errors(async_tasks_collection.bulk_write(ops, ordered=bulk.ordered))
+    for task_id in ids:
+        await task_response_cache.invalidate(str(ObjectId(task_id)))
+    response = _bulk_result(results, positions, ids, errors, bulk.ordered, "deleted")
+    deleted = _succeeded(response, positions, previous, "deleted")
+    await _apply_deltas(task_delta(task, -1) for _, task in deleted)
+    for task_id, task in deleted:
+        publish_deleted(task_id, task.get("assigned_to"))
+    logging.info("Deleção de tarefas em lote: %s deletadas, %s com falha", response.succeeded, response.failed)
+    return response
 
-@router.get("/tasks/{id}", response_model=Task)
-async def get_task(id: str, current_user: User = Depends(get_current_user)):
+@router.get("/tasks/stats", response_model=TaskStats)
+async def task_stats(assigned_to: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    stats = await task_counters.stats(assigned_to)
+    logging.info("Estatísticas de tarefas consultadas. Filtro assigned_to: %s", assigned_to)
+    return DocumentResponse(stats)
+
+async def _event_stream(subscription):
     try:
-        task = tasks_collection.find_one({"_id": ObjectId(id)})
+        while True:
+            event = await subscription.get(TASK_EVENTS_HEARTBEAT_SECONDS)
+            if event is None:
+                # Comentário SSE: mantém a conexão viva através de proxies.
+                yield b": keepalive\n\n"
+                continue
+            yield b"event: " + event["type"].encode() + b"\ndata: " + dumps(event) + b"\n\n"
+            if event["type"] == "overflow":
+                return
+    finally:
+        subscription.close()
+
+@router.get("/tasks/events")
+async def task_event_stream(assigned_to: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    subscription = task_events.subscribe(assigned_to)
+    logging.info("Assinatura de eventos de tarefas. Filtro assigned_to: %s", assigned_to)
+    return StreamingResponse(
+        _event_stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+WS_AUTH_SUBPROTOCOL = "bearer"
+
+def _websocket_token(websocket: WebSocket) -> tuple:
+    """Token do handshake e o subprotocolo a confirmar no ``accept``."""
+    # Navegadores não enviam Authorization em WebSocket: o token vai como subprotocolo
+    # (["bearer", "<token>"]), e não na URL, que acaba nos logs de proxies.
+    protocols = websocket.scope.get("subprotocols") or []
+    if len(protocols) >= 2 and protocols[0] == WS_AUTH_SUBPROTOCOL:
+        return protocols[1], WS_AUTH_SUBPROTOCOL
+    scheme, _, token = websocket.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        return token, None
+    return None, None
+
+@router.websocket("/tasks/events/ws")
+async def task_event_socket(websocket: WebSocket, assigned_to: Optional[str] = None):
+    token, subprotocol = _websocket_token(websocket)
+    try:
+        if token is None:
+            raise HTTPException(status_code=401, detail="Not authenticated")
+        await get_current_user(token)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept(subprotocol=subprotocol)
+    subscription = task_events.subscribe(assigned_to)
+    logging.info("Assinatura de eventos de tarefas via WebSocket. Filtro assigned_to: %s", assigned_to)
+    receiver = asyncio.ensure_future(websocket.receive())
+    try:
+        while True:
+            getter = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                getter.cancel()
+                if receiver.result()["type"] == "websocket.disconnect":
+                    return
+                # Mensagens do cliente são ignoradas.
+                receiver = asyncio.ensure_future(websocket.receive())
+                continue
+            event = getter.result()
+            await websocket.send_text(dumps(event).decode())
+            if event["type"] == "overflow":
+                await websocket.close(code=1013)
+                return
+    finally:
+        receiver.cancel()
+        subscription.close()
+
+EXPAND_OPTIONS = ("assignee",)
+
+def _parse_expand(expand: Optional[str]) -> bool:
+    requested = {e.strip() for e in (expand or "").split(",") if e.strip()}
+    invalid = requested - set(EXPAND_OPTIONS)
+    if invalid:
+        logging.warning("Expansão inválida: %s", sorted(invalid))
+        raise HTTPException(status_code=400, detail=f"Invalid expand: {', '.join(sorted(invalid))}")
+    return "assignee" in requested
+
+async def _load_assignees(tasks: list, route: str) -> dict:
+    # Uma única consulta por página: username -> documento do usuário.
+    usernames = list({task.get("assigned_to") for task in tasks} - {None})
+    if not usernames:
+        return {}
+    cursor = async_users_collection.reader(route).find(
+        {"username": {"$in": usernames}}, projection={"username": 1, "email": 1, "is_active": 1, "version": 1}
+    )
+    return {user["username"]: user async for user in cursor}
+
+def _expanded_document(task: dict, fields, assignees: dict) -> dict:
+    data = task_document(task, fields)
+    assignee = assignees.get(task.get("assigned_to"))
+    data["assignee"] = user_document(assignee) if assignee else None
+    return data
+
+async def _find_task(task_id: ObjectId, route: Optional[str]):
+    """Tarefa pelo id; ``route=None`` lê do primário."""
+    tasks = async_tasks_collection if route is None else async_tasks_collection.reader(route)
+    task = await tasks.find_one({"_id": task_id})
+    if task is None and may_be_archived(task_id):
+        # Tarefas arquivadas continuam acessíveis pelo id.
+        archive = async_tasks_archive_collection if route is None else async_tasks_archive_collection.reader(route)
+        task = await archive.find_one({"_id": task_id})
+    return task
+
+@router.get("/tasks/{id}", response_model=TaskWithAssignee)
+async def get_task(
+    id: str,
+    expand: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user)
+):
+    try:
+        task_id = ObjectId(id)
     except Exception:
-        logging.error(f"ID de tarefa inválido: {id}")
+        logging.error("ID de tarefa inválido: %s", id)
         raise HTTPException(status_code=400, detail="Invalid task id")
-    if not task:
-        logging.warning(f"Tarefa não encontrada: {id}")
+
+    if _parse_expand(expand):
+        # A versão expandida não passa pelo cache: depende também do usuário.
+        task = await _find_task(task_id, "get_task")
+        if not task:
+            logging.warning("Tarefa não encontrada: %s", id)
+            raise HTTPException(status_code=404, detail="Task not found")
+        assignees = await _load_assignees([task], "get_task")
+        etag = expanded_etag(task, assignees.get(task.get("assigned_to")))
+        logging.info("Tarefa consultada com responsável: %s", id)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        return DocumentResponse(_expanded_document(task, TASK_FIELDS, assignees), headers={"ETag": etag})
+
+    async def load_task():
+        # Com o cache ligado, a carga lê do primário: um secundário atrasado deixaria
+        # a versão anterior à última escrita no cache por todo o TTL.
+        task = await _find_task(task_id, None if task_response_cache.enabled else "get_task")
+        if not task:
+            return None
+        return document_etag(task), dumps(task_document(task)).decode()
+
+    cached = await task_response_cache.get_or_load(str(task_id), load_task)
+    if not cached:
+        logging.warning("Tarefa não encontrada: %s", id)
         raise HTTPException(status_code=404, detail="Task not found")
-    logging.info(f"Tarefa consultada: {id}")
-    return Task(
-        id=str(task["_id"]),
-        title=task["title"],
-        description=task.get("description"),
-        status=task["status"],
-        assigned_to=task.get("assigned_to")
-    )
+    logging.info("Tarefa consultada: %s", id)
+    etag, body = cached
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
 
-@router.get("/tasks", response_model=List[Task])
-async def list_tasks(assigned_to: Optional[str] = None, current_user: User = Depends(get_current_user)):
-    query = {}
-    if assigned_to:
-        query["assigned_to"] = assigned_to
-    tasks = []
-    for task in tasks_collection.find(query):
-        tasks.append(Task(
-            id=str(task["_id"]),
-            title=task["title"],
-            description=task.get("description"),
-            status=task["status"],
-            assigned_to=task.get("assigned_to")
-        ))
-    logging.info(f"Listagem de tarefas. Filtro assigned_to: {assigned_to}")
-    return tasks
+def _parse_fields(fields: Optional[str]):
+    if not fields:
+        return None
+    requested = tuple(f.strip() for f in fields.split(",") if f.strip())
+    invalid = [f for f in requested if f not in TASK_FIELDS]
+    if invalid:
+        logging.warning("Projeção com campos inválidos: %s", invalid)
+        raise HTTPException(status_code=400, detail=f"Invalid fields: {', '.join(invalid)}")
+    return requested
+
+async def _stream_tasks(cursor, fields):
+    async for task in cursor:
+        yield dumps(task_document(task, fields)) + b"\n"
+
+async def _stream_expanded_tasks(cursor, fields):
+    # Busca os responsáveis a cada lote do cursor, não a cada tarefa.
+    batch = []
+    async for task in cursor:
+        batch.append(task)
+        if len(batch) >= DB_CURSOR_BATCH_SIZE:
+            assignees = await _load_assignees(batch, "list_tasks")
+            yield b"".join(dumps(_expanded_document(t, fields, assignees)) + b"\n" for t in batch)
+            batch = []
+    if batch:
+        assignees = await _load_assignees(batch, "list_tasks")
+        yield b"".join(dumps(_expanded_document(t, fields, assignees)) + b"\n" for t in batch)
+
+async def _merge_sorted(cursors, sort_spec, limit: Optional[int]):
+    """Intercala cursores já ordenados por ``sort_spec`` (mesma direção em todos os campos)."""
+    fields = [field for field, _ in sort_spec]
+    pick = max if sort_spec[0][1] == -1 else min
+    heads = {}
+    try:
+        for cursor in cursors:
+            doc = await anext(cursor, None)
+            if doc is not None:
+                heads[cursor] = doc
+        sent = 0
+        while heads and (limit is None or sent < limit):
+            cursor = pick(heads, key=lambda c: tuple(heads[c].get(field) for field in fields))
+            yield heads[cursor]
+            sent += 1
+            doc = await anext(cursor, None)
+            if doc is None:
+                del heads[cursor]
+            else:
+                heads[cursor] = doc
+    finally:
+        for cursor in cursors:
+            await cursor.close()
+
+@router.get("/tasks", response_model=List[TaskWithAssignee])
+async def list_tasks(
+    assigned_to: Optional[str] = None,
+    status: Optional[List[str]] = Query(None),
+    title_prefix: Optional[str] = None,
+    q: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
+    stream: bool = False,
+    include_archived: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    try:
+        query, sort_spec, sort_field, index = build_task_query(assigned_to, status, title_prefix, q, sort, after)
+    except HTTPException as e:
+        logging.warning("Listagem de tarefas recusada: %s", e.detail)
+        raise
+    projection = _parse_fields(fields)
+    expand_assignee = _parse_expand(expand)
+    find_kwargs = {"sort": sort_spec}
+    if projection is not None:
+        # O campo de ordenação entra na projeção para montar o cursor da próxima página.
+        extra = tuple(f for f, _ in sort_spec) + (("assigned_to",) if expand_assignee else ())
+        find_kwargs["projection"] = {f: 1 for f in projection + extra}
+    # Em modo streaming sem limite, a resposta é produzida conforme o cursor avança.
+    if not stream or limit is not None:
+        find_kwargs["limit"] = limit or DEFAULT_PAGE_SIZE
+    cursor = async_tasks_collection.reader("list_tasks").find(query, **find_kwargs)
+    if include_archived:
+        # Mesma consulta no arquivo (que tem os mesmos índices), intercalada pela ordenação.
+        archived = async_tasks_archive_collection.reader("list_tasks").find(query, **find_kwargs)
+        cursor = _merge_sorted([cursor, archived], sort_spec, find_kwargs.get("limit"))
+    logging.info(
+        "Listagem de tarefas. Filtro assigned_to: %s, status: %s, title_prefix: %s, q: %s, sort: %s, after: %s, "
+        "limit: %s, expand: %s, stream: %s, arquivadas: %s, índice: %s",
+        assigned_to, status, title_prefix, q, sort, after, limit, expand, stream, include_archived, index
+    )
+    if stream:
+        generator = _stream_expanded_tasks if expand_assignee else _stream_tasks
+        return StreamingResponse(generator(cursor, projection or TASK_FIELDS), media_type="application/x-ndjson")
+    docs = [task async for task in cursor]
+    headers = {}
+    if len(docs) == find_kwargs["limit"]:
+        headers["X-Next-Cursor"] = encode_cursor(docs[-1], sort_field)
+    if expand_assignee:
+        assignees = await _load_assignees(docs, "list_tasks")
+        tasks = [_expanded_document(task, projection or TASK_FIELDS, assignees) for task in docs]
+    else:
+        tasks = [task_document(task, projection or TASK_FIELDS) for task in docs]
+    return DocumentResponse(tasks, headers=headers)
 
 @router.put("/tasks/{id}", response_model=Task)
-async def update_task(id: str, task: TaskUpdate, current_user: User = Depends(get_current_user)):
+async def update_task(
+    id: str,
+    task: TaskUpdate,
+    if_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user)
+):
     update_data = {k: v for k, v in task.dict().items() if v is not None}
     if "assigned_to" in update_data:
-        if not users_collection.find_one({"username": update_data["assigned_to"], "is_active": True}):
-            logging.warning(f"Tentativa de reatribuir tarefa para usuário inexistente: {update_data['assigned_to']}")
+        if not await active_usernames.exists(update_data["assigned_to"]):
+            logging.warning("Tentativa de reatribuir tarefa para usuário inexistente: %s", update_data['assigned_to'])
             raise HTTPException(status_code=400, detail="Assigned user does not exist")
+    expected = expected_version(if_match)
     try:
-        result = tasks_collection.update_one({"_id": ObjectId(id)}, {"$set": update_data})
+        query = {"_id": ObjectId(id)}
+        if expected is not None:
+            query.update(version_filter(expected))
+        previous_task = await async_tasks_collection.find_one_and_update(query, versioned_update(update_data))
     except Exception:
-        logging.error(f"ID de tarefa inválido para atualização: {id}")
+        logging.error("ID de tarefa inválido para atualização: %s", id)
         raise HTTPException(status_code=400, detail="Invalid task id")
-    if result.matched_count == 0:
-        logging.warning(f"Tentativa de atualizar tarefa inexistente: {id}")
+    if previous_task is None:
+        if expected is not None and await async_tasks_collection.find_one({"_id": ObjectId(id)}, projection={"_id": 1}):
+            logging.warning("Conflito de versão ao atualizar tarefa: %s", id)
+            raise HTTPException(status_code=412, detail="Task was modified")
+        if await _archived_ids([ObjectId(id)]):
+            logging.warning("Tentativa de atualizar tarefa arquivada: %s", id)
+            raise HTTPException(status_code=409, detail="Task is archived")
+        logging.warning("Tentativa de atualizar tarefa inexistente: %s", id)
         raise HTTPException(status_code=404, detail="Task not found")
-    updated_task = tasks_collection.find_one({"_id": ObjectId(id)})
-    logging.info(f"Tarefa atualizada: {id}")
-    return Task(
-        id=str(updated_task["_id"]),
-        title=updated_task["title"],
-        description=updated_task.get("description"),
-        status=updated_task["status"],
-        assigned_to=updated_task.get("assigned_to")
-    )
+    # O id do caminho aceita hexadecimal maiúsculo; o cache e os eventos usam a forma canônica.
+    await task_response_cache.invalidate(str(previous_task["_id"]))
+    updated_task = apply_update(previous_task, update_data)
+    await task_counters.apply(update_delta(previous_task, updated_task))
+    publish_updated(str(previous_task["_id"]), update_data, previous_task.get("assigned_to"))
+    logging.info("Tarefa atualizada: %s", id)
+    return DocumentResponse(task_document(updated_task), headers={"ETag": document_etag(updated_task)})
 
 @router.delete("/tasks/{id}")
 async def delete_task(id: str, current_user: User = Depends(get_current_user)):
     try:
-        result = tasks_collection.delete_one({"_id": ObjectId(id)})
+        task = await async_tasks_collection.find_one_and_delete(
+            {"_id": ObjectId(id)}, projection={"status": 1, "assigned_to": 1}
+        )
     except Exception:
-        logging.error(f"ID de tarefa inválido para deleção: {id}")
+        logging.error("ID de tarefa inválido para deleção: %s", id)
         raise HTTPException(status_code=400, detail="Invalid task id")
-    if result.deleted_count == 0:
-        logging.warning(f"Tentativa de deletar tarefa inexistente: {id}")
+    archived = False
+    if task is None and may_be_archived(ObjectId(id)):
+        task = await async_tasks_archive_collection.find_one_and_delete(
+            {"_id": ObjectId(id)}, projection={"assigned_to": 1}
+        )
+        archived = task is not None
+    if task is None:
+        logging.warning("Tentativa de deletar tarefa inexistente: %s", id)
         raise HTTPException(status_code=404, detail="Task not found")
-    logging.info(f"Tarefa deletada: {id}")
+    await task_response_cache.invalidate(str(task["_id"]))
+    if not archived:
+        # Tarefas arquivadas já saíram dos contadores ao serem arquivadas.
+        await task_counters.apply(task_delta(task, -1))
+    publish_deleted(str(task["_id"]), task.get("assigned_to"))
+    logging.info("Tarefa deletada: %s", id)
     return {"message": f"Task {id} deleted"}
\ No newline at end of file
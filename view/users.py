@@ -1,12 +1,28 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, Response
 from model.models import User, UserCreate, UserUpdate, AuthRequest, AuthResponse
-from controller.database import users_collection
+from model.mappers import DocumentResponse, dumps, user_document
+from controller.assignees import active_usernames
+from controller.database import async_users_collection
+from controller.passwords import DUMMY_HASH, hash_password_async, needs_rehash, verify_password_async
+from controller.rate_limit import check_login, client_ip
+from controller.etags import (
+    apply_update,
+    document_etag,
+    etag_matches,
+    expected_version,
+    version_filter,
+    versioned_update
+)
+from controller.response_cache import user_response_cache
 from bson import ObjectId
+from typing import Optional
 import logging
+import math
 from controller.auth_utils import (
     create_access_token,
     get_current_user,
-    invalidated_tokens,
+    invalidate_user,
+    revoke_token,
     oauth2_scheme
 )
 
@@ -14,93 +30,139 @@ router = APIRouter()
 
 @router.post("/users", response_model=User)
 async def create_user(user: UserCreate):
-    if users_collection.find_one({"username": user.username}):
-        logging.warning(f"Tentativa de criar usuário já existente: {user.username}")
+    if await async_users_collection.find_one({"username": user.username}):
+        logging.warning("Tentativa de criar usuário já existente: %s", user.username)
         raise HTTPException(status_code=400, detail="Username já existe")
     user_doc = {
         "username": user.username,
         "email": user.email,
-        "password": user.password,
-        "is_active": True
+        "password": await hash_password_async(user.password),
+        "is_active": True,
+        "version": 1
     }
-    result = users_collection.insert_one(user_doc)
-    logging.info(f"Usuário criado: {user.username} (id: {result.inserted_id})")
-    return User(
-        id=str(result.inserted_id),
-        username=user.username,
-        email=user.email,
-        is_active=True
-    )
+    await async_users_collection.insert_one(user_doc)
+    active_usernames.add(user.username)
+    logging.info("Usuário criado: %s (id: %s)", user.username, user_doc["_id"])
+    return DocumentResponse(user_document(user_doc), headers={"ETag": document_etag(user_doc)})
 
 @router.get("/users/{id}", response_model=User)
-async def get_user(id: str, current_user: User = Depends(get_current_user)):
+async def get_user(
+    id: str,
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user)
+):
     try:
-        user = users_collection.find_one({"_id": ObjectId(id)})
+        user_id = ObjectId(id)
     except Exception:
-        logging.error(f"ID de usuário inválido: {id}")
+        logging.error("ID de usuário inválido: %s", id)
         raise HTTPException(status_code=400, detail="Invalid user id")
-    if user:
-        logging.info(f"Usuário consultado: {id}")
-        return User(
-            id=str(user["_id"]),
-            username=user["username"],
-            email=user["email"],
-            is_active=user["is_active"]
-        )
-    logging.warning(f"Usuário não encontrado: {id}")
+
+    # Com o cache ligado, a carga lê do primário: um secundário atrasado deixaria
+    # a versão anterior à última escrita no cache por todo o TTL.
+    reader = async_users_collection if user_response_cache.enabled else async_users_collection.reader("get_user")
+
+    async def load_user():
+        user = await reader.find_one({"_id": user_id})
+        if not user:
+            return None
+        return document_etag(user), dumps(user_document(user)).decode()
+
+    cached = await user_response_cache.get_or_load(str(user_id), load_user)
+    if cached:
+        logging.info("Usuário consultado: %s", id)
+        etag, body = cached
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
+    logging.warning("Usuário não encontrado: %s", id)
     raise HTTPException(status_code=404, detail="User not found")
 
 @router.put("/users/{id}", response_model=User)
-async def update_user(id: str, user: UserUpdate, current_user: User = Depends(get_current_user)):
+async def update_user(
+    id: str,
+    user: UserUpdate,
+    if_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user)
+):
     update_data = {k: v for k, v in user.dict().items() if v is not None}
     update_data.pop("id", None)
+    expected = expected_version(if_match)
     try:
-        result = users_collection.update_one({"_id": ObjectId(id)}, {"$set": update_data})
+        query = {"_id": ObjectId(id)}
+        if expected is not None:
+            query.update(version_filter(expected))
+        previous_user = await async_users_collection.find_one_and_update(query, versioned_update(update_data))
     except Exception:
-        logging.error(f"ID de usuário inválido para atualização: {id}")
+        logging.error("ID de usuário inválido para atualização: %s", id)
         raise HTTPException(status_code=400, detail="Invalid user id")
-    if result.matched_count == 0:
-        logging.warning(f"Tentativa de atualizar usuário inexistente: {id}")
+    if previous_user is None:
+        if expected is not None and await async_users_collection.find_one({"_id": ObjectId(id)}, projection={"_id": 1}):
+            logging.warning("Conflito de versão ao atualizar usuário: %s", id)
+            raise HTTPException(status_code=412, detail="User was modified")
+        logging.warning("Tentativa de atualizar usuário inexistente: %s", id)
         raise HTTPException(status_code=404, detail="User not found")
-    updated_user = users_collection.find_one({"_id": ObjectId(id)})
-    logging.info(f"Usuário atualizado: {id}")
-    return User(
-        id=str(updated_user["_id"]),
-        username=updated_user["username"],
-        email=updated_user["email"],
-        is_active=updated_user["is_active"]
-    )
+    # O id do caminho aceita hexadecimal maiúsculo; os caches usam a forma canônica.
+    invalidate_user(str(previous_user["_id"]))
+    await user_response_cache.invalidate(str(previous_user["_id"]))
+    updated_user = apply_update(previous_user, update_data)
+    if previous_user["username"] != updated_user["username"]:
+        active_usernames.discard(previous_user["username"])
+        if updated_user["is_active"]:
+            active_usernames.add(updated_user["username"])
+    logging.info("Usuário atualizado: %s", id)
+    return DocumentResponse(user_document(updated_user), headers={"ETag": document_etag(updated_user)})
 
 @router.delete("/users/{id}")
 async def delete_user(id: str, current_user: User = Depends(get_current_user)):
     try:
-        result = users_collection.update_one({"_id": ObjectId(id)}, {"$set": {"is_active": False}})
+        user = await async_users_collection.find_one_and_update(
+            {"_id": ObjectId(id)}, versioned_update({"is_active": False}), projection={"username": 1}
+        )
     except Exception:
-        logging.error(f"ID de usuário inválido para deleção: {id}")
+        logging.error("ID de usuário inválido para deleção: %s", id)
         raise HTTPException(status_code=400, detail="Invalid user id")
-    if result.matched_count == 0:
-        logging.warning(f"Tentativa de deletar usuário inexistente: {id}")
+    if user is None:
+        logging.warning("Tentativa de deletar usuário inexistente: %s", id)
         raise HTTPException(status_code=404, detail="User not found")
-    logging.info(f"Usuário soft deleted: {id}")
+    invalidate_user(str(user["_id"]))
+    await user_response_cache.invalidate(str(user["_id"]))
+    active_usernames.discard(user["username"])
+    logging.info("Usuário soft deleted: %s", id)
     return {"message": f"User '{id}' soft deleted"}
 
 # Auth endpoints
+async def _rehash_password(user: dict, password: str):
+    # Converte senhas em texto puro (ou com custo antigo) no primeiro login bem-sucedido.
+    # O filtro pela senha antiga evita sobrescrever uma troca feita nesse meio tempo.
+    new_hash = await hash_password_async(password)
+    await async_users_collection.update_one(
+        {"_id": user["_id"], "password": user["password"]}, {"$set": {"password": new_hash}}
+    )
+    logging.info("Senha do usuário %s convertida para o hash atual", user["username"])
+
 @router.post("/auth/login", response_model=AuthResponse)
-async def login(auth: AuthRequest):
-    user = users_collection.find_one({"username": auth.username, "is_active": True})
-    if user and user["password"] == auth.password:
+async def login(auth: AuthRequest, request: Request):
+    # O limite é conferido antes de qualquer acesso ao banco.
+    retry_after = await check_login(auth.username, client_ip(request.scope))
+    if retry_after:
+        raise HTTPException(status_code=429, detail="Too many login attempts",
+                            headers={"Retry-After": str(math.ceil(retry_after))})
+    user = await async_users_collection.reader("login").find_one({"username": auth.username, "is_active": True})
+    # Usuário inexistente e senha errada têm a mesma resposta (e o mesmo custo), sem revelar quem existe.
+    if await verify_password_async(auth.password, user["password"] if user else DUMMY_HASH) and user:
+        if needs_rehash(user["password"]):
+            await _rehash_password(user, auth.password)
         access_token = create_access_token(data={"sub": str(user["_id"])})
-        logging.info(f"Login realizado com sucesso para usuário: {auth.username}")
+        logging.info("Login realizado com sucesso para usuário: %s", auth.username)
         return AuthResponse(access_token=access_token)
-    elif user:
-        logging.warning(f"Tentativa de login com senha incorreta para usuário: {auth.username}")
-        raise HTTPException(status_code=401, detail="Senha incorreta")
+    if user:
+        logging.warning("Tentativa de login com senha incorreta para usuário: %s", auth.username)
     else:
-        logging.warning(f"Tentativa de login para usuário inexistente: {auth.username}")
-        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+        logging.warning("Tentativa de login para usuário inexistente: %s", auth.username)
+    raise HTTPException(status_code=401, detail="Credenciais inválidas")
 
 @router.post("/auth/logout")
 async def logout(token: str = Depends(oauth2_scheme)):
-    invalidated_tokens.add(token)
+    await revoke_token(token)
     logging.info("Logout realizado com sucesso.")
     return {"message": "Logout realizado com sucesso."}
\ No newline at end of file